@@ -1,25 +1,72 @@
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
+import argparse
+import asyncio
 import time
 import random
 import json
 import os
 from datetime import datetime
+from urllib.parse import urlsplit
+
+from url_dedup import SeenOffers, SEEN_FILE, seed_from_file
+
+# Constants
+PROGRESS_FILE = '2-1_progress.json'
+OUTPUT_FILE = 'otomoto_car_urls.txt'
+BASE_URL = "https://www.otomoto.pl/osobowe?search%5Border%5D=relevance_web"
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'pl-PL,pl;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+def pages_to_ranges(pages):
+    """Compress a set of page numbers into sorted [start, end] ranges"""
+    ranges = []
+    for page in sorted(pages):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ranges
+
+def ranges_to_pages(ranges):
+    """Expand [start, end] ranges back into a set of page numbers"""
+    pages = set()
+    for start, end in ranges:
+        pages.update(range(start, end + 1))
+    return pages
 
 def load_progress():
+    progress = {'completed_pages': set(), 'last_page': 0, 'total_urls': 0, 'last_updated': None}
     try:
-        if os.path.exists('2-1_progress.json'):
-            with open('2-1_progress.json', 'r') as f:
-                return json.load(f)
+        if os.path.exists(PROGRESS_FILE):
+            with open(PROGRESS_FILE, 'r') as f:
+                progress.update(json.load(f))
     except Exception as e:
         print(f"Error loading progress file: {e}")
-    return {'last_page': 0, 'total_urls': 0, 'last_updated': None}
+
+    if 'completed_ranges' in progress:
+        progress['completed_pages'] = ranges_to_pages(progress.pop('completed_ranges'))
+    elif progress['last_page']:
+        # Old progress files only stored the last page of a sequential run
+        progress['completed_pages'] = set(range(1, progress['last_page'] + 1))
+    return progress
 
 def save_progress(progress_data):
     try:
         progress_data['last_updated'] = datetime.now().isoformat()
-        with open('2-1_progress.json', 'w') as f:
-            json.dump(progress_data, f, indent=2)
+        progress_data['last_page'] = max(progress_data['completed_pages'], default=0)
+        data = {k: v for k, v in progress_data.items() if k != 'completed_pages'}
+        data['completed_ranges'] = pages_to_ranges(progress_data['completed_pages'])
+        with open(PROGRESS_FILE, 'w') as f:
+            json.dump(data, f, indent=2)
     except Exception as e:
         print(f"Error saving progress file: {e}")
 
@@ -34,21 +81,12 @@ def append_urls_to_file(urls, filename):
         return False
 
 def get_otomoto_listings(url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-        'Accept-Language': 'pl-PL,pl;q=0.9,en-US;q=0.8,en;q=0.7',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1'
-    }
-    
     max_retries = 3
     retry_delay = 5
     
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, timeout=30)
+            response = requests.get(url, headers=HEADERS, timeout=30)
             if response.status_code == 200:
                 return BeautifulSoup(response.text, 'html.parser')
             elif response.status_code == 429:  # Too Many Requests
@@ -125,18 +163,19 @@ def extract_urls(soup):
     
     return urls
 
-def scrape_multiple_pages(base_url, num_pages=8000):
+def scrape_multiple_pages(base_url, num_pages=8000, seen=None):
     progress = load_progress()
-    start_page = progress['last_page'] + 1
+    completed_pages = progress['completed_pages']
     total_urls = progress['total_urls']
+    pending_pages = [page for page in range(1, num_pages + 1) if page not in completed_pages]
     
-    if start_page > num_pages:
+    if not pending_pages:
         print(f"All pages already processed (up to page {num_pages})")
         return total_urls
     
-    print(f"Resuming from page {start_page}")
+    print(f"Resuming from page {pending_pages[0]}")
     
-    for page in range(start_page, num_pages + 1):
+    for page in pending_pages:
         try:
             page_url = f"{base_url}&page={page}"
             print(f"Scraping page {page}: {page_url}")
@@ -145,12 +184,15 @@ def scrape_multiple_pages(base_url, num_pages=8000):
             if soup:
                 urls = extract_urls(soup)
                 if urls:
-                    if append_urls_to_file(urls, 'otomoto_car_urls.txt'):
-                        total_urls += len(urls)
-                        progress['last_page'] = page
+                    new_urls = seen.filter_new(urls) if seen else urls
+                    if append_urls_to_file(new_urls, OUTPUT_FILE):
+                        if seen:
+                            seen.add_many(new_urls)
+                        total_urls += len(new_urls)
+                        completed_pages.add(page)
                         progress['total_urls'] = total_urls
                         save_progress(progress)
-                        print(f"Found and saved {len(urls)} URLs from page {page}")
+                        print(f"Found {len(urls)} URLs on page {page}, saved {len(new_urls)} new")
                     else:
                         print(f"Failed to save URLs from page {page}")
                 else:
@@ -167,30 +209,194 @@ def scrape_multiple_pages(base_url, num_pages=8000):
     
     return total_urls
 
+class TokenBucket:
+    """Token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AdaptiveThrottle:
+    """Per-host rate limiter shared by all workers.
+
+    A 429 response pauses every worker talking to the host (with the same linear
+    backoff as get_otomoto_listings) and halves the request rate; a run of
+    successful responses slowly brings the rate back up.
+    """
+    def __init__(self, rate, retry_delay=5, min_rate=0.2, recover_after=20):
+        self.bucket = TokenBucket(rate)
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.retry_delay = retry_delay
+        self.recover_after = recover_after
+        self.pause_until = 0.0
+        self.strikes = 0
+        self.successes = 0
+
+    async def acquire(self):
+        delay = self.pause_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.bucket.acquire()
+
+    def on_rate_limited(self):
+        self.strikes += 1
+        self.successes = 0
+        wait_time = min(self.retry_delay * self.strikes, 60)
+        self.pause_until = max(self.pause_until, time.monotonic() + wait_time)
+        self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+        print(f"Rate limited. Pausing {wait_time} seconds, slowing down to {self.bucket.rate:.2f} req/s")
+
+    def on_success(self):
+        self.successes += 1
+        if self.successes >= self.recover_after:
+            self.successes = 0
+            self.strikes = max(0, self.strikes - 1)
+            self.bucket.rate = min(self.max_rate, self.bucket.rate * 1.25)
+
+async def get_otomoto_listings_async(session, url, throttle, max_retries=3, retry_delay=5):
+    """Async counterpart of get_otomoto_listings returning the raw HTML"""
+    attempt = 0
+    while attempt < max_retries:
+        await throttle.acquire()
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    html = await response.text()
+                    throttle.on_success()
+                    return html
+                elif response.status == 429:  # Too Many Requests
+                    throttle.on_rate_limited()
+                    attempt += 1
+                else:
+                    print(f"Failed to retrieve the page. Status code: {response.status}")
+                    return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            attempt += 1
+            print(f"Request error (attempt {attempt}/{max_retries}): {e}")
+            if attempt < max_retries:
+                await asyncio.sleep(retry_delay)
+    return None
+
+def extract_urls_from_html(html):
+    return extract_urls(BeautifulSoup(html, 'html.parser'))
+
+async def scrape_multiple_pages_async(base_url, num_pages=8000, concurrency=8, rate=4.0, seen=None):
+    """Crawl search pages concurrently; pages may finish out of order"""
+    progress = load_progress()
+    completed_pages = progress['completed_pages']
+    pending_pages = [page for page in range(1, num_pages + 1) if page not in completed_pages]
+
+    if not pending_pages:
+        print(f"All pages already processed (up to page {num_pages})")
+        return progress['total_urls']
+
+    print(f"{len(pending_pages)} pages left, crawling with concurrency {concurrency} at {rate} req/s per host")
+
+    queue = asyncio.Queue()
+    for page in pending_pages:
+        queue.put_nowait(page)
+    throttles = {}
+
+    async def worker(session):
+        while True:
+            try:
+                page = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            page_url = f"{base_url}&page={page}"
+            host = urlsplit(page_url).netloc
+            if host not in throttles:
+                throttles[host] = AdaptiveThrottle(rate)
+            print(f"Scraping page {page}: {page_url}")
+
+            html = await get_otomoto_listings_async(session, page_url, throttles[host])
+            if html is None:
+                continue
+            # Parsing is CPU bound, keep it off the event loop
+            urls = await asyncio.to_thread(extract_urls_from_html, html)
+            if not urls:
+                print(f"No URLs found on page {page}")
+                continue
+            # Runs on the event loop thread only, so file, index and progress writes never interleave
+            new_urls = seen.filter_new(urls) if seen else urls
+            if append_urls_to_file(new_urls, OUTPUT_FILE):
+                if seen:
+                    seen.add_many(new_urls)
+                completed_pages.add(page)
+                progress['total_urls'] += len(new_urls)
+                save_progress(progress)
+                print(f"Found {len(urls)} URLs on page {page}, saved {len(new_urls)} new")
+            else:
+                print(f"Failed to save URLs from page {page}")
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        try:
+            await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        finally:
+            save_progress(progress)
+
+    return progress['total_urls']
+
 def main():
+    parser = argparse.ArgumentParser(description="Collect car listing URLs from otomoto.pl search pages")
+    parser.add_argument('--base-url', default=BASE_URL, help="Search URL (point it at a local stand-in for testing)")
+    parser.add_argument('--pages', type=int, default=8000, help="Number of search pages to crawl")
+    parser.add_argument('--async', dest='use_async', action='store_true', help="Crawl pages concurrently")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent requests in async mode")
+    parser.add_argument('--rate', type=float, default=4.0, help="Requests per second per host in async mode")
+    args = parser.parse_args()
+
     try:
-        base_url = "https://www.otomoto.pl/osobowe?search%5Border%5D=relevance_web"
-        
         # Create or clear the output file if starting from page 1
         progress = load_progress()
-        if progress['last_page'] == 0:
-            open('otomoto_car_urls.txt', 'w').close()
+        if not progress['completed_pages']:
+            open(OUTPUT_FILE, 'w').close()
+            for path in (SEEN_FILE, SEEN_FILE + '-wal', SEEN_FILE + '-shm'):
+                if os.path.exists(path):
+                    os.remove(path)
         
-        # Scrape URLs
-        total_urls = scrape_multiple_pages(base_url, num_pages=8000)
+        # Offers already in the output file are never written again
+        seeding = not os.path.exists(SEEN_FILE)
+        with SeenOffers(SEEN_FILE) as seen:
+            if seeding and progress['completed_pages']:
+                print(f"Indexed {seed_from_file(seen, OUTPUT_FILE)} offers already in {OUTPUT_FILE}")
+            
+            # Scrape URLs
+            if args.use_async:
+                total_urls = asyncio.run(scrape_multiple_pages_async(args.base_url, num_pages=args.pages,
+                                                                     concurrency=args.concurrency, rate=args.rate,
+                                                                     seen=seen))
+            else:
+                total_urls = scrape_multiple_pages(args.base_url, num_pages=args.pages, seen=seen)
         
         print(f"\nScraping completed. Total URLs collected: {total_urls}")
-        print("Results saved to otomoto_car_urls.txt")
-        print("Progress saved to 2-1_progress.json")
+        print(f"Results saved to {OUTPUT_FILE}")
+        print(f"Progress saved to {PROGRESS_FILE}")
         
     except KeyboardInterrupt:
         print("\nScraping interrupted by user")
         progress = load_progress()
-        print(f"Progress saved: {progress['total_urls']} URLs collected up to page {progress['last_page']}")
+        print(f"Progress saved: {progress['total_urls']} URLs collected from {len(progress['completed_pages'])} pages")
     except Exception as e:
         print(f"\nAn error occurred: {e}")
         progress = load_progress()
-        print(f"Progress saved: {progress['total_urls']} URLs collected up to page {progress['last_page']}")
+        print(f"Progress saved: {progress['total_urls']} URLs collected from {len(progress['completed_pages'])} pages")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,12 @@
 import os
+import tempfile
+
+from url_dedup import dedupe_file
 
 def remove_duplicate_urls(input_file, output_file):
     """
-    Read URLs from input file, remove duplicates, and save unique URLs to output file.
+    Stream URLs from input file and save the first canonical URL of each offer to output file.
+    URLs differing only in query string, fragment, trailing slash or host count as duplicates.
     """
     try:
         # Check if input file exists
@@ -10,29 +14,13 @@ def remove_duplicate_urls(input_file, output_file):
             print(f"Error: Input file '{input_file}' not found.")
             return False
         
-        # Read all URLs from input file
-        with open(input_file, 'r', encoding='utf-8') as f:
-            urls = [line.strip() for line in f if line.strip()]
-        
-        print(f"Total URLs read from {input_file}: {len(urls)}")
-        
-        # Remove duplicates while preserving order
-        unique_urls = []
-        seen_urls = set()
-        
-        for url in urls:
-            if url not in seen_urls:
-                unique_urls.append(url)
-                seen_urls.add(url)
-        
-        print(f"Unique URLs found: {len(unique_urls)}")
-        print(f"Duplicate URLs removed: {len(urls) - len(unique_urls)}")
-        
-        # Write unique URLs to output file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for url in unique_urls:
-                f.write(f"{url}\n")
+        # Seen offer IDs are kept in a throwaway on-disk index instead of memory
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            total, unique = dedupe_file(input_file, output_file, os.path.join(tmp_dir, 'seen.sqlite'))
         
+        print(f"Total URLs read from {input_file}: {total}")
+        print(f"Unique URLs found: {unique}")
+        print(f"Duplicate URLs removed: {total - unique}")
         print(f"Unique URLs saved to '{output_file}'")
         return True
         
@@ -1,15 +1,41 @@
-import pandas as pd
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+import argparse
+import queue
+import random
+import threading
 import time
 import re
 import json
 import os
 from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit
+
+from record_log import RecordLog, migrate_csv
 
 # Constants
 PROGRESS_FILE = '2-3_progress.json'
-OUTPUT_FILE = 'otomoto_cars.csv'
+OUTPUT_FILE = 'otomoto_cars.records'
+LEGACY_CSV_FILE = 'otomoto_cars.csv'
+URLS_FILE = 'otomoto_car_urls_unique.txt'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'pl-PL,pl;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Byte markers delimiting the embedded Next.js page data
+NEXT_DATA_MARKER = b'id="__NEXT_DATA__"'
+SCRIPT_END = b'</script>'
+
+# Status codes worth retrying; anything else is a permanent failure for that URL
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 def load_progress():
     """Load progress from JSON file or create new if doesn't exist"""
@@ -27,73 +53,29 @@ def load_progress():
         print("🆕 No progress file found. Starting fresh.")
         return {'last_processed': -1, 'start_time': datetime.now().isoformat()}
 
-def save_progress(last_processed):
+def save_progress(last_processed, total_urls, processed_count=None):
     """Save current progress to JSON file"""
+    if processed_count is None:
+        processed_count = last_processed + 1
     progress_data = {
         'last_processed': last_processed,
         'start_time': datetime.now().isoformat(),
-        'total_urls': len(urls),
-        'processed_count': last_processed + 1
+        'total_urls': total_urls,
+        'processed_count': processed_count
     }
     try:
         with open(PROGRESS_FILE, 'w') as f:
             json.dump(progress_data, f, indent=2)
-        print(f"💾 Progress saved: {last_processed + 1}/{len(urls)} URLs processed")
+        print(f"💾 Progress saved: {processed_count}/{total_urls} URLs processed")
     except Exception as e:
         print(f"❌ Error saving progress: {str(e)}")
 
-def load_or_create_dataframe(urls):
-    """Load existing CSV or create new DataFrame with URLs"""
-    if os.path.exists(OUTPUT_FILE):
-        try:
-            existing_df = pd.read_csv(OUTPUT_FILE)
-            # If we have existing data, merge with new URLs
-            new_urls = set(urls) - set(existing_df['url'])
-            if new_urls:
-                new_df = pd.DataFrame({'url': list(new_urls)})
-                new_df['raw_json'] = None
-                return pd.concat([existing_df, new_df], ignore_index=True)
-            return existing_df
-        except Exception as e:
-            print(f"Error reading existing CSV: {str(e)}")
-            return create_new_dataframe(urls)
-    return create_new_dataframe(urls)
-
-def get_processed_urls():
-    """Get list of already processed URLs from CSV file"""
-    processed_urls = set()
-    if os.path.exists(OUTPUT_FILE):
-        try:
-            df = pd.read_csv(OUTPUT_FILE)
-            processed_urls = set(df['url'].tolist())
-            print(f"Found {len(processed_urls)} already processed URLs")
-        except Exception as e:
-            print(f"Error reading processed URLs: {str(e)}")
+def get_processed_urls(log):
+    """Get the set of already processed URLs from the record log index"""
+    processed_urls = log.urls()
+    print(f"Found {len(processed_urls)} already processed URLs")
     return processed_urls
 
-def create_new_dataframe(urls):
-    """Create new DataFrame with required columns and URLs"""
-    df = pd.DataFrame({'url': urls})
-    df['raw_json'] = None
-    return df
-
-def save_processed_url(df, idx):
-    """Save a single processed URL to CSV"""
-    try:
-        # Create a DataFrame with just the processed row
-        processed_df = pd.DataFrame([df.iloc[idx]])
-        
-        if os.path.exists(OUTPUT_FILE):
-            # Append to existing file without header
-            processed_df.to_csv(OUTPUT_FILE, mode='a', header=False, index=False)
-        else:
-            # Create new file with header
-            processed_df.to_csv(OUTPUT_FILE, index=False)
-            
-        print(f"Saved URL {idx + 1} to {OUTPUT_FILE}")
-    except Exception as e:
-        print(f"Error saving processed URL: {str(e)}")
-
 def extract_json_data(html_content):
     """Extract JSON data from HTML content"""
     try:
@@ -135,47 +117,78 @@ def extract_details_from_json(json_data):
         print(f"Error extracting details from JSON: {str(e)}")
         return None
 
-# Read URLs from the text file
-try:
-    with open('otomoto_car_urls_unique.txt', 'r') as file:
-        urls = file.readlines()
-except Exception as e:
-    print(f"Error reading URLs file: {str(e)}")
-    exit(1)
+def find_next_data(body):
+    """Locate the __NEXT_DATA__ JSON in the raw response bytes without decoding the page"""
+    start = body.find(NEXT_DATA_MARKER)
+    if start == -1:
+        return None
+    start = body.find(b'>', start) + 1
+    end = body.find(SCRIPT_END, start)
+    if start == 0 or end == -1:
+        return None
+    return memoryview(body)[start:end]
+
+def extract_ad_json(body):
+    """Fast replacement for extract_json_data + extract_details_from_json.
+
+    Finds the script tag with a byte search, parses the blob once with orjson and
+    keeps only the listing subtree. Page-level extras (translations, config) are
+    dropped and the result is compact UTF-8 JSON, so 2-4.py parses a few KB per
+    listing instead of the whole page state.
+    """
+    try:
+        blob = find_next_data(body)
+        if blob is None:
+            return None
 
-# Clean URLs (remove whitespace and newlines)
-urls = [url.strip() for url in urls if url.strip()]  # Only keep non-empty URLs
+        page_props = orjson.loads(blob).get('props', {}).get('pageProps', {})
+        car_data = page_props.get('ad') or page_props.get('data')
+        if not car_data:
+            # Current layout keeps the listing under pageProps.advert, which is what 2-4.py reads
+            car_data = {'advert': page_props['advert']} if page_props.get('advert') else page_props
 
-if not urls:
-    print("No URLs found in the file!")
-    exit(1)
+        if not car_data:
+            return None
 
-print(f"Loaded {len(urls)} URLs from file")
+        return {
+            'raw_json': orjson.dumps(car_data).decode('utf-8')
+        }
+    except Exception as e:
+        print(f"Error extracting JSON data: {str(e)}")
+        return None
+
+def load_urls(filename=URLS_FILE):
+    """Read listing URLs from the text file, skipping blank lines"""
+    with open(filename, 'r') as file:
+        return [url.strip() for url in file if url.strip()]
+
+def rewrite_host(url, offer_host):
+    """Point a listing URL at another host (e.g. a local mock server)"""
+    if not offer_host:
+        return url
+    target = urlsplit(offer_host)
+    parts = urlsplit(url)
+    return urlunsplit((target.scheme, target.netloc, parts.path, parts.query, parts.fragment))
+
+def make_session(pool_size=10):
+    """Keep-alive session whose connection pool fits all workers"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
 # Function to scrape car details
-def scrape_car_details(url):
+def scrape_car_details(url, session=None):
     try:
-        # Add headers to mimic browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'pl-PL,pl;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
+        response = (session or requests).get(url, headers=HEADERS, timeout=30)
         response.raise_for_status()
         
-        # Extract JSON data from the page
-        json_data = extract_json_data(response.text)
-        
-        if json_data:
-            # Extract details from the JSON data
-            details = extract_details_from_json(json_data)
-            if details:
-                return details
+        # Extract the listing JSON straight from the response bytes
+        details = extract_ad_json(response.content)
+        if details:
+            return details
         
         return {'raw_json': None}
     
@@ -189,28 +202,19 @@ def scrape_car_details(url):
         print(f"Error scraping {url}: {str(e)}")
         return None
 
-def process_single_url(url, idx):
+def process_single_url(log, url, idx, total_urls, fetch_url=None):
     """Process a single URL"""
     try:
         print(f"Processing URL {idx + 1}: {url}")
-        details = scrape_car_details(url)
+        details = scrape_car_details(fetch_url or url)
         
         if details:
-            # Create result DataFrame
-            result_df = pd.DataFrame([{
-                'url': url,
-                'raw_json': details['raw_json']
-            }])
-            
-            # Save to CSV
-            if os.path.exists(OUTPUT_FILE):
-                result_df.to_csv(OUTPUT_FILE, mode='a', header=False, index=False)
-            else:
-                result_df.to_csv(OUTPUT_FILE, index=False)
+            # Save to the record log
+            log.append_many([(url, details['raw_json'])])
             
             # Update progress file
-            save_progress(idx)
-            print(f"✅ Processed {idx + 1}/{len(urls_to_process)} URLs")
+            save_progress(idx, total_urls)
+            print(f"✅ Processed {idx + 1}/{total_urls} URLs")
             return True
         else:
             print(f"Failed to extract data from URL {idx + 1}")
@@ -220,51 +224,178 @@ def process_single_url(url, idx):
         print(f"Error processing URL {idx + 1}: {str(e)}")
         return False
 
-# Load progress and existing data
-progress = load_progress()
-processed_urls = get_processed_urls()
-
-# Filter out already processed URLs
-urls_to_process = []
-for i, url in enumerate(urls):
-    if url not in processed_urls:
-        urls_to_process.append((url, i))
-
-if not urls_to_process:
-    print("All URLs have been processed!")
-    exit(0)
-
-print(f"Found {len(urls_to_process)} URLs to process out of {len(urls)} total")
-print(f"Progress file: {PROGRESS_FILE}")
-print(f"Output file: {OUTPUT_FILE}")
-
-# Sequential scraping
-try:
-    completed = 0
-    for url, idx in urls_to_process:
-        success = process_single_url(url, idx)
-        completed += 1
-        
-        if completed % 10 == 0:  # Progress update every 10 completed
-            print(f"Completed {completed}/{len(urls_to_process)} URLs")
+def fetch_with_retry(session, url, max_retries=3, backoff=1.0):
+    """Fetch and extract one listing, retrying transient failures with jittered exponential backoff"""
+    for attempt in range(max_retries):
+        try:
+            response = session.get(url, timeout=30)
+            if response.status_code == 200:
+                return extract_ad_json(response.content) or {'raw_json': None}
+            if response.status_code not in RETRY_STATUS:
+                print(f"Failed to retrieve {url}. Status code: {response.status_code}")
+                return None
+            reason = f"status {response.status_code}"
+        except requests.RequestException as e:
+            reason = str(e)
+
+        if attempt < max_retries - 1:
+            wait_time = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"Retrying {url} in {wait_time:.1f}s ({reason}, attempt {attempt + 1}/{max_retries})")
+            time.sleep(wait_time)
+        else:
+            print(f"Giving up on {url} after {max_retries} attempts ({reason})")
+    return None
+
+def scrape_parallel(log, urls_to_process, total_urls, workers=16, batch_size=50, flush_interval=5.0,
+                    max_retries=3, backoff=1.0, offer_host=None):
+    """Scrape listings with a pool of worker threads sharing one keep-alive session.
+
+    The work queue is bounded so only a few URLs are in flight beyond the workers.
+    A single writer thread appends finished rows to the record log in batches and
+    saves progress once per batch instead of once per listing.
+    """
+    session = make_session(workers)
+    work_queue = queue.Queue(maxsize=workers * 2)
+    result_queue = queue.Queue(maxsize=batch_size * 2)
+    stats = {'written': 0, 'failed': 0}
+    stop = object()
+
+    def worker():
+        while True:
+            item = work_queue.get()
+            if item is stop:
+                return
+            url, idx = item
+            details = fetch_with_retry(session, rewrite_host(url, offer_host), max_retries, backoff)
+            result_queue.put((url, idx, details))
+
+    def writer():
+        batch = []
+        last_flush = time.monotonic()
+        done = False
+        while not done:
+            try:
+                item = result_queue.get(timeout=flush_interval)
+                if item is stop:
+                    done = True
+                else:
+                    url, idx, details = item
+                    if details:
+                        batch.append((url, details['raw_json'], idx))
+                    else:
+                        stats['failed'] += 1
+            except queue.Empty:
+                pass
+
+            if batch and (done or len(batch) >= batch_size or time.monotonic() - last_flush >= flush_interval):
+                log.append_many((url, raw_json) for url, raw_json, _ in batch)
+                stats['written'] += len(batch)
+                save_progress(max(idx for _, _, idx in batch), total_urls, processed_count=stats['written'])
+                print(f"✅ Written {stats['written']}/{len(urls_to_process)} URLs ({stats['failed']} failed)")
+                batch = []
+                last_flush = time.monotonic()
+
+    writer_thread = threading.Thread(target=writer, name='record-writer')
+    worker_threads = [threading.Thread(target=worker, name=f'worker-{i}', daemon=True) for i in range(workers)]
+    writer_thread.start()
+    for t in worker_threads:
+        t.start()
+
+    start = time.monotonic()
+    try:
+        for item in urls_to_process:
+            work_queue.put(item)
+    finally:
+        for _ in worker_threads:
+            work_queue.put(stop)
+        for t in worker_threads:
+            t.join()
+        result_queue.put(stop)
+        writer_thread.join()
+        session.close()
+
+    elapsed = time.monotonic() - start
+    print(f"Scraped {stats['written']} listings in {elapsed:.1f}s ({stats['written'] / max(elapsed, 1e-9):.1f} listings/s)")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape listing details from otomoto.pl")
+    parser.add_argument('--workers', type=int, default=1, help="Worker threads (1 = sequential scraping)")
+    parser.add_argument('--batch-size', type=int, default=50, help="Rows per CSV write in parallel mode")
+    parser.add_argument('--retries', type=int, default=3, help="Attempts per URL in parallel mode")
+    parser.add_argument('--offer-host', default=None, help="Fetch listings from this host instead (e.g. http://127.0.0.1:8000)")
+    parser.add_argument('--migrate-csv', action='store_true', help=f"Import an existing {LEGACY_CSV_FILE} into {OUTPUT_FILE} first")
+    args = parser.parse_args()
+
+    if args.migrate_csv:
+        migrate_csv(LEGACY_CSV_FILE, OUTPUT_FILE)
+
+    # Read URLs from the text file
+    try:
+        urls = load_urls()
+    except Exception as e:
+        print(f"Error reading URLs file: {str(e)}")
+        exit(1)
+
+    if not urls:
+        print("No URLs found in the file!")
+        exit(1)
+
+    print(f"Loaded {len(urls)} URLs from file")
+
+    # Load progress and existing data
+    progress = load_progress()
+    log = RecordLog(OUTPUT_FILE)
+    processed_urls = get_processed_urls(log)
+
+    # Filter out already processed URLs
+    urls_to_process = []
+    for i, url in enumerate(urls):
+        if url not in processed_urls:
+            urls_to_process.append((url, i))
+
+    if not urls_to_process:
+        print("All URLs have been processed!")
+        exit(0)
+
+    print(f"Found {len(urls_to_process)} URLs to process out of {len(urls)} total")
+    print(f"Progress file: {PROGRESS_FILE}")
+    print(f"Output file: {OUTPUT_FILE}")
+
+    try:
+        if args.workers > 1:
+            print(f"Parallel scraping with {args.workers} workers")
+            scrape_parallel(log, urls_to_process, len(urls), workers=args.workers, batch_size=args.batch_size,
+                            max_retries=args.retries, offer_host=args.offer_host)
+            print(f"\nParallel scraping completed!")
+        else:
+            # Sequential scraping
+            completed = 0
+            for url, idx in urls_to_process:
+                success = process_single_url(log, url, idx, len(urls), rewrite_host(url, args.offer_host))
+                completed += 1
+                
+                if completed % 10 == 0:  # Progress update every 10 completed
+                    print(f"Completed {completed}/{len(urls_to_process)} URLs")
+                
+                # Add a small delay to be respectful to the server
+                #time.sleep(0.1)
+            
+            print(f"\nSequential scraping completed!")
+        print(f"Total URLs processed: {len(urls_to_process)}")
         
-        # Add a small delay to be respectful to the server
-        #time.sleep(0.1)
-    
-    print(f"\nSequential scraping completed!")
-    print(f"Total URLs processed: {len(urls_to_process)}")
-    
-    # Load and display results
-    if os.path.exists(OUTPUT_FILE):
-        result_df = pd.read_csv(OUTPUT_FILE)
+        # Display results
         print(f"\nResults saved to {OUTPUT_FILE}")
-        print(f"Total records: {len(result_df)}")
-        print("\nFirst few entries:")
-        print(result_df.head())
-
-except KeyboardInterrupt:
-    print("\nScraping interrupted by user!")
-    exit(0)
-except Exception as e:
-    print(f"\nUnexpected error: {str(e)}")
-    exit(1)
+        print(f"Total records: {len(log)}")
+
+    except KeyboardInterrupt:
+        print("\nScraping interrupted by user!")
+        exit(0)
+    except Exception as e:
+        print(f"\nUnexpected error: {str(e)}")
+        exit(1)
+    finally:
+        log.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,52 @@
+import argparse
 import pandas as pd
 import json
 import os
 import re
+import glob
+import hashlib
 import numpy as np
 from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from record_log import RecordLog, RECORDS_FILE
+from listing_parser import parse_json_fields_fast
+
+PARSED_DIR = 'otomoto_cars_parsed'
+# Content hash of every raw listing behind the Parquet parts; the leading
+# underscore keeps pyarrow from treating it as part of the dataset
+MANIFEST_FILE = '_manifest.tsv'
+
+def iter_car_data(chunk_size=10000):
+    """Stream the scraped listings as (url, raw_json) DataFrame chunks, from the record log or the legacy CSV"""
+    if not os.path.exists(RECORDS_FILE):
+        yield from pd.read_csv('otomoto_cars.csv', dtype={'url': str, 'raw_json': str}, chunksize=chunk_size)
+        return
+
+    with RecordLog(RECORDS_FILE) as log:
+        rows = []
+        for row in log.iter_records():
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                yield pd.DataFrame(rows, columns=['url', 'raw_json'])
+                rows = []
+        if rows:
+            yield pd.DataFrame(rows, columns=['url', 'raw_json'])
 
 def load_car_data():
-    """Load the car data from CSV file"""
+    """Load the car data from the record log, falling back to the legacy CSV file"""
     try:
+        if os.path.exists(RECORDS_FILE):
+            chunks = list(iter_car_data())
+            if not chunks:
+                print(f"Error: {RECORDS_FILE} contains no records!")
+                return None
+            df = pd.concat(chunks, ignore_index=True)
+            print(f"Loaded {len(df)} records from {RECORDS_FILE}")
+            return df
+
         if not os.path.exists('otomoto_cars.csv'):
             print("Error: otomoto_cars.csv file not found!")
             return None
@@ -185,34 +224,35 @@ def clean_numeric_column(series, suffix, target_type='int'):
             return series.astype('float64')
     return series
 
-def create_cars_subset(df):
+# Columns kept in cars_subset (matching the notebook)
+SELECTED_COLUMNS = [
+    'Listing URL', 'Make', 'Model', 'Body_Type',
+    'Fuel_Type', 'Gearbox', 'Transmission', 'Year_Production', 'Mileage', 
+    'Engine_Capacity', 'Engine_Power', 'No_Accidents',
+    'Service_Record', 'New_Used', 
+     'Is_Imported', 'Param_catalog_urn', 'Param_damaged',
+    'Detail_original_owner', 
+    'Seller Type', 'Equipment_Audio i multimedia', 'Equipment_Komfort i dodatki',
+    'Equipment_Systemy wspomagania kierowcy', 'Equipment_Osiągi i tuning',
+    'Equipment_Bezpieczeństwo', 'Title', 'Description', 'Price', 'Currency'
+]
+
+def create_cars_subset(df, verbose=True):
     """Create cars_subset with selected columns and processing"""
-    print("Creating cars_subset with selected columns...")
-    
-    # Define the columns we want (matching the notebook)
-    selected_columns = [
-        'Listing URL', 'Make', 'Model', 'Body_Type',
-        'Fuel_Type', 'Gearbox', 'Transmission', 'Year_Production', 'Mileage', 
-        'Engine_Capacity', 'Engine_Power', 'No_Accidents',
-        'Service_Record', 'New_Used', 
-         'Is_Imported', 'Param_catalog_urn', 'Param_damaged',
-        'Detail_original_owner', 
-        'Seller Type', 'Equipment_Audio i multimedia', 'Equipment_Komfort i dodatki',
-        'Equipment_Systemy wspomagania kierowcy', 'Equipment_Osiągi i tuning',
-        'Equipment_Bezpieczeństwo', 'Title', 'Description', 'Price', 'Currency'
-    ]
+    log = print if verbose else (lambda *args, **kwargs: None)
+    log("Creating cars_subset with selected columns...")
     
     # Check which columns exist
-    existing_columns = [col for col in selected_columns if col in df.columns]
-    missing_columns = [col for col in selected_columns if col not in df.columns]
+    existing_columns = [col for col in SELECTED_COLUMNS if col in df.columns]
+    missing_columns = [col for col in SELECTED_COLUMNS if col not in df.columns]
     
-    print(f"Selected columns that exist: {len(existing_columns)}")
+    log(f"Selected columns that exist: {len(existing_columns)}")
     if missing_columns:
-        print(f"Missing columns: {missing_columns}")
+        log(f"Missing columns: {missing_columns}")
     
     # Create subset with existing columns only
     cars_subset = df[existing_columns].copy()
-    print(f"cars_subset shape: {cars_subset.shape}")
+    log(f"cars_subset shape: {cars_subset.shape}")
     
     # Handle duplicate Has_Registration columns
     has_reg_columns = [col for col in cars_subset.columns if 'Has_Registration' in col or 'Has Registration' in col]
@@ -237,7 +277,7 @@ def create_cars_subset(df):
     cars_subset = cars_subset.rename(columns=existing_rename_columns)
     
     # Convert data types
-    print("Converting data types...")
+    log("Converting data types...")
     
     # Convert Year to int
     year_col = 'Year' if 'Year' in cars_subset.columns else 'Year_Production'
@@ -253,7 +293,7 @@ def create_cars_subset(df):
             # Convert EUR prices to PLN using exchange rate 1 EUR = 4.2509 PLN
             eur_mask = cars_subset['Currency'].str.upper() == 'EUR'
             cars_subset.loc[eur_mask, 'Price'] = cars_subset.loc[eur_mask, 'Price'] * 4.2509
-            print(f"Converted {eur_mask.sum()} EUR prices to PLN")
+            log(f"Converted {eur_mask.sum()} EUR prices to PLN")
         
         # Convert to int after currency conversion
         cars_subset['Price'] = cars_subset['Price'].astype('int')
@@ -261,7 +301,7 @@ def create_cars_subset(df):
         price_null_count = cars_subset['Price'].isnull().sum()
         if price_null_count > 0:
             cars_subset = cars_subset.dropna(subset=['Price'])
-            print(f"Dropped {price_null_count} rows with null Price")
+            log(f"Dropped {price_null_count} rows with null Price")
     
     # Clean numeric columns
     if 'Engine_Capacity' in cars_subset.columns:
@@ -285,7 +325,7 @@ def create_cars_subset(df):
         # Remove extra whitespace
         cars_subset['Full_Description'] = cars_subset['Full_Description'].str.strip()
         
-        print(f"Created Full_Description column from Title and Description")
+        log(f"Created Full_Description column from Title and Description")
         
         # Reorder columns to place Full_Description after Seller_Type
         if 'Seller_Type' in cars_subset.columns:
@@ -298,7 +338,7 @@ def create_cars_subset(df):
             cols.insert(seller_type_idx + 1, 'Full_Description')
             # Reorder the DataFrame
             cars_subset = cars_subset[cols]
-            print(f"Repositioned Full_Description column after Seller_Type")
+            log(f"Repositioned Full_Description column after Seller_Type")
     
 
     # Filter to drop damaged vehicles (Param_damaged == "Tak")
@@ -307,19 +347,19 @@ def create_cars_subset(df):
         # Drop rows where Param_damaged is "Tak" (damaged vehicles)
         cars_subset = cars_subset[cars_subset['Param_damaged'] != 'Tak']
         filtered_count = len(cars_subset)
-        print(f"Filtered dataset: dropped vehicles with Param_damaged == 'Tak', kept {filtered_count} vehicles out of {initial_count} total vehicles")
+        log(f"Filtered dataset: dropped vehicles with Param_damaged == 'Tak', kept {filtered_count} vehicles out of {initial_count} total vehicles")
     
     # Filter to keep only used vehicles (New_Used == "Używany")
     if 'New_Used' in cars_subset.columns:
         initial_count = len(cars_subset)
         cars_subset = cars_subset[cars_subset['New_Used'] == 'Używany']
         filtered_count = len(cars_subset)
-        print(f"Filtered dataset: kept {filtered_count} used vehicles out of {initial_count} total vehicles")
+        log(f"Filtered dataset: kept {filtered_count} used vehicles out of {initial_count} total vehicles")
     
     # Final column drops (matching the notebook)
     cars_subset = cars_subset.drop(columns=['Param_catalog_urn', 'CO2_Emissions', 'Urban_Consumption', 'Currency', 'Title', 'Description', 'Param_damaged', 'New_Used'], errors='ignore')
     
-    print(f"Final cars_subset shape: {cars_subset.shape}")
+    log(f"Final cars_subset shape: {cars_subset.shape}")
     return cars_subset
 
 def save_processed_data(df, filename='otomoto_cars_parsed.csv'):
@@ -331,7 +371,166 @@ def save_processed_data(df, filename='otomoto_cars_parsed.csv'):
         print(f"Error saving processed data: {e}")
         return False
 
+def content_hash(raw_json):
+    data = raw_json.encode('utf-8') if isinstance(raw_json, str) else b''
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def load_manifest(output_dir=PARSED_DIR):
+    """Read {url: content hash} for the listings in output_dir, or None if it was never built"""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    manifest = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            digest, sep, url = line.rstrip('\n').partition('\t')
+            if sep:
+                manifest[url] = digest
+    return manifest
+
+def save_manifest(manifest, output_dir=PARSED_DIR):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        for url, digest in manifest.items():
+            f.write(f"{digest}\t{url}\n")
+    os.replace(path + '.tmp', path)
+
+def list_parts(output_dir=PARSED_DIR):
+    return sorted(glob.glob(os.path.join(output_dir, 'part-*.parquet')))
+
+def next_part_number(output_dir=PARSED_DIR):
+    numbers = [int(os.path.basename(part)[5:-8]) for part in list_parts(output_dir)]
+    return max(numbers, default=-1) + 1
+
+def write_part(table, path):
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def process_chunk(chunk, workers=1):
+    """Run one chunk of raw listings through parsing, cleaning and filtering"""
+    parsed = parse_json_fields_fast(chunk, workers=workers)
+    if parsed is None:
+        return None
+    # Equipment categories absent from this chunk still need their columns
+    parsed = parsed.reindex(columns=SELECTED_COLUMNS, fill_value='')
+    return create_cars_subset(parsed, verbose=False)
+
+def stream_processed_data(output_dir=PARSED_DIR, chunk_size=10000, workers=1):
+    """Parse, clean and filter the raw listings chunk by chunk into a directory of Parquet parts.
+
+    Only one chunk is held in memory at a time, so peak memory follows chunk_size
+    rather than the number of scraped listings. Read the result with
+    pd.read_parquet(output_dir).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for old_part in list_parts(output_dir):
+        os.remove(old_part)
+
+    schema = None
+    manifest = {}
+    total_in = total_out = parts = 0
+    for chunk in iter_car_data(chunk_size):
+        for url, raw_json in zip(chunk['url'], chunk['raw_json']):
+            manifest[url] = content_hash(raw_json)
+        total_in += len(chunk)
+        cars_subset = process_chunk(chunk, workers)
+        if cars_subset is None or cars_subset.empty:
+            continue
+
+        table = pa.Table.from_pandas(cars_subset, schema=schema, preserve_index=False)
+        schema = table.schema
+        write_part(table, os.path.join(output_dir, f"part-{parts:05d}.parquet"))
+        parts += 1
+        total_out += len(cars_subset)
+        print(f"Chunk {parts}: {total_in} records read, {total_out} kept")
+
+    save_manifest(manifest, output_dir)
+    print(f"Wrote {total_out} of {total_in} records to {parts} parts in {output_dir}/")
+    return total_out
+
+def incremental_processed_data(output_dir=PARSED_DIR, chunk_size=10000, workers=1):
+    """Bring the Parquet parts in output_dir up to date with the raw listings.
+
+    Only listings whose raw_json hash differs from the manifest are parsed.
+    Their old rows, and rows of listings no longer in the raw data, are removed
+    from the parts that contain them; the other parts are left untouched and
+    the re-parsed listings are appended as new parts. Falls back to a full
+    stream_processed_data run when there is no manifest yet.
+    """
+    manifest = load_manifest(output_dir)
+    if manifest is None:
+        print(f"No manifest in {output_dir}/, running a full rebuild")
+        return stream_processed_data(output_dir, chunk_size, workers)
+
+    current = {}
+    changed = []
+    for chunk in iter_car_data(chunk_size):
+        for url, raw_json in zip(chunk['url'], chunk['raw_json']):
+            digest = content_hash(raw_json)
+            current[url] = digest
+            if manifest.get(url) != digest:
+                changed.append((url, raw_json))
+    vanished = manifest.keys() - current.keys()
+    print(f"{len(current)} listings: {len(changed)} new or changed, {len(vanished)} removed")
+    if not changed and not vanished:
+        print(f"{output_dir}/ is up to date")
+        return 0
+
+    # Drop outdated rows, rewriting only the parts that hold them
+    stale = pa.array(sorted({url for url, _ in changed} | vanished), type=pa.string())
+    schema = None
+    rewritten = 0
+    for part in list_parts(output_dir):
+        urls = pq.read_table(part, columns=['Listing_URL'])['Listing_URL']
+        if not pc.any(pc.is_in(urls, value_set=stale)).as_py():
+            schema = schema or pq.read_schema(part)
+            continue
+        table = pq.read_table(part)
+        schema = schema or table.schema
+        table = table.filter(pc.invert(pc.is_in(table['Listing_URL'], value_set=stale)))
+        if table.num_rows:
+            write_part(table, part)
+        else:
+            os.remove(part)
+        rewritten += 1
+
+    part_number = next_part_number(output_dir)
+    added = 0
+    for start in range(0, len(changed), chunk_size):
+        chunk = pd.DataFrame(changed[start:start + chunk_size], columns=['url', 'raw_json'])
+        cars_subset = process_chunk(chunk, workers)
+        if cars_subset is None or cars_subset.empty:
+            continue
+        table = pa.Table.from_pandas(cars_subset, schema=schema, preserve_index=False)
+        schema = table.schema
+        write_part(table, os.path.join(output_dir, f"part-{part_number:05d}.parquet"))
+        part_number += 1
+        added += len(cars_subset)
+
+    # Written last: if the run dies before this, the next run redoes the same delta
+    save_manifest(current, output_dir)
+    print(f"Rewrote {rewritten} parts, added {added} rows for {len(changed)} changed listings")
+    return added
+
 def main():
+    parser = argparse.ArgumentParser(description="Parse scraped otomoto listings into otomoto_cars_parsed.csv")
+    parser.add_argument('--workers', type=int, default=1, help="Processes used by the columnar parser")
+    parser.add_argument('--legacy-parser', action='store_true', help="Use the original row-by-row parse_json_fields")
+    parser.add_argument('--stream', action='store_true', help=f"Process in chunks with bounded memory, writing Parquet parts to {PARSED_DIR}/")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Listings per chunk in --stream mode")
+    parser.add_argument('--incremental', action='store_true', help=f"Update {PARSED_DIR}/ with only the listings that changed since the last run")
+    args = parser.parse_args()
+
+    if args.incremental:
+        print(f"Updating {PARSED_DIR}/ incrementally...")
+        incremental_processed_data(PARSED_DIR, args.chunk_size, args.workers)
+        return
+
+    if args.stream:
+        print(f"Streaming car data in chunks of {args.chunk_size}...")
+        stream_processed_data(PARSED_DIR, args.chunk_size, args.workers)
+        return
+
     print("Starting car data parsing and processing pipeline...")
     print("=" * 60)
     
@@ -341,7 +540,10 @@ def main():
         return
     
     print(f"Processing {len(df)} records...")
-    parsed_df = parse_json_fields(df)
+    if args.legacy_parser:
+        parsed_df = parse_json_fields(df)
+    else:
+        parsed_df = parse_json_fields_fast(df, workers=args.workers)
     if parsed_df is None:
         print("Failed to parse data!")
         return
@@ -0,0 +1,67 @@
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import timed
+from local_automl import LocalAutoML
+
+# Budget adherence of local_automl.py: wall time and peak RSS (of this process
+# or the fit worker) of LocalAutoML.train against max_runtime_secs on a
+# synthetic frame shaped like DecisionTree_small, with how many candidates
+# reached each number of folds. If h2o is installed, H2OAutoML runs on the same
+# frame and budget for comparison (JVM start and H2OFrame upload included).
+# Everything is written to a temporary directory.
+
+def synthetic_frame(rows, features, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features)).astype(np.float32)
+    frame = pd.DataFrame(X, columns=[f"f{i}" for i in range(features)])
+    frame['Log_Price'] = 10 + X[:, 0] + np.sin(X[:, 1]) + 0.5 * X[:, 2] * X[:, 3] + rng.normal(0, 0.3, rows)
+    frame['cv_fold'] = rng.integers(-1, 5, rows)
+    return frame
+
+def run_h2o(frame, budget, seed):
+    import h2o
+    from h2o.automl import H2OAutoML
+
+    start = time.perf_counter()
+    h2o.init()
+    hf = h2o.H2OFrame(frame)
+    aml = H2OAutoML(max_runtime_secs=budget, seed=seed, sort_metric="MAE", verbosity=None)
+    features = [column for column in frame.columns if column not in ('Log_Price', 'cv_fold')]
+    aml.train(x=features, y='Log_Price', training_frame=hf[hf['cv_fold'] != -1], fold_column='cv_fold')
+    seconds = time.perf_counter() - start
+    leaderboard = aml.leaderboard.as_data_frame()
+    h2o.shutdown(prompt=False)
+    return leaderboard, seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local_automl.LocalAutoML against its time budget")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--features', type=int, default=20)
+    parser.add_argument('--budget', type=int, default=60)
+    parser.add_argument('--candidates', type=int, default=27)
+    args = parser.parse_args()
+
+    frame = synthetic_frame(args.rows, args.features)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        aml = LocalAutoML(max_runtime_secs=args.budget, n_candidates=args.candidates, results_dir=tmp)
+        _, seconds = timed(aml.train, frame)
+        print(aml.leaderboard.head(5))
+        print(aml.history.groupby('folds').size().rename('candidates'))
+        print(f"LocalAutoML: {seconds:.1f} s of {args.budget} s budget, peak RSS {aml.peak_mb:.0f} MB,"
+              f" leader {aml.leader_id}")
+
+        if importlib.util.find_spec('h2o') is not None:
+            leaderboard, h2o_seconds = run_h2o(frame, args.budget, aml.seed)
+            print(leaderboard.head(5))
+            print(f"H2OAutoML:   {h2o_seconds:.1f} s of {args.budget} s budget, leader {leaderboard.iloc[0, 0]}")
+
+if __name__ == "__main__":
+    main()
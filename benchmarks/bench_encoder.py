@@ -0,0 +1,73 @@
+import argparse
+import random
+
+import numpy as np
+
+from common import timed
+from embedding_store import MODEL_NAME, MAX_LENGTH, herbert_encoder, cpu_herbert_encoder
+import mock_otomoto_server
+
+# Texts/s of the HerBERT [CLS] embedding step on CPU: the 2-7.ipynb loop
+# (fixed batches of 128, padded to the longest text) against the
+# length-bucketed encoder in fp32 and with dynamic int8 quantisation, plus the
+# cosine similarity of each variant's vectors to the fp32 baseline. Pass
+# --parquet cars_with_embeddings.parquet to use real Textual_Input values.
+
+def synthetic_texts(count, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for offer_id in range(count):
+        advert = mock_otomoto_server.make_advert(offer_id)
+        details = {d['key']: d['value'] for d in advert['details']}
+        sentences = advert['description'].replace('<p>', '').split('</p>')
+        texts.append(
+            f"{details['make']} {details['model']}, {rng.randint(1, 20)} lat, {details['fuel_type'].lower()}, "
+            f"przebieg {rng.randint(1, 300)} tys. km, {details['engine_power']}, "
+            f"skrzynia {details['gearbox'].lower()}, napęd {details['transmission'].lower()}. "
+            f"Wyposażenie: brak danych. Opis: {' '.join(sentences[:rng.randint(0, len(sentences))])}"
+        )
+    return texts
+
+def in_fixed_batches(encode, texts, batch_size=128):
+    return np.vstack([encode(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+
+def cosine(a, b):
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+def run(name, fn, texts, reference=None):
+    vectors, elapsed = timed(fn, texts)
+    line = f"{name:<22} {len(texts) / elapsed:8.1f} texts/s"
+    if reference is not None:
+        similarity = cosine(vectors, reference)
+        line += f"   cosine mean {similarity.mean():.5f}  min {similarity.min():.5f}"
+    print(line)
+    return vectors, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU HerBERT embedding")
+    parser.add_argument('--count', type=int, default=1024)
+    parser.add_argument('--parquet', help="Parquet file with a Textual_Input column")
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--max-tokens', type=int, default=8192)
+    args = parser.parse_args()
+
+    if args.parquet:
+        import pandas as pd
+        texts = pd.read_parquet(args.parquet, columns=['Textual_Input'])['Textual_Input'].head(args.count).tolist()
+    else:
+        texts = synthetic_texts(args.count)
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+    print(f"{len(texts)} texts, {np.mean([len(t) for t in texts]):.0f} characters on average")
+
+    notebook_encode = herbert_encoder(MODEL_NAME, device='cpu', max_length=MAX_LENGTH)
+    reference, base_s = run('fp32, batches of 128', lambda t: in_fixed_batches(notebook_encode, t), texts)
+    for name, quantize in (('fp32, length buckets', False), ('int8, length buckets', True)):
+        encode = cpu_herbert_encoder(MODEL_NAME, MAX_LENGTH, quantize=quantize, threads=args.threads,
+                                     max_tokens=args.max_tokens)
+        _, elapsed = run(name, encode, texts, reference)
+        print(f"{'':<22} {base_s / elapsed:.1f}x the notebook loop")
+
+if __name__ == "__main__":
+    main()
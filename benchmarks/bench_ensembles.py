@@ -0,0 +1,70 @@
+import argparse
+import tempfile
+
+import numpy as np
+from scipy.optimize import nnls
+from sklearn.linear_model import Ridge
+
+from common import timed
+from prediction_store import PredictionStore, compare_ensembles, fit_greedy, fit_nnls, fit_ridge
+
+# Blending dozens of stored models: prediction_store's NNLS, ridge stacker and
+# greedy ensemble selection (all solved from the models x models Gram matrix)
+# against scipy nnls and scikit-learn Ridge on the full OOF matrix and a
+# greedy selection that scores every candidate with a pass over all rows,
+# checking that the weights agree. Then the whole compare_ensembles over a
+# temporary predictions/ store (read, align, fit and cross-fit every blender).
+
+def synthetic_predictions(rows, models, seed=0):
+    """Target and correlated model predictions of varying quality, with cv_fold ids"""
+    rng = np.random.default_rng(seed)
+    y = rng.normal(10, 1, rows)
+    shared = rng.normal(size=rows)
+    noise = rng.uniform(0.1, 0.6, models)
+    oof = y[:, None] + 0.2 * shared[:, None] + rng.normal(size=(rows, models)) * noise
+    return y, oof, rng.integers(0, 5, rows)
+
+def row_pass_greedy(oof, y, rounds=50):
+    counts, total = np.zeros(oof.shape[1]), np.zeros(len(y))
+    best_error, best_counts = np.inf, counts
+    for step in range(1, rounds + 1):
+        errors = (((total[:, None] + oof) / step - y[:, None]) ** 2).sum(axis=0)
+        chosen = int(np.argmin(errors))
+        counts[chosen] += 1
+        total += oof[:, chosen]
+        if errors[chosen] < best_error:
+            best_error, best_counts = errors[chosen], counts.copy()
+    return best_counts / best_counts.sum()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OOF blending with prediction_store.py")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--models', type=int, default=40)
+    args = parser.parse_args()
+
+    y, oof, folds = synthetic_predictions(args.rows, args.models)
+    print(f"{args.rows} OOF rows x {args.models} models")
+
+    pairs = [("NNLS", lambda: nnls(oof, y)[0], lambda: fit_nnls(oof, y).weights.to_numpy()),
+             ("Ridge", lambda: Ridge(alpha=1.0).fit(oof, y).coef_, lambda: fit_ridge(oof, y).weights.to_numpy()),
+             ("Greedy", lambda: row_pass_greedy(oof, y), lambda: fit_greedy(oof, y).weights.to_numpy())]
+    for label, baseline, fast in pairs:
+        expected, baseline_seconds = timed(baseline, repeat=3)
+        weights, seconds = timed(fast, repeat=3)
+        assert np.allclose(weights, expected, atol=1e-6), f"{label} weights differ"
+        print(f"{label:<7} full matrix {baseline_seconds * 1000:9.1f} ms   Gram {seconds * 1000:8.1f} ms"
+              f"   {baseline_seconds / seconds:6.1f}x")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test = np.random.default_rng(1).random(args.rows) < 0.2
+        rows = np.arange(args.rows)
+        store = PredictionStore(tmp, reference=(np.where(test, -1, folds), y))
+        for i in range(args.models):
+            store.write(f"model_{i}", rows[~test], folds[~test], oof[~test, i], y[~test])
+            store.write(f"model_{i}", rows[test], -1, oof[test, i], y[test])
+        (table, _), seconds = timed(compare_ensembles, store)
+        print(table.head(5))
+        print(f"compare_ensembles over {args.models} stored models: {seconds:.2f} s")
+
+if __name__ == "__main__":
+    main()
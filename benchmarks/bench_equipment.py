@@ -0,0 +1,79 @@
+import argparse
+import ast
+import json
+import random
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MultiLabelBinarizer
+
+from common import timed
+from equipment_encoding import (EQUIPMENT_COLUMNS, EquipmentVocabulary, encode_equipment, equipment_desc_from_frame,
+                                equipment_frame, pack_bits)
+
+# Compares the MultiLabelBinarizer + iterrows equipment steps of 2-7.ipynb with
+# equipment_encoding.py on synthetic Equipment_* JSON-list columns, checking
+# both give the same features and Equipment_Desc.
+
+def make_frame(rows, labels_per_column, seed=0):
+    rng = random.Random(seed)
+    labels = {column: [f"Opcja {column[10:]} {i}" for i in range(labels_per_column)] for column in EQUIPMENT_COLUMNS}
+    data = {}
+    for column in EQUIPMENT_COLUMNS:
+        data[column] = [
+            json.dumps(rng.sample(labels[column], rng.randint(0, labels_per_column // 2)), ensure_ascii=False)
+            if rng.random() > 0.05 else np.nan
+            for _ in range(rows)
+        ]
+    return pd.DataFrame(data)
+
+def notebook_encoding(df):
+    equipment_dfs = []
+    for column in EQUIPMENT_COLUMNS:
+        parsed_equipment = df[column].fillna("[]").apply(ast.literal_eval)
+        mlb = MultiLabelBinarizer(sparse_output=False)
+        equipment_matrix = mlb.fit_transform(parsed_equipment)
+        feature_names = [f"{column}_{item.strip().replace(' ', '_')}" for item in mlb.classes_]
+        equipment_dfs.append(pd.DataFrame(equipment_matrix, columns=feature_names, index=df.index))
+    return pd.concat(equipment_dfs, axis=1)
+
+def notebook_desc(df, columns):
+    equipment_summaries = []
+    for i, row in df[columns].iterrows():
+        items = [col.replace("Equipment_", "").replace("_", " ") for col in columns if row[col] == 1]
+        equipment_summaries.append(", ".join(items) if items else "brak danych")
+    return equipment_summaries
+
+def module_encoding(df):
+    vocabulary = EquipmentVocabulary.fit(df)
+    return vocabulary, encode_equipment(df, vocabulary)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark equipment one-hot encoding and Equipment_Desc")
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--labels', type=int, default=35, help="Distinct labels per equipment column")
+    parser.add_argument('--desc-rows', type=int, default=10000, help="Rows for the slow iterrows Equipment_Desc baseline")
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.labels)
+    dense, dense_s = timed(notebook_encoding, df)
+    (vocabulary, matrix), sparse_s = timed(module_encoding, df)
+    frame = equipment_frame(matrix, vocabulary.feature_names, df.index)
+    assert list(frame.columns) == list(dense.columns) and (frame.to_numpy() == dense.to_numpy()).all()
+
+    sample = dense.head(args.desc_rows)
+    columns = list(sample.columns)
+    expected, iterrows_s = timed(notebook_desc, sample, columns)
+    summaries, vector_s = timed(equipment_desc_from_frame, sample, columns)
+    assert list(summaries) == expected
+
+    csr_mb = (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1e6
+    print(f"{args.rows} rows, {len(columns)} equipment features")
+    print(f"encoding        MultiLabelBinarizer {dense_s:6.2f} s   CSR {sparse_s:6.2f} s   {dense_s / sparse_s:.1f}x")
+    print(f"memory          dense int64 {dense.to_numpy().nbytes / 1e6:7.1f} MB   CSR {csr_mb:6.1f} MB   "
+          f"bit-packed {pack_bits(matrix).nbytes / 1e6:5.1f} MB")
+    print(f"Equipment_Desc  iterrows {iterrows_s:6.2f} s   vectorised {vector_s:6.3f} s   "
+          f"{iterrows_s / vector_s:.0f}x ({len(sample)} rows)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import timed
+from feature_store import FeatureStore
+
+# Disk size and load time of the cars_ready_* family as 2-7/2-8 used to write it
+# (one full Parquet file per dataset, float64 embeddings and int64 flags) against
+# feature_store.py (each feature group once, narrowed, datasets read as column
+# projections). The frame is synthetic, with the shapes of the real datasets.
+
+CONTINUOUS = ["Mileage", "Log_Mileage", "Age", "Log_Age", "Mileage_per_Year", "Engine_Power", "Engine_Capacity",
+              "Power_per_Liter"]
+BINARY = ["No_Accidents", "Service_Record", "Is_Imported", "First_Owner", "Professional_Seller"]
+CATEGORICAL = ["Make", "Make_Model", "Body_Type", "Fuel_Type", "Gearbox", "Transmission"]
+
+def synthetic_groups(rows, embedding, onehot, equipment, seed=0):
+    rng = np.random.default_rng(seed)
+    groups = {
+        'continuous_scaled': pd.DataFrame(rng.normal(size=(rows, len(CONTINUOUS))), columns=CONTINUOUS),
+        'binary': pd.DataFrame(rng.integers(0, 2, (rows, len(BINARY))), columns=BINARY),
+        'onehot': pd.DataFrame(rng.random((rows, onehot)) < 0.02, columns=[f"Make_{i}" for i in range(onehot)]
+                               ).astype(np.int64),
+        'equipment': pd.DataFrame(rng.random((rows, equipment)) < 0.3,
+                                  columns=[f"Equipment_{i}" for i in range(equipment)]).astype(np.int64),
+        'desc_emb': pd.DataFrame(rng.normal(size=(rows, embedding)), columns=[f"desc_emb_{i}" for i in range(embedding)]),
+        'target_encoded': pd.DataFrame(rng.normal(10, 1, (rows, len(CATEGORICAL))), columns=CATEGORICAL),
+        'desc_pca': pd.DataFrame(rng.normal(size=(rows, 50)), columns=[f"desc_pca_{i}" for i in range(50)]),
+    }
+    cv_fold = rng.integers(-1, 5, rows)
+    groups['target'] = pd.DataFrame({'Log_Price': rng.normal(10, 1, rows), 'cv_fold': cv_fold,
+                                     'split': np.where(cv_fold == -1, 'test', 'train')})
+    return groups
+
+def dataset_parts(groups):
+    top_50 = list(groups['equipment'].columns[:50])
+    return {
+        'LinearRegression': [('continuous_scaled', None), ('binary', None), ('onehot', None), ('equipment', None),
+                             ('desc_emb', None), ('target', None)],
+        'DecisionTree': [('continuous_scaled', None), ('binary', None), ('target_encoded', None),
+                         ('equipment', None), ('desc_emb', None), ('target', None)],
+        'LinearRegression_small': [('continuous_scaled', None), ('binary', None), ('onehot', None),
+                                   ('equipment', top_50), ('target', None), ('desc_pca', None)],
+        'DecisionTree_small': [('continuous_scaled', None), ('binary', None), ('target_encoded', None),
+                               ('equipment', top_50), ('target', None), ('desc_pca', None)],
+    }
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cars_ready_* files against the feature store")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--embedding', type=int, default=768)
+    parser.add_argument('--onehot', type=int, default=900, help="One-hot Make/Make_Model/... columns")
+    parser.add_argument('--equipment', type=int, default=150)
+    args = parser.parse_args()
+
+    groups = synthetic_groups(args.rows, args.embedding, args.onehot, args.equipment)
+    datasets = dataset_parts(groups)
+    with tempfile.TemporaryDirectory() as legacy_dir, tempfile.TemporaryDirectory() as store_dir:
+        def write_legacy():
+            for name, parts in datasets.items():
+                frame = pd.concat([groups[group] if columns is None else groups[group][columns]
+                                   for group, columns in parts], axis=1)
+                frame.to_parquet(os.path.join(legacy_dir, f"cars_ready_{name}.parquet"), index=False)
+
+        def write_store():
+            store = FeatureStore(store_dir)
+            store.clear()
+            for group, frame in groups.items():
+                store.write_group(group, frame, dtype=bool if group in ('onehot', 'equipment') else None)
+            for name, parts in datasets.items():
+                store.define_dataset(name, parts)
+            return store
+
+        _, legacy_write_s = timed(write_legacy)
+        store, store_write_s = timed(write_store)
+        legacy_mb = directory_size(legacy_dir) / 1e6
+        store_mb = directory_size(store_dir) / 1e6
+        print(f"{args.rows} rows, {len(datasets)} datasets")
+        print(f"{'':<24} {'write s':>8} {'disk MB':>9}")
+        print(f"{'cars_ready_*.parquet':<24} {legacy_write_s:8.2f} {legacy_mb:9.1f}")
+        print(f"{'feature store':<24} {store_write_s:8.2f} {store_mb:9.1f}   {legacy_mb / store_mb:.1f}x smaller")
+
+        print(f"\n{'load':<24} {'legacy s':>8} {'store s':>9} {'legacy MB':>10} {'store MB':>9}")
+        for name in datasets:
+            legacy, legacy_s = timed(pd.read_parquet, os.path.join(legacy_dir, f"cars_ready_{name}.parquet"))
+            frame, store_s = timed(store.dataset, name)
+            assert list(frame.columns) == list(legacy.columns)
+            assert np.allclose(frame.select_dtypes('number').to_numpy(np.float64),
+                               legacy.select_dtypes('number').to_numpy(np.float64), atol=1e-5)
+            print(f"{name:<24} {legacy_s:8.2f} {store_s:9.2f} {legacy.memory_usage().sum() / 1e6:10.1f} "
+                  f"{frame.memory_usage().sum() / 1e6:9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from common import timed
+from fold_cache import FoldCache
+
+# Fold preparation time of the 3-1.ipynb pattern (split on cv_fold, drop NaN
+# rows, refit StandardScaler and slice X_train[train_idx] for every model and
+# fold) against fold_cache.py: one build, then memory-mapped loads. Pass
+# --parquet cars_ready_LinearRegression_small.parquet to use the real dataset.
+
+def synthetic_frame(rows, features, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(rng.normal(size=(rows, features)), columns=[f"f{i}" for i in range(features)])
+    frame.iloc[rng.choice(rows, rows // 100), 0] = np.nan
+    frame['Log_Price'] = rng.normal(10, 1, rows)
+    frame['cv_fold'] = rng.integers(-1, 5, rows)
+    frame['split'] = np.where(frame['cv_fold'] == -1, 'test', 'train')
+    return frame
+
+def notebook_folds(frame, models):
+    checksum = 0.0
+    for _ in range(models):
+        train_df = frame[frame["cv_fold"] != -1].copy()
+        X_train = train_df.drop(columns=["Log_Price", "cv_fold", "split"])
+        y_train = train_df["Log_Price"]
+        cv_fold = train_df["cv_fold"]
+        mask_valid = X_train.notna().all(axis=1)
+        X_train, y_train, cv_fold = X_train[mask_valid], y_train[mask_valid], cv_fold[mask_valid]
+        for fold in sorted(cv_fold.unique()):
+            train_idx = cv_fold != fold
+            scaler = StandardScaler().fit(X_train[train_idx])
+            X_fold_train = scaler.transform(X_train[train_idx])
+            X_fold_val = scaler.transform(X_train[~train_idx])
+            checksum += X_fold_train[0, 0] + X_fold_val[0, 0] + y_train[train_idx].iloc[0]
+    return checksum
+
+def cached_folds(frame, models, cache_dir):
+    cache = FoldCache.build(frame, scale_columns='all', cache_dir=cache_dir)
+    checksum = 0.0
+    for _ in range(models):
+        for _, data in cache:
+            checksum += data.X_train[0, 0] + data.X_val[0, 0] + data.y_train[0]
+    return checksum
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fold matrix preparation")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--features', type=int, default=120)
+    parser.add_argument('--models', type=int, default=6, help="Models evaluated on the same folds")
+    parser.add_argument('--parquet', help="Prepared cars_ready_*.parquet file")
+    args = parser.parse_args()
+
+    if args.parquet:
+        frame = pd.read_parquet(args.parquet).drop(columns=['Price'], errors='ignore')
+    else:
+        frame = synthetic_frame(args.rows, args.features)
+    print(f"{len(frame)} rows, {frame.shape[1] - 3} features, {args.models} models")
+
+    expected, notebook_s = timed(notebook_folds, frame, args.models)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        result, cold_s = timed(cached_folds, frame, args.models, cache_dir)
+        _, warm_s = timed(cached_folds, frame, args.models, cache_dir)
+    assert np.isclose(result, expected, rtol=1e-4)
+    print(f"{'notebook, per model':<24} {notebook_s:7.2f} s")
+    print(f"{'fold_cache, cold':<24} {cold_s:7.2f} s   {notebook_s / cold_s:.1f}x")
+    print(f"{'fold_cache, warm':<24} {warm_s:7.2f} s   {notebook_s / warm_s:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT
+import mock_otomoto_server
+from record_log import RecordLog, RECORDS_FILE
+
+# Peak memory of 2-4.py in full and --stream mode over synthetic record logs of
+# growing size. Each run is a fresh process, measured with os.wait4 so the peak
+# RSS belongs to that run alone. Full mode should grow with the dataset while
+# --stream stays flat for a fixed --chunk-size.
+
+def build_records(directory, count):
+    with RecordLog(os.path.join(directory, RECORDS_FILE)) as log:
+        batch = []
+        for offer_id in range(count):
+            advert = mock_otomoto_server.make_advert(offer_id)
+            batch.append((mock_otomoto_server.offer_url(offer_id),
+                          json.dumps({'advert': advert}, ensure_ascii=False, separators=(',', ':'))))
+            if len(batch) >= 1000:
+                log.append_many(batch)
+                batch = []
+        log.append_many(batch)
+
+def run_pipeline(directory, extra_args):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, '2-4.py'), *extra_args],
+                                   cwd=directory, stdout=devnull, stderr=subprocess.PIPE)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        error = process.stderr.read().decode()
+        process.stderr.close()
+    if process.returncode != 0:
+        raise RuntimeError(f"2-4.py {' '.join(extra_args)} failed:\n{error}")
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = usage.ru_maxrss / 1024 if sys.platform != 'darwin' else usage.ru_maxrss / 1024 ** 2
+    return peak, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of the 2-4.py pipeline")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 40000], help="Listings per synthetic dataset")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'listings':>10} {'full MB':>10} {'full s':>8} {'stream MB':>10} {'stream s':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            build_records(directory, size)
+            full_mb, full_s = run_pipeline(directory, [])
+            stream_mb, stream_s = run_pipeline(directory, ['--stream', '--chunk-size', str(args.chunk_size)])
+        print(f"{size:>10} {full_mb:>10.0f} {full_s:>8.1f} {stream_mb:>10.0f} {stream_s:>9.1f}")
+
+if __name__ == "__main__":
+    main()
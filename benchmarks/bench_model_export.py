@@ -0,0 +1,110 @@
+import argparse
+import importlib.util
+import os
+import tempfile
+
+import numpy as np
+import torch
+from torch import nn
+
+from common import timed
+from model_export import CPURunner, eager_predict, export_model, late_fusion
+
+# Rows/s of CPU scoring for the three neural architectures of 3-3, 3-6 and
+# 3-7 (randomly initialised, same layer layout as in the notebooks): the eager
+# model as the notebooks call it, against the exported TorchScript graph in
+# fp32 and with dynamic int8 quantisation (and ONNX Runtime when installed).
+# Every export is checked against the eager predictions.
+
+class MLP(nn.Module):
+    def __init__(self, input_dim, hidden_dims=[512, 256, 128], dropout=0.1):
+        super().__init__()
+        layers, dims = [], [input_dim] + hidden_dims
+        for i in range(len(hidden_dims)):
+            layers += [nn.Linear(dims[i], dims[i + 1]), nn.BatchNorm1d(dims[i + 1]), nn.ReLU(), nn.Dropout(dropout)]
+        layers.append(nn.Linear(dims[-1], 1))
+        self.model = nn.Sequential(*layers)
+
+    def forward(self, x):
+        return self.model(x)
+
+class EarlyFusionRegressor(nn.Module):
+    def __init__(self, struct_dim, text_dim=50, hidden_dims=[512, 256, 128], dropout=0.3):
+        super().__init__()
+        self.struct_branch = nn.Sequential(nn.Linear(struct_dim, hidden_dims[0]), nn.ReLU(),
+                                           nn.LayerNorm(hidden_dims[0]))
+        self.text_branch = nn.Sequential(nn.Linear(text_dim, hidden_dims[0]), nn.ReLU(), nn.LayerNorm(hidden_dims[0]))
+        self.combined = nn.Sequential(
+            nn.Linear(hidden_dims[0] * 2, hidden_dims[1]), nn.ReLU(), nn.LayerNorm(hidden_dims[1]), nn.Dropout(dropout),
+            nn.Linear(hidden_dims[1], hidden_dims[2]), nn.ReLU(), nn.Dropout(dropout),
+            nn.Linear(hidden_dims[2], 1))
+
+    def forward(self, x_struct, x_text):
+        return self.combined(torch.cat([self.struct_branch(x_struct), self.text_branch(x_text)], dim=1))
+
+class SimpleMLP(nn.Module):
+    def __init__(self, input_dim, hidden_dims=[256, 128], dropout=0.3):
+        super().__init__()
+        self.model = nn.Sequential(
+            nn.Linear(input_dim, hidden_dims[0]), nn.ReLU(), nn.LayerNorm(hidden_dims[0]), nn.Dropout(dropout),
+            nn.Linear(hidden_dims[0], hidden_dims[1]), nn.ReLU(), nn.Dropout(dropout),
+            nn.Linear(hidden_dims[1], 1))
+
+    def forward(self, x):
+        return self.model(x)
+
+def notebook_predict(model):
+    """The notebooks' scoring: all rows as one tensor under torch.no_grad"""
+    model = model.cpu().eval()
+
+    def predict(*arrays):
+        with torch.no_grad():
+            return model(*[torch.tensor(x) for x in arrays]).numpy().flatten()
+    return predict
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark exported MLP / fusion models on CPU")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--struct-dim', type=int, default=300, help="Structured features (LinearRegression_small)")
+    parser.add_argument('--text-dim', type=int, default=50, help="desc_pca_* components")
+    parser.add_argument('--batch-size', type=int, default=4096)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    x_struct = rng.standard_normal((args.rows, args.struct_dim), dtype=np.float32)
+    x_text = rng.standard_normal((args.rows, args.text_dim), dtype=np.float32)
+    mlp = MLP(args.struct_dim)
+    # Non-trivial BatchNorm statistics, as after training
+    mlp.train()
+    with torch.no_grad():
+        mlp(torch.tensor(x_struct[:4096]))
+    models = [("MLP (3-3)", mlp, (x_struct,)),
+              ("EarlyFusion (3-6)", EarlyFusionRegressor(args.struct_dim, args.text_dim), (x_struct, x_text)),
+              ("LateFusion (3-7)", late_fusion(SimpleMLP(args.struct_dim), SimpleMLP(args.text_dim)),
+               (x_struct, x_text))]
+    formats = ['torchscript'] + (['onnx'] if importlib.util.find_spec('onnxruntime') else [])
+
+    print(f"{args.rows} rows, batch {args.batch_size}, {args.threads or torch.get_num_threads()} threads")
+    print(f"{'':<32} {'rows/s':>10} {'speedup':>8} {'max |diff|':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, model, arrays in models:
+            reference = eager_predict(model, *arrays)
+            _, base_s = timed(notebook_predict(model), *arrays, repeat=3)
+            print(f"{name + ', eager':<32} {args.rows / base_s:10.0f} {1.0:8.2f}")
+            for format in formats:
+                path = os.path.join(tmp, f"{name.split()[0]}_{format}")
+                export_model(model, arrays, path, format=format, quantize=format == 'torchscript')
+                variants = [('fp32', False)] + ([('int8', True)] if format == 'torchscript' else [])
+                for label, quantized in variants:
+                    runner = CPURunner(path, quantized=quantized, threads=args.threads, batch_size=args.batch_size)
+                    predictions, elapsed = timed(runner.predict, *arrays, repeat=3)
+                    difference = float(np.max(np.abs(predictions - reference)))
+                    if not quantized:
+                        assert difference < 1e-4, f"{name} {format} differs by {difference:.2e}"
+                    print(f"{f'{name}, {format} {label}':<32} {args.rows / elapsed:10.0f} {base_s / elapsed:8.2f} "
+                          f"{difference:11.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+from common import ROOT, load_script
+import mock_otomoto_server
+
+# Compares the regex + json path of 2-3.py with the byte-search + orjson path
+# over saved listing pages. Pass --fixtures with real pages saved from otomoto;
+# otherwise synthetic pages from the mock server are generated once.
+
+DEFAULT_FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures', 'html')
+
+def ensure_fixtures(path, count):
+    pages = sorted(glob.glob(os.path.join(path, '*.html')))
+    if pages:
+        return pages
+    os.makedirs(path, exist_ok=True)
+    print(f"Generating {count} synthetic listing pages in {path}")
+    for offer_id in range(count):
+        with open(os.path.join(path, f"offer_{offer_id}.html"), 'w', encoding='utf-8') as f:
+            f.write(mock_otomoto_server.render_offer_page(offer_id))
+    return sorted(glob.glob(os.path.join(path, '*.html')))
+
+def regex_path(scraper, body):
+    # response.text decodes the whole page before the regex runs
+    json_data = scraper.extract_json_data(body.decode('utf-8'))
+    return scraper.extract_details_from_json(json_data)
+
+def bytes_path(scraper, body):
+    return scraper.extract_ad_json(body)
+
+def run(name, fn, scraper, bodies, repeat):
+    latencies = []
+    stored = 0
+    for _ in range(repeat):
+        stored = 0
+        for body in bodies:
+            start = time.perf_counter()
+            details = fn(scraper, body)
+            latencies.append(time.perf_counter() - start)
+            stored += len(details['raw_json'].encode('utf-8'))
+    total_mb = sum(len(b) for b in bodies) * repeat / 1e6
+    total_s = sum(latencies)
+    latencies.sort()
+    print(f"{name:<14} {total_mb / total_s:8.1f} MB/s   "
+          f"p50 {statistics.median(latencies) * 1000:7.2f} ms   "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.2f} ms   "
+          f"stored {stored / len(bodies) / 1024:7.1f} KB/page")
+    return total_s
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark __NEXT_DATA__ extraction")
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES, help="Directory of saved listing .html pages")
+    parser.add_argument('--count', type=int, default=50, help="Synthetic pages to generate if the directory is empty")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    scraper = load_script('2-3.py')
+    pages = ensure_fixtures(args.fixtures, args.count)
+    bodies = []
+    for page in pages:
+        with open(page, 'rb') as f:
+            bodies.append(f.read())
+    print(f"{len(bodies)} pages, {sum(len(b) for b in bodies) / len(bodies) / 1024:.0f} KB average")
+
+    # Both paths must hand 2-4.py the same listing
+    for body in bodies:
+        old = json.loads(regex_path(scraper, body)['raw_json'])
+        new = json.loads(bytes_path(scraper, body)['raw_json'])
+        assert old.get('advert', old) == new.get('advert', new), "extraction paths disagree"
+
+    regex_s = run('regex + json', regex_path, scraper, bodies, args.repeat)
+    bytes_s = run('bytes + orjson', bytes_path, scraper, bodies, args.repeat)
+    print(f"Speed-up: {regex_s / bytes_s:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import contextlib
+import json
+import os
+
+import pandas as pd
+
+from common import load_script, timed
+import mock_otomoto_server
+from listing_parser import parse_json_fields_fast
+
+# Compares the row-by-row parse_json_fields of 2-4.py with the columnar parser
+# in listing_parser.py on a synthetic corpus of adverts from the mock server,
+# and checks both give the same cars_subset.
+
+def make_corpus(count):
+    rows = []
+    for offer_id in range(count):
+        raw_json = json.dumps({'advert': mock_otomoto_server.make_advert(offer_id)}, ensure_ascii=False, separators=(',', ':'))
+        rows.append((mock_otomoto_server.offer_url(offer_id), raw_json))
+    # A listing without data and one with broken JSON, as found in real scrapes
+    rows.append(('https://www.otomoto.pl/osobowe/oferta/brak-ID0.html', None))
+    rows.append(('https://www.otomoto.pl/osobowe/oferta/zly-ID0.html', '{"advert": '))
+    return pd.DataFrame(rows, columns=['url', 'raw_json'])
+
+def quiet(fn, *args, **kwargs):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return fn(*args, **kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark listing JSON parsing")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pipeline = load_script('2-4.py')
+    df = make_corpus(args.rows)
+    print(f"{len(df)} rows, {df['raw_json'].str.len().sum() / 1e6:.1f} MB of JSON")
+
+    legacy, legacy_s = timed(quiet, pipeline.parse_json_fields, df, repeat=args.repeat)
+    fast, fast_s = timed(quiet, parse_json_fields_fast, df, repeat=args.repeat)
+    parallel, parallel_s = timed(quiet, parse_json_fields_fast, df, workers=args.workers, repeat=args.repeat)
+
+    # Typed columns must not change what 2-4.py saves
+    expected = quiet(pipeline.create_cars_subset, legacy).reset_index(drop=True)
+    for result in (fast, parallel):
+        subset = quiet(pipeline.create_cars_subset, result).reset_index(drop=True)
+        pd.testing.assert_frame_equal(expected, subset, check_dtype=False)
+
+    print(f"{'legacy':<20} {len(df) / legacy_s:10.0f} rows/s")
+    print(f"{'columnar':<20} {len(df) / fast_s:10.0f} rows/s   {legacy_s / fast_s:.1f}x")
+    print(f"{f'columnar x{args.workers}':<20} {len(df) / parallel_s:10.0f} rows/s   {legacy_s / parallel_s:.1f}x")
+
+if __name__ == "__main__":
+    main()
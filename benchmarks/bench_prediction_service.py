@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+
+from common import timed
+from equipment_encoding import EquipmentVocabulary, encode_equipment, equipment_frame
+from feature_store import FeatureStore
+from mock_otomoto_server import make_advert
+from prediction_service import CATEGORICAL, PricePredictor, clean_listings, normalize_listing, save_bundle, \
+    start_in_background
+import prediction_service
+
+# Latency of prediction_service.py over HTTP. A small cars_features/ store is
+# built from the mock server's synthetic adverts with the same parsing and
+# cleaning, a Ridge model is fitted on its continuous, binary, one-hot and
+# equipment groups and saved with save_bundle, and concurrent clients post
+# single listings. Reports p50/p99 per request without micro-batching, with
+# micro-batching, and with the feature cache warm.
+
+def build_store(adverts, store_path, vocabulary_path):
+    listings = [normalize_listing(advert) for advert in adverts]
+    script = prediction_service._parsing_script()
+    frame = pd.DataFrame({'url': [f"offer-{advert['id']}" for advert in adverts],
+                          'raw_json': [json.dumps({'advert': listing['advert']}) for listing in listings]})
+    parsed = prediction_service.parse_records(frame['url'], frame['raw_json']).reindex(
+        columns=script.SELECTED_COLUMNS, fill_value='')
+    cars = clean_listings(script.create_cars_subset(parsed, verbose=False))
+    cars = cars[cars['Fuel_Type'].notna()].reset_index(drop=True)
+    cars['Log_Price'] = np.log1p(cars['Price'])
+    cars['cv_fold'] = np.arange(len(cars)) % 5
+    cars['split'] = 'train'
+
+    vocabulary = EquipmentVocabulary.fit(cars)
+    vocabulary.save(vocabulary_path)
+    equipment = equipment_frame(encode_equipment(cars, vocabulary), vocabulary.feature_names)
+    continuous = cars[prediction_service.CONTINUOUS_BASE]
+    scaled = (continuous - continuous.mean()) / continuous.std(ddof=0)
+
+    store = FeatureStore(store_path)
+    store.clear()
+    store.write_group('continuous', continuous)
+    store.write_group('continuous_scaled', scaled)
+    store.write_group('binary', cars[["No_Accidents", "Service_Record", "Is_Imported", "First_Owner",
+                                      "Professional_Seller"]])
+    store.write_group('onehot', pd.get_dummies(cars[CATEGORICAL], prefix=CATEGORICAL).astype(int), dtype=bool)
+    store.write_group('equipment', equipment, dtype=bool)
+    store.write_group('categorical', cars[["Make", "Model", "Body_Type", "Fuel_Type", "Gearbox", "Transmission"]])
+    store.write_group('target', cars[['Log_Price', 'cv_fold', 'split']])
+    parts = [('continuous_scaled', None), ('binary', None), ('onehot', None), ('equipment', None)]
+    store.define_dataset('serving', parts + [('target', None)])
+    return store, [column for group, _ in parts for column in store.columns(group)]
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+def load_test(base_url, adverts, clients):
+    """Per-request latencies of `clients` threads posting adverts one at a time"""
+    latencies = []
+    lock = threading.Lock()
+    chunks = [adverts[i::clients] for i in range(clients)]
+
+    def client(chunk):
+        for advert in chunk:
+            start = time.perf_counter()
+            post(f"{base_url}/predict", advert)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(chunk,)) for chunk in chunks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prediction_service.py latency")
+    parser.add_argument('--train', type=int, default=5000, help="Synthetic adverts in the feature store")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent HTTP clients")
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store, features = build_store([make_advert(i) for i in range(args.train)], os.path.join(tmp, 'store'),
+                                      os.path.join(tmp, 'vocabulary.json'))
+        data = store.dataset('serving')
+        model = Ridge(alpha=1.0).fit(data[features].to_numpy(np.float32), data['Log_Price'])
+        bundle = os.path.join(tmp, 'bundle')
+        save_bundle(model, features, 'serving', bundle, store_path=store.path,
+                    vocabulary_path=os.path.join(tmp, 'vocabulary.json'))
+
+        predictor, load_s = timed(PricePredictor, bundle, args.requests)
+        print(f"Bundle with {len(features)} features loaded in {load_s:.2f} s")
+        adverts = [make_advert(args.train + i) for i in range(args.requests)]
+        # The service rebuilds the training rows' features exactly
+        served = [result for result in predictor.predict([make_advert(i) for i in range(200)]) if 'error' not in result]
+        expected = model.predict(data[features].to_numpy(np.float32)[:len(served)])
+        assert np.allclose([result['Log_Price'] for result in served], expected, atol=1e-4)
+
+        print(f"{args.requests} requests, {args.clients} clients")
+        print(f"{'':<24} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+        for label, max_batch, clear in [("no batching", 1, True), ("micro-batching", args.max_batch, True),
+                                        ("micro-batching, cached", args.max_batch, False)]:
+            if clear:
+                predictor.feature_cache.items.clear()
+            server, base_url = start_in_background(predictor, port=0, max_batch=max_batch,
+                                                   max_wait=args.max_wait_ms / 1000 if max_batch > 1 else 0)
+            latencies, seconds = load_test(base_url, adverts, args.clients)
+            server.shutdown()
+            server.server_close()
+            p50, p99 = np.percentile(latencies * 1000, [50, 99])
+            print(f"{label:<24} {p50:8.2f} {p99:8.2f} {len(latencies) / seconds:8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LassoCV, RidgeCV
+from sklearn.metrics import r2_score
+from sklearn.tree import DecisionTreeRegressor
+
+from common import timed
+from fold_cache import FoldCache
+from regularization_path import (TREE_PARAMS, PathLassoCV, PathRidgeCV, best_ccp_alpha, candidate_ccp_alphas,
+                                 pruned_predictions)
+
+# The ccp_alpha search of 3-2.ipynb (one DecisionTreeRegressor per alpha and
+# fold) against regularization_path.best_ccp_alpha, and RidgeCV/LassoCV of
+# 3-1.ipynb against PathRidgeCV/PathLassoCV on every cv_fold, checking that
+# the selected alphas and predictions agree. Pass --parquet
+# cars_ready_DecisionTree_small.parquet to use a prepared dataset.
+
+def synthetic_frame(rows, features, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features))
+    X[:, 1] = np.round(X[:, 1])
+    frame = pd.DataFrame(X, columns=[f"f{i}" for i in range(features)])
+    frame['Log_Price'] = 2 * X[:, 0] + np.sin(3 * X[:, 2]) + X[:, 1] * X[:, 3] + rng.normal(0, 0.5, rows)
+    frame['cv_fold'] = rng.integers(-1, 5, rows)
+    frame['split'] = np.where(frame['cv_fold'] == -1, 'test', 'train')
+    return frame
+
+def refit_search(folds, ccp_alphas):
+    results = []
+    for alpha in ccp_alphas:
+        scores = []
+        for _, data in folds:
+            tree = DecisionTreeRegressor(**TREE_PARAMS, ccp_alpha=alpha).fit(data.X_train, data.y_train)
+            scores.append(r2_score(data.y_val, tree.predict(data.X_val)))
+        results.append((alpha, np.mean(scores)))
+    return max(results, key=lambda x: x[1])
+
+def fit_all(folds, make_model):
+    return [make_model().fit(data.X_train, data.y_train) for _, data in folds]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ccp_alpha and Ridge/Lasso hyperparameter paths")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--features', type=int, default=30)
+    parser.add_argument('--max-alphas', type=int, default=100)
+    parser.add_argument('--parquet', help="Prepared cars_ready_*.parquet file")
+    args = parser.parse_args()
+
+    frame = pd.read_parquet(args.parquet) if args.parquet else synthetic_frame(args.rows, args.features)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        folds = FoldCache.build(frame.drop(columns=['Price'], errors='ignore'), cache_dir=cache_dir)
+        test = folds.test()
+        ccp_alphas = candidate_ccp_alphas(test.X_train, test.y_train, max_alphas=args.max_alphas)
+        print(f"{len(test.X_train)} training rows, {len(folds.features)} features, {len(ccp_alphas)} ccp_alphas")
+
+        _, data = next(iter(folds))
+        tree = DecisionTreeRegressor(**TREE_PARAMS).fit(data.X_train, data.y_train)
+        predictions = pruned_predictions(tree, data.X_val, ccp_alphas)
+        for i in range(0, len(ccp_alphas), max(1, len(ccp_alphas) // 10)):
+            pruned = DecisionTreeRegressor(**TREE_PARAMS, ccp_alpha=ccp_alphas[i]).fit(data.X_train, data.y_train)
+            assert np.array_equal(pruned.predict(data.X_val), predictions[:, i])
+
+        path_best, path_s = timed(best_ccp_alpha, folds, ccp_alphas)
+        refit_best, refit_s = timed(refit_search, folds, ccp_alphas)
+        assert path_best[0] == refit_best[0]
+        print(f"{'ccp_alpha':<10} refit {refit_s:7.2f} s   path {path_s:6.2f} s   {refit_s / path_s:5.1f}x"
+              f"   best {path_best[0]:.6g}")
+
+        alphas = np.logspace(-4, 1, 20)
+        pairs = [
+            ('Ridge', lambda: RidgeCV(alphas=alphas, cv=5), lambda: PathRidgeCV(alphas=alphas, cv=5)),
+            ('Lasso', lambda: LassoCV(alphas=alphas, cv=5, max_iter=5000, random_state=42),
+             lambda: PathLassoCV(alphas=alphas, cv=5, max_iter=5000)),
+        ]
+        for name, make_sklearn, make_path in pairs:
+            expected, sklearn_s = timed(fit_all, folds, make_sklearn)
+            fitted, path_s = timed(fit_all, folds, make_path)
+            assert [m.alpha_ for m in expected] == [m.alpha_ for m in fitted]
+            gap = max(np.abs(a.predict(data.X_val) - b.predict(data.X_val)).max()
+                      for (_, data), a, b in zip(folds, expected, fitted))
+            print(f"{name:<10} sklearn {sklearn_s:5.2f} s   path {path_s:6.2f} s   {sklearn_s / path_s:5.1f}x"
+                  f"   same alphas, max prediction gap {gap:.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from common import timed
+from tensor_batches import TensorBatches
+
+# Samples/s of one training epoch's batching alone (each batch is only summed,
+# no model): the 3-5 loop (X_tr[idx] reshuffle copy per epoch plus
+# torch.tensor per batch), the MLP notebooks' DataLoader(TensorDataset,
+# shuffle=True) over a fold, and tensor_batches.TensorBatches with shuffled
+# gathers and with plain slice views. Batches of every variant are checked to
+# cover the same rows.
+
+def notebook_numpy_epoch(X, y, train_idx, batch_size, device):
+    X_tr, y_tr = X[train_idx], y[train_idx]
+    idx = np.random.permutation(len(X_tr))
+    X_tr, y_tr = X_tr[idx], y_tr[idx]
+    total = 0.0
+    for start in range(0, len(X_tr), batch_size):
+        xb = torch.tensor(X_tr[start:start + batch_size], dtype=torch.float32).to(device)
+        yb = torch.tensor(y_tr[start:start + batch_size], dtype=torch.float32).unsqueeze(1).to(device)
+        total += float(xb.sum() + yb.sum())
+    return total
+
+def dataloader_epoch(X, y, train_idx, batch_size, device):
+    loader = DataLoader(TensorDataset(torch.tensor(X[train_idx]), torch.tensor(y[train_idx]).unsqueeze(1)),
+                        batch_size=batch_size, shuffle=True)
+    total = 0.0
+    for xb, yb in loader:
+        xb, yb = xb.to(device), yb.to(device)
+        total += float(xb.sum() + yb.sum())
+    return total
+
+def batches_epoch(X, y, train_idx, batch_size, device, shuffle=True):
+    total = 0.0
+    for xb, yb in TensorBatches(X, y, indices=train_idx, batch_size=batch_size, shuffle=shuffle, device=device):
+        total += float(xb.sum() + yb.sum())
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark minibatch iteration for the torch notebooks")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--features', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.rows, args.features), dtype=np.float32)
+    y = rng.standard_normal(args.rows, dtype=np.float32)
+    # One of five folds held out, as in the notebooks' KFold loops
+    train_idx = np.sort(rng.permutation(args.rows)[:args.rows * 4 // 5])
+    samples = len(train_idx)
+
+    print(f"{samples} training rows x {args.features} features, batch {args.batch_size}, device {args.device}")
+    reference = None
+    baseline = None
+    for label, epoch in [("3-5 loop (copy + torch.tensor)", notebook_numpy_epoch),
+                         ("DataLoader(TensorDataset)", dataloader_epoch),
+                         ("TensorBatches, shuffled", batches_epoch),
+                         ("TensorBatches, slices", lambda *a: batches_epoch(*a, shuffle=False))]:
+        total, seconds = timed(epoch, X, y, train_idx, args.batch_size, args.device, repeat=3)
+        reference = total if reference is None else reference
+        assert abs(total - reference) <= 1e-3 * max(1.0, abs(reference)), f"{label} covers different rows"
+        baseline = baseline or seconds
+        print(f"{label:<34} {samples / seconds:12.0f} samples/s  {baseline / seconds:6.1f}x")
+
+if __name__ == "__main__":
+    main()
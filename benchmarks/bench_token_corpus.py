@@ -0,0 +1,70 @@
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from common import timed
+from bench_encoder import synthetic_texts
+from token_corpus import TOKENIZER_NAME, LengthGroupedSampler, build_corpus, padded_tokens
+
+# Tokenisation time of 3-8.ipynb's Dataset.map(batched=False, padding='max_length')
+# against token_corpus.build_corpus, and the tokens pushed through the model per
+# epoch with fixed padding to 128, dynamic padding in random order, and dynamic
+# padding with LengthGroupedSampler. Pass --parquet cars_ready_BART.parquet to
+# use real Textual_Input values.
+
+def notebook_tokenize(texts, labels, max_length):
+    from datasets import Dataset
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+
+    def tokenize(example):
+        tokens = tokenizer(example['Textual_Input'], truncation=True, padding='max_length', max_length=max_length)
+        tokens['labels'] = example['Log_Price']
+        return tokens
+
+    dataset = Dataset.from_dict({'Textual_Input': texts, 'Log_Price': labels})
+    return dataset.map(tokenize, batched=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pre-tokenised corpus for 3-8.ipynb")
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--parquet', help="Parquet file with Textual_Input and Log_Price columns")
+    parser.add_argument('--max-length', type=int, default=128)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--skip-notebook', action='store_true', help="Do not time the Dataset.map baseline")
+    args = parser.parse_args()
+
+    if args.parquet:
+        import pandas as pd
+        df = pd.read_parquet(args.parquet, columns=['Textual_Input', 'Log_Price']).dropna().head(args.count)
+        texts, labels = df['Textual_Input'].tolist(), df['Log_Price'].to_numpy()
+    else:
+        texts = synthetic_texts(args.count)
+        labels = np.random.default_rng(0).normal(10, 1, len(texts))
+    folds = np.zeros(len(texts), dtype=np.int8)
+    print(f"{len(texts)} texts")
+
+    if not args.skip_notebook:
+        _, map_s = timed(notebook_tokenize, texts, labels, args.max_length)
+        print(f"{'Dataset.map, batched=False':<30} {map_s:7.1f} s")
+    with tempfile.TemporaryDirectory() as directory:
+        corpus, build_s = timed(build_corpus, os.path.join(directory, 'corpus'), texts, labels, folds,
+                                max_length=args.max_length, workers=args.workers)
+        print(f"{f'build_corpus, {args.workers} workers':<30} {build_s:7.1f} s")
+        lengths = np.array(corpus.lengths)
+
+    order = np.random.default_rng(0).permutation(len(lengths))
+    fixed = padded_tokens(lengths, order, args.batch_size, pad_to=args.max_length)
+    dynamic = padded_tokens(lengths, order, args.batch_size)
+    grouped = padded_tokens(lengths, LengthGroupedSampler(lengths, args.batch_size), args.batch_size)
+    print(f"Tokens per epoch (real {lengths.sum()}):")
+    print(f"{'  padded to max_length':<30} {fixed:>12}")
+    print(f"{'  dynamic, random order':<30} {dynamic:>12}   {fixed / dynamic:.2f}x fewer")
+    print(f"{'  dynamic, length grouped':<30} {grouped:>12}   {fixed / grouped:.2f}x fewer")
+
+if __name__ == "__main__":
+    main()
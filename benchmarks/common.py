@@ -0,0 +1,33 @@
+import importlib.util
+import os
+import sys
+import time
+
+# The pipeline scripts are named like 2-3.py, which `import` cannot handle,
+# so benchmarks load them by path. Run benchmarks from the repository root:
+#   python benchmarks/bench_next_data.py
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+def load_script(filename):
+    """Import one of the numbered pipeline scripts as a module"""
+    name = 'script_' + os.path.splitext(filename)[0].replace('-', '_')
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def timed(fn, *args, repeat=1, **kwargs):
+    """Run fn `repeat` times and return (last result, best wall time in seconds)"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return result, best
@@ -0,0 +1,203 @@
+import os
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from experiment_runner import score
+from feature_store import FeatureStore, STORE_DIR
+from fold_cache import NON_FEATURES, TARGET, TEST_FOLD
+
+# Gradient-boosted trees for 3-2.ipynb on histogram-binned data. The feature
+# matrix of all training rows is quantised once (a LightGBM Dataset, or an
+# XGBoost QuantileDMatrix whose cuts are the reference of every fold's
+# matrix) and each cv_fold split reuses those bins instead of re-binning the
+# DataFrame. Make, Make_Model and Body_Type are passed as pandas categories
+# for the libraries' native categorical splits instead of their target
+# encodings. Every fold early-stops on its cv_fold validation rows; the final
+# model is refitted on all training rows with the mean best iteration and
+# scored on the test split. Wall time and peak RSS are reported with the metrics.
+
+NATIVE_CATEGORICAL = ['Make', 'Make_Model', 'Body_Type']
+EARLY_STOPPING_ROUNDS = 50
+MAX_ROUNDS = 5000
+MAX_BIN = 255
+
+LIGHTGBM_PARAMS = {'objective': 'regression', 'learning_rate': 0.05, 'num_leaves': 63, 'min_data_in_leaf': 20,
+                   'feature_fraction': 0.8, 'bagging_fraction': 0.8, 'bagging_freq': 1, 'cat_smooth': 10,
+                   'max_cat_to_onehot': 4, 'num_threads': 0, 'seed': 42, 'verbosity': -1}
+XGBOOST_PARAMS = {'objective': 'reg:squarederror', 'eta': 0.05, 'max_depth': 8, 'min_child_weight': 5,
+                  'subsample': 0.8, 'colsample_bytree': 0.8, 'tree_method': 'hist', 'max_cat_to_onehot': 4,
+                  'eval_metric': 'rmse', 'seed': 42}
+
+def current_rss():
+    """Resident set size of this process in MB (/proc on Linux, peak RSS elsewhere)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform != 'darwin' else peak / 1024 ** 2
+
+class PeakMemory:
+    """Context manager sampling RSS in a background thread; .peak and .start in MB.
+    Native allocations of LightGBM/XGBoost are invisible to tracemalloc, hence RSS."""
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+def with_native_categories(frame, raw, categorical=NATIVE_CATEGORICAL):
+    """frame with the (target-encoded) categorical columns replaced by the raw values of `raw` as pandas
+    categories; Make_Model is built from Make and Model when raw has no such column"""
+    raw = raw.copy()
+    if 'Make_Model' in categorical and 'Make_Model' not in raw.columns:
+        raw['Make_Model'] = raw['Make'].astype(str) + " " + raw['Model'].astype(str)
+    frame = frame.copy()
+    for col in categorical:
+        frame[col] = pd.Categorical(raw[col].to_numpy())
+    return frame
+
+def boosting_frame(dataset='DecisionTree_small', categorical=NATIVE_CATEGORICAL, path=STORE_DIR):
+    """(frame, features, categorical) for the boosters: `dataset` from the feature store with the raw
+    categories of the "categorical" group; without that group the target encodings are kept"""
+    store = FeatureStore(path)
+    frame = store.dataset(dataset)
+    if 'categorical' not in store.groups:
+        print("⚠️ No 'categorical' group in the feature store, keeping the target-encoded categories")
+        categorical = []
+    else:
+        raw_columns = [col for col in store.columns('categorical') if col in set(categorical) | {'Make', 'Model'}]
+        frame = with_native_categories(frame, store.group('categorical', raw_columns), categorical)
+    features = [col for col in frame.columns if col not in NON_FEATURES]
+    return frame, features, list(categorical)
+
+class LightGBMTrainer:
+    """One lgb.Dataset of the training rows; folds are subsets sharing its bin mappers"""
+    name = 'LightGBM'
+
+    def __init__(self, X, y, categorical, params=None, max_bin=MAX_BIN):
+        import lightgbm as lgb
+        self.lgb = lgb
+        self.X = X
+        self.params = {**LIGHTGBM_PARAMS, **(params or {})}
+        self.data = lgb.Dataset(X, label=y, categorical_feature=categorical or 'auto', free_raw_data=False,
+                                params={'max_bin': max_bin, 'verbosity': -1}).construct()
+
+    def fit(self, train_idx, rounds, val_idx=None, early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+        """(booster, number of rounds used); train_idx=None trains on every row of the Dataset"""
+        train = self.data if train_idx is None else self.data.subset(train_idx)
+        if val_idx is None:
+            return self.lgb.train(self.params, train, num_boost_round=rounds), rounds
+        booster = self.lgb.train(self.params, train, num_boost_round=rounds,
+                                 valid_sets=[self.data.subset(val_idx)],
+                                 callbacks=[self.lgb.early_stopping(early_stopping_rounds, verbose=False)])
+        return booster, booster.best_iteration
+
+    def predict(self, booster, X, rounds):
+        return booster.predict(X, num_iteration=rounds)
+
+class XGBoostTrainer:
+    """QuantileDMatrix of the training rows; fold matrices take their quantile cuts from it (ref=)"""
+    name = 'XGBoost'
+
+    def __init__(self, X, y, categorical, params=None, max_bin=MAX_BIN):
+        import xgboost as xgb
+        self.xgb = xgb
+        self.X = X
+        self.y = y
+        self.max_bin = max_bin
+        self.params = {**XGBOOST_PARAMS, **(params or {})}
+        self.reference = xgb.QuantileDMatrix(X, y, enable_categorical=True, max_bin=max_bin)
+
+    def _matrix(self, idx):
+        return self.xgb.QuantileDMatrix(self.X.iloc[idx], self.y[idx], ref=self.reference, enable_categorical=True,
+                                        max_bin=self.max_bin)
+
+    def fit(self, train_idx, rounds, val_idx=None, early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+        train = self.reference if train_idx is None else self._matrix(train_idx)
+        if val_idx is None:
+            return self.xgb.train(self.params, train, num_boost_round=rounds), rounds
+        booster = self.xgb.train(self.params, train, num_boost_round=rounds, evals=[(self._matrix(val_idx), 'val')],
+                                 early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+        return booster, booster.best_iteration + 1
+
+    def predict(self, booster, X, rounds):
+        return booster.predict(self.xgb.DMatrix(X, enable_categorical=True), iteration_range=(0, rounds))
+
+TRAINERS = {'LightGBM': LightGBMTrainer, 'XGBoost': XGBoostTrainer}
+
+def train_boosted(frame, features, categorical=(), library='LightGBM', params=None, max_rounds=MAX_ROUNDS,
+                  early_stopping_rounds=EARLY_STOPPING_ROUNDS, max_bin=MAX_BIN, prediction_store=None):
+    """Cross-validate on cv_fold with early stopping, refit on all training rows and score the test split.
+    Returns (summary dict, final booster, out-of-fold predictions of the training rows). The OOF and test
+    predictions are also written to prediction_store (a PredictionStore), if given, as "<library> (binned)"."""
+    cv_fold = frame['cv_fold'].to_numpy()
+    train_rows = cv_fold != TEST_FOLD
+    X = frame.loc[train_rows, features]
+    y = frame.loc[train_rows, TARGET].to_numpy(dtype=np.float32)
+    X_test = frame.loc[~train_rows, features]
+    y_test = frame.loc[~train_rows, TARGET].to_numpy(dtype=np.float32)
+    fold_of_row = cv_fold[train_rows]
+
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        trainer = TRAINERS[library](X, y, [col for col in categorical if col in features], params, max_bin)
+        bin_seconds = time.perf_counter() - start
+
+        oof = np.full(len(y), np.nan, dtype=np.float32)
+        fold_scores, best_rounds = [], []
+        for fold in sorted(np.unique(fold_of_row)):
+            train_idx = np.flatnonzero(fold_of_row != fold)
+            val_idx = np.flatnonzero(fold_of_row == fold)
+            booster, rounds = trainer.fit(train_idx, max_rounds, val_idx, early_stopping_rounds)
+            oof[val_idx] = trainer.predict(booster, X.iloc[val_idx], rounds)
+            fold_scores.append(score(y[val_idx], oof[val_idx]))
+            best_rounds.append(rounds)
+            print(f"🔁 {library} fold {fold}: MAE = {fold_scores[-1]['MAE']:.4f}, best round {rounds}")
+
+        final_rounds = max(1, int(round(np.mean(best_rounds))))
+        final, _ = trainer.fit(None, final_rounds)
+        test_pred = trainer.predict(final, X_test, final_rounds) if len(y_test) else np.empty(0)
+        test_scores = score(y_test, test_pred) if len(y_test) else {}
+        seconds = time.perf_counter() - start
+
+    if prediction_store is not None:
+        prediction_store.write_frame(f"{library} (binned)", frame, oof, mask=train_rows)
+        prediction_store.write_frame(f"{library} (binned)", frame, test_pred, mask=~train_rows)
+
+    cv = pd.DataFrame(fold_scores).mean()
+    summary = {'MAE_CV': cv['MAE'], 'RMSE_CV': cv['RMSE'], 'R2_CV': cv['R2'],
+               **{f"{metric}_Test": value for metric, value in test_scores.items()},
+               'Rounds': final_rounds, 'Bin_s': bin_seconds, 'Time_s': seconds,
+               'Peak_MB': memory.peak, 'Delta_MB': memory.peak - memory.start}
+    return summary, final, oof
+
+def compare_boosters(frame, features, categorical=(), libraries=('LightGBM', 'XGBoost'), **kwargs):
+    """train_boosted for every installed library; (summary DataFrame indexed by model, {name: booster})"""
+    import importlib.util
+
+    rows, boosters = {}, {}
+    for library in libraries:
+        if importlib.util.find_spec(library.lower()) is None:
+            print(f"⚠️ {library} is not installed, skipping")
+            continue
+        rows[library], boosters[library], _ = train_boosted(frame, features, categorical, library, **kwargs)
+    return pd.DataFrame.from_dict(rows, orient='index').round(4), boosters
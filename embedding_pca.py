@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import IncrementalPCA
+
+# Dimensionality reduction of the desc_emb_* description embeddings for
+# 2-8.ipynb. An IncrementalPCA is fitted on chunks of rows streamed from the
+# cars_features/desc_emb group, so memory depends on the chunk size and not on
+# the number of listings. The fitted state is saved to desc_pca/ together with
+# a hash of every vector it has seen: when the store is rebuilt with new
+# listings, partial_fit only adds the new vectors instead of refitting from
+# scratch. The desc_pca_* columns are written once, as the "desc_pca" group
+# shared by every dataset variant.
+
+PCA_DIR = 'desc_pca'
+PCA_PREFIX = 'desc_pca_'
+
+def row_hashes(X):
+    """uint64 hash of every row of X, to tell new vectors from ones already fitted"""
+    return pd.util.hash_pandas_object(pd.DataFrame(X), index=False).to_numpy()
+
+def frame_chunks(frame, columns, batch_size=4096, dtype=np.float32):
+    """In-memory counterpart of FeatureStore.iter_batches for a DataFrame"""
+    for start in range(0, len(frame), batch_size):
+        yield frame[columns].iloc[start:start + batch_size].to_numpy(dtype=dtype)
+
+def rebatch(chunks, batch_size):
+    """Chunks merged or split into batches of batch_size rows (the last may be smaller)"""
+    pending, rows = [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        rows += len(chunk)
+        while rows >= batch_size:
+            merged = np.concatenate(pending) if len(pending) > 1 else pending[0]
+            yield merged[:batch_size]
+            pending, rows = [merged[batch_size:]], rows - batch_size
+    if rows:
+        yield np.concatenate(pending)
+
+class EmbeddingPCA:
+    """IncrementalPCA of embedding vectors that persists its state and the vectors it was fitted on"""
+    def __init__(self, path=PCA_DIR, n_components=50, batch_size=4096):
+        self.path = path
+        self.n_components = n_components
+        self.batch_size = batch_size
+        self.model_path = os.path.join(path, 'model.npz')
+        self.seen_path = os.path.join(path, 'seen.npy')
+        self.reset()
+        if os.path.exists(self.model_path):
+            self._load()
+
+    def reset(self):
+        """Forget the fitted state (the next partial_fit starts from scratch)"""
+        self.pca = IncrementalPCA(n_components=self.n_components)
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    @property
+    def fitted(self):
+        return hasattr(self.pca, 'components_')
+
+    @property
+    def columns(self):
+        return [f"{PCA_PREFIX}{i}" for i in range(self.n_components)]
+
+    def _load(self):
+        with np.load(self.model_path) as state:
+            attributes = {name: state[name].item() if state[name].ndim == 0 else state[name] for name in state.files}
+        if attributes['n_components_'] != self.n_components:
+            raise ValueError(f"{self.path} holds {attributes['n_components_']} components, expected "
+                             f"{self.n_components}; call reset() to refit")
+        for name, value in attributes.items():
+            setattr(self.pca, name, value)
+        self.seen = np.load(self.seen_path)
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        attributes = {name: value for name, value in vars(self.pca).items() if name.endswith('_')}
+        with open(self.model_path + '.tmp', 'wb') as f:
+            np.savez(f, **attributes)
+        with open(self.seen_path + '.tmp', 'wb') as f:
+            np.save(f, self.seen)
+        os.replace(self.seen_path + '.tmp', self.seen_path)
+        os.replace(self.model_path + '.tmp', self.model_path)
+
+    def partial_fit(self, chunks):
+        """Fit on the rows of chunks that were not fitted before, batch by batch, then save.
+        Returns the number of rows added."""
+        added, new_hashes = 0, []
+        for batch in rebatch(chunks, self.batch_size):
+            hashes = row_hashes(batch)
+            new = ~np.isin(hashes, self.seen)
+            if not new.any():
+                continue
+            self.pca.partial_fit(batch[new])
+            new_hashes.append(hashes[new])
+            added += int(new.sum())
+        if added:
+            self.seen = np.unique(np.concatenate([self.seen] + new_hashes))
+            self.save()
+        print(f"✅ PCA: {added} new embeddings fitted ({int(self.pca.n_samples_seen_) if self.fitted else 0} "
+              f"in total)")
+        return added
+
+    def transform(self, chunks):
+        """float32 projection of every row of chunks, in order"""
+        if not self.fitted:
+            raise ValueError("EmbeddingPCA is not fitted yet")
+        return np.concatenate([self.pca.transform(chunk).astype(np.float32) for chunk in chunks])
+
+    def transform_frame(self, chunks, index=None):
+        return pd.DataFrame(self.transform(chunks), columns=self.columns, index=index)
+
+def update_store_pca(store, source='desc_emb', group='desc_pca', n_components=50, batch_size=4096, path=PCA_DIR):
+    """Fit the saved PCA on any new vectors of store's `source` group, write the projection of every row as
+    `group` and return it as a DataFrame"""
+    pca = EmbeddingPCA(path, n_components, batch_size)
+    pca.partial_fit(store.iter_batches(source, batch_size=batch_size))
+    frame = pca.transform_frame(store.iter_batches(source, batch_size=batch_size))
+    store.write_group(group, frame, dtype=np.float32)
+    return frame
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Content-addressed cache of HerBERT description embeddings for 2-7.ipynb.
+# Each vector is keyed by a hash of the model name, max_length and the
+# Textual_Input it was computed from, so only texts never seen before are sent
+# through the model. Vectors are appended as float16 rows to "vectors.f16" and
+# read back through np.memmap; "index.tsv" holds one key per row, in row order.
+
+STORE_DIR = 'herbert_embeddings'
+MODEL_NAME = 'allegro/herbert-base-cased'
+EMB_SIZE = 768
+MAX_LENGTH = 256
+
+class EmbeddingStore:
+    def __init__(self, path=STORE_DIR, model_name=MODEL_NAME, dim=EMB_SIZE, max_length=MAX_LENGTH):
+        self.path = path
+        self.model_name = model_name
+        self.dim = dim
+        self.max_length = max_length
+        self.vectors_path = os.path.join(path, 'vectors.f16')
+        self.index_path = os.path.join(path, 'index.tsv')
+        os.makedirs(path, exist_ok=True)
+        self._check_meta()
+        self.rows = {}
+        self._load()
+
+    def _check_meta(self):
+        meta_path = os.path.join(self.path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta['dim'] != self.dim:
+                raise ValueError(f"{self.path} holds {meta['dim']}-dim vectors, expected {self.dim}")
+        else:
+            with open(meta_path, 'w') as f:
+                json.dump({'dim': self.dim, 'dtype': 'float16'}, f)
+
+    def _load(self):
+        keys = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                keys = [line.rstrip('\n') for line in f if line.strip()]
+        row_bytes = self.dim * 2
+        stored = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+
+        # Vectors are written before their index lines; drop whatever an interrupted append left behind
+        count = min(len(keys), stored)
+        if count < len(keys):
+            keys = keys[:count]
+            with open(self.index_path, 'w') as f:
+                f.writelines(f"{key}\n" for key in keys)
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) != count * row_bytes:
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(count * row_bytes)
+        self.rows = {key: row for row, key in enumerate(keys)}
+
+    def key(self, text):
+        data = f"{self.model_name}\0{self.max_length}\0{text}".encode('utf-8')
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, text):
+        return self.key(text) in self.rows
+
+    def missing(self, texts):
+        """Distinct texts without a stored vector, in first-seen order"""
+        pending = {}
+        for text in texts:
+            key = self.key(text)
+            if key not in self.rows and key not in pending:
+                pending[key] = text
+        return list(pending.values())
+
+    def add(self, texts, vectors):
+        """Append vectors (n x dim) for texts; texts already stored are skipped"""
+        vectors = np.asarray(vectors)
+        if vectors.shape != (len(texts), self.dim):
+            raise ValueError(f"Expected vectors of shape ({len(texts)}, {self.dim}), got {vectors.shape}")
+        keys, keep, seen = [], [], set()
+        for i, text in enumerate(texts):
+            key = self.key(text)
+            if key not in self.rows and key not in seen:
+                seen.add(key)
+                keys.append(key)
+                keep.append(i)
+        if not keys:
+            return 0
+        with open(self.vectors_path, 'ab') as f:
+            f.write(vectors[keep].astype(np.float16).tobytes())
+        with open(self.index_path, 'a') as f:
+            f.writelines(f"{key}\n" for key in keys)
+        start = len(self.rows)
+        for offset, key in enumerate(keys):
+            self.rows[key] = start + offset
+        return len(keys)
+
+    def vectors(self):
+        """Read-only memmap over every stored vector"""
+        if not self.rows:
+            return np.zeros((0, self.dim), dtype=np.float16)
+        return np.memmap(self.vectors_path, dtype=np.float16, mode='r', shape=(len(self.rows), self.dim))
+
+    def row_ids(self, texts):
+        """Row of each text in vectors(); KeyError for texts that were never encoded"""
+        return np.array([self.rows[self.key(text)] for text in texts], dtype=np.int64)
+
+    def lookup(self, texts, dtype=np.float32):
+        """Vectors for texts, reading only their rows from disk"""
+        rows = self.row_ids(texts)
+        if len(rows) == 0:
+            return np.zeros((0, self.dim), dtype=dtype)
+        return np.asarray(self.vectors()[rows], dtype=dtype)
+
+    def encode_missing(self, texts, encode, batch_size=128):
+        """Encode texts not in the store with encode(list of texts) -> array, saving every batch"""
+        pending = self.missing(texts)
+        print(f"{len(pending)} of {len(texts)} texts need encoding ({len(self)} cached)")
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            self.add(batch, encode(batch))
+            print(f"\rEncoded {start + len(batch)}/{len(pending)}", end='', flush=True)
+        if pending:
+            print()
+        return len(pending)
+
+    def seed_from_frame(self, frame, text_column='Textual_Input', prefix='desc_emb_'):
+        """Import vectors from an existing cars_with_embeddings-style DataFrame"""
+        columns = [f"{prefix}{i}" for i in range(self.dim)]
+        return self.add(frame[text_column].tolist(), frame[columns].to_numpy())
+
+def herbert_encoder(model_name=MODEL_NAME, device=None, max_length=MAX_LENGTH):
+    """encode(texts) -> [CLS] embeddings as float32, the same pooling 2-7.ipynb used"""
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+
+    if device is None:
+        device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).to(device)
+    model.eval()
+
+    def encode(texts):
+        with torch.no_grad():
+            inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=max_length)
+            inputs = {k: v.to(device) for k, v in inputs.items()}
+            outputs = model(**inputs)
+            return outputs.last_hidden_state[:, 0, :].float().cpu().numpy()
+
+    return encode
+
+def length_batches(lengths, max_tokens=8192, max_batch=256):
+    """Split positions sorted by token length into batches of at most max_tokens padded tokens"""
+    order = np.argsort(lengths, kind='stable')
+    batches, batch, longest = [], [], 0
+    for position in order:
+        length = lengths[position]
+        if batch and (max(longest, length) * (len(batch) + 1) > max_tokens or len(batch) >= max_batch):
+            batches.append(batch)
+            batch, longest = [], 0
+        batch.append(position)
+        longest = max(longest, length)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def cpu_herbert_encoder(model_name=MODEL_NAME, max_length=MAX_LENGTH, quantize=True, threads=None,
+                        max_tokens=8192, tokenize_workers=4, prefetch=2):
+    """encode(texts) -> [CLS] embeddings as float32, tuned for CPU-only machines.
+
+    Texts are tokenised once without padding in parallel slices, sorted by token
+    length and grouped into batches with a padded-token budget, so short ads are
+    not padded to the longest text of a random batch. Padding and tensor
+    building run in a background thread ahead of the model. With quantize=True
+    the Linear layers use torch dynamic int8 quantisation. Pass encode_missing a
+    large batch_size (e.g. 4096) so there is enough to sort.
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+
+    if threads:
+        torch.set_num_threads(threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    # The first truncating call sets the Rust backend's truncation state; doing it here keeps the pool's
+    # threads from racing to set it ("RuntimeError: Already borrowed")
+    tokenizer([""], truncation=True, max_length=max_length)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    if quantize:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def tokenize(texts):
+        return tokenizer(texts, truncation=True, max_length=max_length)['input_ids']
+
+    def encode(texts):
+        texts = list(texts)
+        slice_size = max(1, -(-len(texts) // tokenize_workers))
+        with ThreadPoolExecutor(tokenize_workers) as pool:
+            slices = pool.map(tokenize, [texts[i:i + slice_size] for i in range(0, len(texts), slice_size)])
+            input_ids = [ids for part in slices for ids in part]
+        batches = length_batches(np.array([len(ids) for ids in input_ids]), max_tokens)
+
+        ready = queue.Queue(maxsize=prefetch)
+        errors = []
+
+        def produce():
+            try:
+                for batch in batches:
+                    padded = tokenizer.pad({'input_ids': [input_ids[i] for i in batch]}, return_tensors="pt")
+                    ready.put((batch, padded))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                ready.put(None)
+
+        threading.Thread(target=produce, daemon=True).start()
+        result = np.empty((len(texts), model.config.hidden_size), dtype=np.float32)
+        with torch.inference_mode():
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                batch, padded = item
+                outputs = model(input_ids=padded['input_ids'], attention_mask=padded['attention_mask'])
+                result[batch] = outputs.last_hidden_state[:, 0, :].float().numpy()
+        if errors:
+            raise errors[0]
+        return result
+
+    return encode
@@ -0,0 +1,135 @@
+import ast
+import json
+import os
+
+import numpy as np
+import orjson
+import pandas as pd
+from scipy import sparse
+
+# Equipment features for 2-7.ipynb. The Equipment_* columns written by 2-4.py
+# hold JSON lists of labels; they are encoded straight into a uint8 CSR matrix
+# against a persisted vocabulary instead of MultiLabelBinarizer on
+# ast.literal_eval'd lists. Feature names and column order match the
+# MultiLabelBinarizer output ("<column>_<label with _ for spaces>", labels
+# sorted per column), and dense frames are only built when asked for.
+
+VOCABULARY_FILE = 'equipment_vocabulary.json'
+EQUIPMENT_COLUMNS = [
+    "Equipment_Audio_and_Multimedia",
+    "Equipment_Comfort_and_Extras",
+    "Equipment_Driver_Assistance_Systems",
+    "Equipment_Performance_and_Tuning",
+    "Equipment_Safety",
+]
+NO_EQUIPMENT = "brak danych"
+
+def parse_labels(value):
+    """Label list from one cell: JSON text, a Python list literal, a list, or missing"""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    if not isinstance(value, str) or not value:
+        return []
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        return ast.literal_eval(value)
+
+class EquipmentVocabulary:
+    def __init__(self, labels):
+        # {column: [sorted labels]}
+        self.labels = {column: list(values) for column, values in labels.items()}
+        self.offsets = {}
+        self.lookup = {}
+        offset = 0
+        for column, values in self.labels.items():
+            self.offsets[column] = offset
+            self.lookup[column] = {label: offset + i for i, label in enumerate(values)}
+            offset += len(values)
+        self.size = offset
+
+    @property
+    def columns(self):
+        return list(self.labels)
+
+    @property
+    def feature_names(self):
+        return [f"{column}_{label.strip().replace(' ', '_')}"
+                for column, values in self.labels.items() for label in values]
+
+    @classmethod
+    def fit(cls, frame, columns=EQUIPMENT_COLUMNS):
+        labels = {}
+        for column in columns:
+            seen = set()
+            for value in frame[column]:
+                seen.update(parse_labels(value))
+            labels[column] = sorted(seen)
+        return cls(labels)
+
+    def save(self, path=VOCABULARY_FILE):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'columns': self.labels}, f, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path=VOCABULARY_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['columns'])
+
+    @classmethod
+    def load_or_fit(cls, path, frame, columns=EQUIPMENT_COLUMNS):
+        """Reuse the saved vocabulary so feature columns stay stable across runs"""
+        if os.path.exists(path):
+            return cls.load(path)
+        vocabulary = cls.fit(frame, columns)
+        vocabulary.save(path)
+        return vocabulary
+
+def encode_equipment(frame, vocabulary):
+    """uint8 CSR matrix (rows of frame x vocabulary.size); labels missing from the vocabulary are skipped"""
+    indices = []
+    indptr = [0]
+    cells = [frame[column].tolist() for column in vocabulary.columns]
+    lookups = [vocabulary.lookup[column] for column in vocabulary.columns]
+    unknown = 0
+    for row in zip(*cells):
+        row_indices = set()
+        for value, lookup in zip(row, lookups):
+            for label in parse_labels(value):
+                position = lookup.get(label)
+                if position is None:
+                    unknown += 1
+                else:
+                    row_indices.add(position)
+        indices.extend(sorted(row_indices))
+        indptr.append(len(indices))
+    if unknown:
+        print(f"Skipped {unknown} equipment labels not in the vocabulary")
+
+    indices = np.array(indices, dtype=np.int32)
+    data = np.ones(len(indices), dtype=np.uint8)
+    return sparse.csr_matrix((data, indices, np.array(indptr, dtype=np.int64)),
+                             shape=(len(indptr) - 1, vocabulary.size))
+
+def pack_bits(matrix, chunk_size=100000):
+    """Bit-packed uint8 rows (8 features per byte) from a binary CSR matrix"""
+    return np.vstack([np.packbits(matrix[start:start + chunk_size].toarray().astype(bool), axis=1)
+                      for start in range(0, matrix.shape[0], chunk_size)])
+
+def equipment_frame(matrix, feature_names, index=None):
+    """Dense uint8 DataFrame with one 0/1 column per feature"""
+    return pd.DataFrame(matrix.toarray(), columns=feature_names, index=index)
+
+def equipment_desc(matrix, feature_names, empty=NO_EQUIPMENT):
+    """Comma-separated names of the features present in each row, `empty` for rows without any"""
+    matrix = sparse.csr_matrix(matrix)
+    names = np.array([name.replace("Equipment_", "").replace("_", " ") for name in feature_names], dtype=object)
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    present = matrix.data != 0
+    joined = pd.Series(names[matrix.indices[present]]).groupby(rows[present]).agg(", ".join)
+    return joined.reindex(range(matrix.shape[0]), fill_value=empty).to_numpy()
+
+def equipment_desc_from_frame(frame, columns):
+    """equipment_desc over 0/1 columns of a DataFrame (cells equal to 1 count as present)"""
+    matrix = sparse.csr_matrix(frame[columns].to_numpy() == 1)
+    return equipment_desc(matrix, columns)
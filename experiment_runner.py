@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from fold_cache import TEST_FOLD
+
+# Resumable fold x model x hyperparameter runs for the 3-x notebooks. Every job
+# fits one model with one parameter set on one fold of a FoldCache and writes
+# its validation predictions (<job>.npy) and metrics (<job>.json, written last)
+# to experiments/<fold cache key>/. Job names hash the model's settings, so a
+# job whose .json exists is skipped and a crash or kernel restart picks up
+# where it stopped, while edited models run again (functions defined in a
+# notebook are identified by a hash of their bytecode, not just their name).
+# Jobs run in a loky process pool, which pickles notebook functions by value,
+# so they also work under spawn (macOS). Each worker is capped to
+# threads_per_worker BLAS/OpenMP/torch threads, and the n_jobs/thread_count of
+# the estimators it fits are lowered to the same number.
+
+EXPERIMENTS_DIR = 'experiments'
+THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+                    'NUMEXPR_NUM_THREADS']
+THREAD_PARAMS = ('n_jobs', 'thread_count', 'nthread')
+
+_thread_limits = None
+_thread_count = None
+
+def limit_threads(threads):
+    """Cap native thread pools of this process (env variables, threadpoolctl and torch if loaded)"""
+    global _thread_limits, _thread_count
+    _thread_count = threads
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        _thread_limits = threadpool_limits(limits=threads)
+    except ImportError:
+        pass
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+
+def code_digest(code):
+    """Hash of a code object's bytecode, names and constants, nested functions included"""
+    digest = hashlib.blake2b(code.co_code, digest_size=6)
+    digest.update(repr(code.co_names).encode('utf-8'))
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            const = code_digest(const)
+        elif isinstance(const, frozenset):
+            const = sorted(map(repr, const))
+        digest.update(repr(const).encode('utf-8'))
+    return digest.hexdigest()
+
+def model_signature(model):
+    """Stable description of a registry entry, so editing a model's settings or a function's body
+    invalidates its checkpoints"""
+    if hasattr(model, 'get_params'):
+        return [type(model).__name__, model.get_params(deep=False)]
+    if isinstance(model, partial):
+        return [model_signature(model.func), list(model.args), model.keywords]
+    name = f"{getattr(model, '__module__', '')}.{getattr(model, '__qualname__', type(model).__name__)}"
+    if hasattr(model, '__code__'):
+        return f"{name}:{code_digest(model.__code__)}"
+    return name
+
+def cap_model_threads(model, threads):
+    """model (or a partial and the estimators among its arguments) with n_jobs/thread_count lowered to
+    threads; None and -1 mean all cores to XGBoost/LightGBM/CatBoost, so they are replaced too"""
+    if isinstance(model, partial):
+        return partial(cap_model_threads(model.func, threads), *[cap_model_threads(arg, threads) for arg in model.args],
+                       **{key: cap_model_threads(value, threads) for key, value in model.keywords.items()})
+    if not hasattr(model, 'get_params'):
+        return model
+    capped = {key: threads for key, value in model.get_params(deep=True).items()
+              if key.rsplit('__', 1)[-1] in THREAD_PARAMS and (value is None or not 0 < value <= threads)}
+    if type(model).__module__.startswith('catboost') and 'thread_count' not in model.get_params():
+        capped['thread_count'] = threads
+    if not capped:
+        return model
+    from sklearn.base import clone
+    return clone(model).set_params(**capped)
+
+def job_id(name, model, params, fold):
+    data = json.dumps([name, model_signature(model), params, fold], sort_keys=True,
+                      default=lambda value: model_signature(value) if callable(value) else repr(value))
+    return f"{name}-fold{fold}-{hashlib.blake2b(data.encode('utf-8'), digest_size=6).hexdigest()}"
+
+def fit_predict(model, params, data):
+    """Validation predictions of one model: a scikit-learn style estimator is
+    cloned, given params and fitted; anything else is called as
+    model(data, **params) and must return the predictions."""
+    if hasattr(model, 'fit'):
+        from sklearn.base import clone
+        estimator = clone(model).set_params(**params)
+        estimator.fit(data.X_train, data.y_train)
+        return estimator.predict(data.X_val)
+    return model(data, **params)
+
+def score(y_true, y_pred):
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    return {
+        'MAE': float(mean_absolute_error(y_true, y_pred)),
+        'RMSE': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'R2': float(r2_score(y_true, y_pred)),
+    }
+
+def run_job(folds, name, model, params, fold, output_dir):
+    data = folds.fold(fold)
+    estimator = cap_model_threads(model, _thread_count) if _thread_count else model
+    start = time.perf_counter()
+    y_pred = np.asarray(fit_predict(estimator, params, data), dtype=np.float32).ravel()
+    seconds = time.perf_counter() - start
+
+    key = job_id(name, model, params, fold)
+    with open(os.path.join(output_dir, f"{key}.npy.tmp"), 'wb') as f:
+        np.save(f, y_pred)
+    os.replace(os.path.join(output_dir, f"{key}.npy.tmp"), os.path.join(output_dir, f"{key}.npy"))
+    result = {'model': name, 'params': params, 'fold': fold, **score(data.y_val, y_pred),
+              'seconds': round(seconds, 3)}
+    with open(os.path.join(output_dir, f"{key}.json.tmp"), 'w') as f:
+        json.dump(result, f, default=str)
+    os.replace(os.path.join(output_dir, f"{key}.json.tmp"), os.path.join(output_dir, f"{key}.json"))
+    return result
+
+class ExperimentRunner:
+    """Runs every (model, params, fold) job of a registry over a FoldCache.
+
+    models maps a name to an estimator or a fit_predict(data, **params)
+    callable; grid optionally maps a name to a list of parameter dicts (default
+    one job with no params). include_test adds the fold -1 job: a fit on all
+    training rows scored on the test split.
+    """
+    def __init__(self, folds, models, grid=None, results_dir=EXPERIMENTS_DIR, include_test=True):
+        self.folds = folds
+        self.models = models
+        self.grid = grid or {}
+        self.include_test = include_test
+        self.output_dir = os.path.join(results_dir, os.path.basename(os.path.normpath(folds.path)))
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def jobs(self):
+        fold_ids = list(self.folds.folds) + ([TEST_FOLD] if self.include_test else [])
+        return [(name, params, fold) for name in self.models for params in self.grid.get(name, [{}])
+                for fold in fold_ids]
+
+    def _path(self, name, params, fold, suffix):
+        return os.path.join(self.output_dir, f"{job_id(name, self.models[name], params, fold)}{suffix}")
+
+    def finished(self, name, params, fold):
+        return os.path.exists(self._path(name, params, fold, '.json'))
+
+    def load(self, name, params, fold):
+        with open(self._path(name, params, fold, '.json'), 'r') as f:
+            return json.load(f)
+
+    def predictions(self, name, fold, params=None):
+        """Saved validation (or, for fold -1, test) predictions of one job"""
+        return np.load(self._path(name, params or {}, fold, '.npy'))
+
+    def run(self, workers=None, threads_per_worker=1):
+        """Run the jobs that have no checkpoint yet and return the results of all jobs"""
+        jobs = self.jobs()
+        pending = [job for job in jobs if not self.finished(*job)]
+        print(f"⏳ {len(pending)} of {len(jobs)} jobs to run ({len(jobs) - len(pending)} checkpointed)")
+        workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        if pending and workers > 1:
+            from joblib.externals.loky import get_reusable_executor
+
+            pool = get_reusable_executor(workers, initializer=limit_threads, initargs=(threads_per_worker,))
+            futures = [pool.submit(run_job, self.folds, name, self.models[name], params, fold, self.output_dir)
+                       for name, params, fold in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                print(f"✅ [{done}/{len(pending)}] {result['model']} fold {result['fold']}: "
+                      f"MAE {result['MAE']:.4f} ({result['seconds']:.1f} s)")
+        else:
+            for done, (name, params, fold) in enumerate(pending, 1):
+                result = run_job(self.folds, name, self.models[name], params, fold, self.output_dir)
+                print(f"✅ [{done}/{len(pending)}] {name} fold {fold}: MAE {result['MAE']:.4f} "
+                      f"({result['seconds']:.1f} s)")
+        return self.results()
+
+    def results(self):
+        """Metrics of every finished job, one row per job"""
+        rows = [self.load(*job) for job in self.jobs() if self.finished(*job)]
+        frame = pd.DataFrame(rows, columns=['model', 'params', 'fold', 'MAE', 'RMSE', 'R2', 'seconds'])
+        frame['params'] = frame['params'].map(lambda params: json.dumps(params, sort_keys=True))
+        return frame
+
+def summarize(results):
+    """Mean CV metrics and test metrics per (model, params), as in the notebook summary tables"""
+    cv = results[results['fold'] != TEST_FOLD].groupby(['model', 'params']).agg(
+        MAE_CV=('MAE', 'mean'), RMSE_CV=('RMSE', 'mean'), R2_CV=('R2', 'mean'))
+    test = results[results['fold'] == TEST_FOLD].set_index(['model', 'params'])[['MAE', 'RMSE', 'R2']]
+    test.columns = ['MAE_Test', 'RMSE_Test', 'R2_Test']
+    return pd.concat([cv, test], axis=1).round(4)
@@ -0,0 +1,177 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Columnar store behind the cars_ready_* datasets. 2-7.ipynb writes each feature
+# group (continuous, binary, one-hot, equipment, desc_emb, ...) once, as its own
+# Parquet file in cars_features/, in the narrowest dtype that holds it: floats as
+# float32, flags as bool, small integers as int8/int16 and categories as
+# dictionary encoded strings. Every group has the same rows in the same order. A dataset
+# such as "LinearRegression_small" is only a list of (group, columns) parts
+# saved in meta.json; load_dataset reads just those columns with pyarrow and
+# puts them side by side, without copying the other groups. A group can also
+# record its source in meta.json, e.g. the embedding model behind desc_emb.
+
+STORE_DIR = 'cars_features'
+LEGACY_FILE = 'cars_ready_{}.parquet'
+INTEGER_TYPES = [(pa.int8(), np.int8), (pa.int16(), np.int16), (pa.int32(), np.int32)]
+
+def narrow_array(array, dtype=None):
+    """Cast a pyarrow array to dtype, or to the narrowest type that holds its values exactly"""
+    if dtype is not None:
+        return pc.cast(array, pa.from_numpy_dtype(np.dtype(dtype)))
+    if pa.types.is_floating(array.type):
+        return pc.cast(array, pa.float32())
+    if pa.types.is_boolean(array.type):
+        return array
+    if pa.types.is_integer(array.type):
+        if array.null_count == len(array):
+            return pc.cast(array, pa.int8())
+        low, high = pc.min(array).as_py(), pc.max(array).as_py()
+        for arrow_type, numpy_type in INTEGER_TYPES:
+            limits = np.iinfo(numpy_type)
+            if limits.min <= low and high <= limits.max:
+                return pc.cast(array, arrow_type)
+        return array
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        # Categories shrink to small integer codes; free text such as Textual_Input stays plain
+        if pc.count_distinct(array).as_py() <= len(array) // 2:
+            return pc.dictionary_encode(array)
+    return array
+
+def narrow_table(frame, dtype=None):
+    """pyarrow Table of a DataFrame with every column narrowed (see narrow_array); the index is dropped"""
+    columns = [narrow_array(pa.array(frame[column], from_pandas=True), dtype) for column in frame.columns]
+    return pa.table(columns, names=[str(column) for column in frame.columns])
+
+def to_pandas(table):
+    """DataFrame of a store table. Dictionary columns come back as plain strings, like the original files,
+    and bool flags as int8 so that .values of a mixed feature frame stays numeric instead of object."""
+    columns = []
+    for column in table.columns:
+        if pa.types.is_dictionary(column.type):
+            column = pc.cast(column, column.type.value_type)
+        elif pa.types.is_boolean(column.type) and column.null_count == 0:
+            column = pc.cast(column, pa.int8())
+        columns.append(column)
+    return pa.table(columns, names=table.column_names).to_pandas(split_blocks=True, self_destruct=True)
+
+class FeatureStore:
+    """Feature groups of one prepared dataset, plus named column projections over them"""
+    def __init__(self, path=STORE_DIR):
+        self.path = path
+        self.meta_path = os.path.join(path, 'meta.json')
+        self.meta = {'rows': None, 'groups': {}, 'datasets': {}}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r') as f:
+                self.meta = json.load(f)
+
+    def _save_meta(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.meta_path + '.tmp', 'w') as f:
+            json.dump(self.meta, f, indent=1, ensure_ascii=False)
+        os.replace(self.meta_path + '.tmp', self.meta_path)
+
+    def _group_path(self, group):
+        return os.path.join(self.path, f"{group}.parquet")
+
+    def clear(self):
+        """Remove every group and dataset, e.g. before writing a rebuilt dataset"""
+        for group in self.meta['groups']:
+            if os.path.exists(self._group_path(group)):
+                os.remove(self._group_path(group))
+        self.meta = {'rows': None, 'groups': {}, 'datasets': {}}
+        self._save_meta()
+
+    @property
+    def groups(self):
+        return list(self.meta['groups'])
+
+    @property
+    def datasets(self):
+        return list(self.meta['datasets'])
+
+    def columns(self, group):
+        return self.meta['groups'][group]['columns']
+
+    def source(self, group):
+        """What a group was computed with (write_group's source), or None"""
+        return self.meta['groups'][group].get('source')
+
+    def write_group(self, group, frame, dtype=None, source=None):
+        """Store frame's columns as `group` (replacing it), narrowed to dtype or to the narrowest type.
+        source records what produced the values, e.g. the embedding model of desc_emb."""
+        rows = self.meta['rows']
+        if rows is not None and len(frame) != rows and set(self.meta['groups']) - {group}:
+            raise ValueError(f"{group} has {len(frame)} rows, the groups in {self.path} have {rows}; "
+                             f"call clear() first to start a new dataset")
+        table = narrow_table(frame, dtype)
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self._group_path(group) + '.tmp'
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, self._group_path(group))
+        self.meta['rows'] = len(frame)
+        self.meta['groups'][group] = {'columns': table.column_names,
+                                      'types': [str(field.type) for field in table.schema]}
+        if source is not None:
+            self.meta['groups'][group]['source'] = source
+        self._save_meta()
+
+    def define_dataset(self, name, parts):
+        """Save a dataset as a list of (group, columns) parts; columns=None takes the whole group"""
+        resolved = []
+        for group, columns in parts:
+            if group not in self.meta['groups']:
+                raise KeyError(f"No group {group!r} in {self.path}")
+            available = self.columns(group)
+            columns = list(available if columns is None else columns)
+            missing = [column for column in columns if column not in available]
+            if missing:
+                raise KeyError(f"Columns {missing[:5]} are not in group {group!r}")
+            resolved.append([group, columns])
+        self.meta['datasets'][name] = resolved
+        self._save_meta()
+
+    def read_table(self, parts):
+        """pyarrow Table of the (group, columns) parts, each group file read for just its columns"""
+        arrays, names = [], []
+        for group, columns in parts:
+            table = pq.read_table(self._group_path(group), columns=columns)
+            arrays.extend(table.columns)
+            names.extend(table.column_names)
+        return pa.table(arrays, names=names)
+
+    def dataset_parts(self, name, columns=None):
+        parts = self.meta['datasets'][name]
+        if columns is None:
+            return parts
+        wanted = set(columns)
+        return [[group, [column for column in group_columns if column in wanted]]
+                for group, group_columns in parts if wanted.intersection(group_columns)]
+
+    def dataset(self, name, columns=None):
+        """DataFrame of a defined dataset (or just the given columns of it), in the defined column order"""
+        frame = to_pandas(self.read_table(self.dataset_parts(name, columns)))
+        return frame if columns is None else frame[list(columns)]
+
+    def group(self, group, columns=None):
+        return to_pandas(pq.read_table(self._group_path(group), columns=columns))
+
+    def iter_batches(self, group, columns=None, batch_size=4096, dtype=np.float32):
+        """Rows of a numeric group as (batch_size x columns) arrays, streamed from disk in row order"""
+        for batch in pq.ParquetFile(self._group_path(group)).iter_batches(batch_size=batch_size, columns=columns):
+            yield np.column_stack([column.to_numpy(zero_copy_only=False) for column in batch.columns]
+                                  ).astype(dtype, copy=False)
+
+def load_dataset(name, columns=None, path=STORE_DIR):
+    """cars_ready_<name> from the feature store, or from the old cars_ready_<name>.parquet file if the
+    store does not define it"""
+    store = FeatureStore(path)
+    if name in store.datasets:
+        return store.dataset(name, columns)
+    return pd.read_parquet(LEGACY_FILE.format(name), columns=columns)
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import shutil
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Cached cross-validation matrices for the 3-x model notebooks. The cv_fold
+# split, the NaN filter and the StandardScaler statistics of every fold are
+# computed once per (dataset, feature set, scaling) and saved as contiguous
+# float32 .npy files under fold_cache/<key>/. Folds are read back with
+# mmap_mode='r', so every model (and every joblib worker) gets zero-copy views
+# of the same arrays instead of slicing and rescaling the DataFrame again.
+
+FOLD_CACHE_DIR = 'fold_cache'
+TARGET = 'Log_Price'
+NON_FEATURES = ['Log_Price', 'Price', 'cv_fold', 'split']
+CONTINUOUS_BASE = ['Mileage', 'Log_Mileage', 'Age', 'Log_Age', 'Mileage_per_Year', 'Engine_Power',
+                   'Engine_Capacity', 'Power_per_Liter']
+TEST_FOLD = -1
+
+FoldData = namedtuple('FoldData', ['X_train', 'y_train', 'X_val', 'y_val', 'mean', 'scale'])
+
+def continuous_features(columns):
+    """desc_pca_* and numeric car features, the columns 3-3 and 3-6 standardise"""
+    return [col for col in columns if col.startswith('desc_pca_') or col in CONTINUOUS_BASE]
+
+def feature_columns(frame, exclude=NON_FEATURES):
+    return [col for col in frame.columns if col not in exclude]
+
+def dataset_key(frame, features, target=TARGET, scale_columns=()):
+    """blake2b of the feature, target and cv_fold values plus the column choices"""
+    digest = hashlib.blake2b(digest_size=12)
+    header = {'features': list(features), 'target': target, 'scale': list(scale_columns)}
+    digest.update(json.dumps(header).encode('utf-8'))
+    values = frame[list(features) + [target, 'cv_fold']]
+    digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def fold_statistics(X, scale_positions):
+    """StandardScaler mean_ and scale_ (zero variance -> 1) over the columns at scale_positions"""
+    mean = np.zeros(X.shape[1], dtype=np.float64)
+    scale = np.ones(X.shape[1], dtype=np.float64)
+    if len(scale_positions) and len(X):
+        columns = X[:, scale_positions].astype(np.float64)
+        mean[scale_positions] = columns.mean(axis=0)
+        std = columns.std(axis=0)
+        scale[scale_positions] = np.where(std == 0, 1.0, std)
+    return mean, scale
+
+def split_rows(frame, features):
+    """(training mask, test mask) over frame's rows as FoldCache.build splits them: training rows
+    (cv_fold != -1) without a missing feature, and the test split"""
+    cv_fold = frame['cv_fold'].to_numpy()
+    train = (cv_fold != TEST_FOLD) & ~frame[list(features)].isna().to_numpy().any(axis=1)
+    return train, cv_fold == TEST_FOLD
+
+def cv_fold_splits(cv_fold):
+    """(train positions, validation positions) of every CV fold of a cv_fold column, for loops that take
+    KFold-style splits; test rows (-1) are in neither"""
+    cv_fold = np.asarray(cv_fold)
+    folds = sorted(np.unique(cv_fold[cv_fold != TEST_FOLD]))
+    return [(np.flatnonzero((cv_fold != fold) & (cv_fold != TEST_FOLD)), np.flatnonzero(cv_fold == fold))
+            for fold in folds]
+
+def _standardize(X, mean, scale):
+    return np.ascontiguousarray(((X - mean) / scale).astype(np.float32))
+
+class FoldCache:
+    """Per-fold train/validation arrays of one prepared dataset.
+
+    Rows of the training part (cv_fold != -1) with a missing feature are
+    dropped, as in the notebooks; test rows are kept. scale_columns is None (no
+    scaling), 'all', or a list of feature names to standardise with statistics
+    fitted on each fold's training rows; the remaining columns are stored as is.
+    fold(k) returns a FoldData for CV fold k and test() the same for all
+    training rows against the test split.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        self.features = self.meta['features']
+        self.folds = self.meta['folds']
+        self.scale_columns = self.meta['scale_columns']
+
+    @classmethod
+    def build(cls, frame, features=None, target=TARGET, scale_columns=None, cache_dir=FOLD_CACHE_DIR):
+        """Open the cache for frame, writing it first if this dataset and feature set were never cached"""
+        features = list(features) if features is not None else feature_columns(frame)
+        if scale_columns == 'all':
+            scale_columns = features
+        scale_columns = [col for col in features if col in set(scale_columns or ())]
+
+        key = dataset_key(frame, features, target, scale_columns)
+        path = os.path.join(cache_dir, key)
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            cache = cls(path)
+            print(f"📂 Using cached folds in {path}")
+            return cache
+
+        print(f"🔄 Building fold matrices in {path}...")
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        X = frame[features].to_numpy(dtype=np.float32)
+        y = frame[target].to_numpy(dtype=np.float32)
+        cv_fold = frame['cv_fold'].to_numpy()
+        train, test = split_rows(frame, features)
+        folds = sorted(int(fold) for fold in np.unique(cv_fold[train]))
+        scale_positions = np.array([features.index(col) for col in scale_columns], dtype=np.int64)
+
+        splits = [(fold, train & (cv_fold != fold), train & (cv_fold == fold)) for fold in folds]
+        splits.append((TEST_FOLD, train, test))
+        rows = {}
+        for fold, train_rows, val_rows in splits:
+            mean, scale = fold_statistics(X[train_rows], scale_positions)
+            fold_path = os.path.join(tmp_path, cls._fold_name(fold))
+            os.makedirs(fold_path)
+            np.save(os.path.join(fold_path, 'X_train.npy'), _standardize(X[train_rows], mean, scale))
+            np.save(os.path.join(fold_path, 'y_train.npy'), y[train_rows])
+            np.save(os.path.join(fold_path, 'X_val.npy'), _standardize(X[val_rows], mean, scale))
+            np.save(os.path.join(fold_path, 'y_val.npy'), y[val_rows])
+            np.savez(os.path.join(fold_path, 'scaler.npz'), mean=mean, scale=scale)
+            rows[str(fold)] = [int(train_rows.sum()), int(val_rows.sum())]
+
+        meta = {'features': features, 'target': target, 'scale_columns': scale_columns, 'folds': folds,
+                'rows': rows}
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    @staticmethod
+    def _fold_name(fold):
+        return 'test' if fold == TEST_FOLD else f"fold_{fold}"
+
+    def fold(self, fold, mmap=True):
+        """FoldData for CV fold `fold` (-1: all training rows vs the test split)"""
+        fold_path = os.path.join(self.path, self._fold_name(fold))
+        if not os.path.isdir(fold_path):
+            raise KeyError(f"No fold {fold} in {self.path}")
+        mode = 'r' if mmap else None
+        arrays = [np.load(os.path.join(fold_path, f"{name}.npy"), mmap_mode=mode)
+                  for name in ('X_train', 'y_train', 'X_val', 'y_val')]
+        with np.load(os.path.join(fold_path, 'scaler.npz')) as scaler:
+            return FoldData(*arrays, scaler['mean'], scaler['scale'])
+
+    def test(self, mmap=True):
+        return self.fold(TEST_FOLD, mmap)
+
+    def __iter__(self):
+        """(fold, FoldData) for every CV fold"""
+        for fold in self.folds:
+            yield fold, self.fold(fold)
+
+    def __len__(self):
+        return len(self.folds)
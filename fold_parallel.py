@@ -0,0 +1,80 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from experiment_runner import limit_threads
+
+# Fold-parallel training for the torch notebooks (3-3, 3-3-1, 3-3-2, 3-4
+# TabNet, 3-5 FT-Transformer). run_folds calls a notebook's
+# train_fold(fold, train_idx, val_idx, *shared) for every split in its own
+# joblib (loky) process, so functions and model classes defined in the
+# notebook work under spawn too. The core budget is split between the
+# processes: each gets torch.set_num_threads and the BLAS/OpenMP limits of
+# experiment_runner.limit_threads, so 5 folds on 32 cores run as 5 x 6 threads
+# instead of 5 x 32. NumPy arrays passed as `shared` are dumped once and
+# opened read-only with mmap_mode='r' by every worker instead of being pickled
+# per fold. Each fold returns a dict of metrics and its per-epoch curve.
+
+def available_cores():
+    """CPUs this process may run on (the affinity mask where supported)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def thread_budget(jobs, cores=None, threads=None):
+    """(processes, threads per process) for `jobs` folds within `cores` CPUs"""
+    cores = cores or available_cores()
+    if threads:
+        return max(1, min(jobs, cores // threads)), threads
+    workers = max(1, min(jobs, cores))
+    return workers, max(1, cores // workers)
+
+def _run_fold(fn, threads, fold, train_idx, val_idx, shared, kwargs):
+    limit_threads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    start = time.perf_counter()
+    result = dict(fn(fold, train_idx, val_idx, *shared, **kwargs))
+    result.update(fold=fold, seconds=round(time.perf_counter() - start, 3))
+    return result
+
+def run_folds(fn, splits, *shared, device='cpu', cores=None, threads=None, **kwargs):
+    """fn(fold, train_idx, val_idx, *shared, **kwargs) -> dict for every (train_idx, val_idx) of splits, one process
+    per fold on CPU. On an accelerator (device other than 'cpu') folds run one after another in this process.
+    Returns the dicts in fold order, each with 'fold' and 'seconds' added."""
+    from joblib import Parallel, delayed
+
+    splits = list(splits)
+    workers, threads = thread_budget(len(splits), cores, threads)
+    if str(device) != 'cpu':
+        workers, threads = 1, cores or available_cores()
+    print(f"⏳ {len(splits)} folds: {workers} process(es) x {threads} thread(s)")
+    if workers == 1:
+        results = [_run_fold(fn, threads, fold, train_idx, val_idx, shared, kwargs)
+                   for fold, (train_idx, val_idx) in enumerate(splits)]
+    else:
+        results = Parallel(n_jobs=workers, backend='loky', max_nbytes='1M', mmap_mode='r')(
+            delayed(_run_fold)(fn, threads, fold, train_idx, val_idx, shared, kwargs)
+            for fold, (train_idx, val_idx) in enumerate(splits))
+    for result in results:
+        metrics = ", ".join(f"{key} = {value:.4f}" for key, value in result.items()
+                            if key in ('MAE', 'RMSE', 'R2'))
+        print(f"✅ Fold {result['fold'] + 1}: {metrics} ({result['seconds']:.1f} s)")
+    return sorted(results, key=lambda result: result['fold'])
+
+def fold_metrics(results):
+    """Scalar entries of run_folds results as a DataFrame indexed by fold"""
+    rows = [{key: value for key, value in result.items() if np.ndim(value) == 0} for result in results]
+    return pd.DataFrame(rows).set_index('fold')
+
+def mean_curve(curves):
+    """Per-epoch mean of curves of different lengths (folds stop early at different epochs)"""
+    padded = np.full((len(curves), max(len(curve) for curve in curves)), np.nan)
+    for i, curve in enumerate(curves):
+        padded[i, :len(curve)] = curve
+    return np.nanmean(padded, axis=0)
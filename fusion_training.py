@@ -0,0 +1,104 @@
+import copy
+from functools import partial
+
+import numpy as np
+import torch
+from torch import nn
+from sklearn.linear_model import LinearRegression
+
+from experiment_runner import score
+from fold_parallel import run_folds
+from tensor_batches import TensorBatches
+
+# Late-fusion training for 3-7. The structured and text towers are trained
+# jointly on 0.5 * struct + 0.5 * text from one TensorBatches over
+# (X_struct, X_text, y), so both towers always see the same rows (zipping two
+# independently shuffled loaders paired different listings) and every row is
+# gathered once per epoch. Each fold keeps both towers' validation predictions
+# from its best epoch; together they are out-of-fold predictions for every
+# training row, from the same cross-validation pass, on which fit_stacker
+# learns the fusion weights instead of fitting them on the test set.
+
+FUSION_WEIGHTS = (0.5, 0.5)
+
+def predict_towers(model_s, model_t, batches):
+    """(structured, text, target) 1-D arrays over the batches of an unshuffled TensorBatches"""
+    model_s.eval()
+    model_t.eval()
+    out_s, out_t, targets = [], [], []
+    with torch.no_grad():
+        for xb_s, xb_t, yb in batches:
+            out_s.append(model_s(xb_s).cpu())
+            out_t.append(model_t(xb_t).cpu())
+            targets.append(yb.cpu())
+    return tuple(torch.cat(parts).numpy().ravel() for parts in (out_s, out_t, targets))
+
+def train_late_fusion(model_class, X_struct, X_text, y, train_idx, val_idx, epochs=50, patience=5, lr=1e-3,
+                      batch_size=1024, device='cpu', weights=FUSION_WEIGHTS, verbose=True):
+    """Train model_class(struct_dim) and model_class(text_dim) on the fused output, early stopping on the
+    validation RMSE. Returns a dict with both towers (best epoch restored), the metrics and tower predictions
+    on val_idx at that epoch, and the per-epoch validation MAE curve."""
+    train = TensorBatches(X_struct, X_text, y, indices=train_idx, batch_size=batch_size, shuffle=True,
+                          device=device)
+    val = TensorBatches(X_struct, X_text, y, indices=val_idx, batch_size=batch_size, device=device)
+    model_s = model_class(X_struct.shape[1]).to(device)
+    model_t = model_class(X_text.shape[1]).to(device)
+    optimizer = torch.optim.Adam(list(model_s.parameters()) + list(model_t.parameters()), lr=lr)
+    criterion = nn.MSELoss()
+    w_s, w_t = weights
+
+    best, wait, curve = {'RMSE': float('inf')}, 0, []
+    for epoch in range(epochs):
+        model_s.train()
+        model_t.train()
+        for xb_s, xb_t, yb in train:
+            optimizer.zero_grad()
+            loss = criterion(w_s * model_s(xb_s) + w_t * model_t(xb_t), yb)
+            loss.backward()
+            optimizer.step()
+
+        pred_s, pred_t, y_val = predict_towers(model_s, model_t, val)
+        metrics = score(y_val, w_s * pred_s + w_t * pred_t)
+        curve.append(metrics['MAE'])
+        if verbose:
+            print(f"Epoch {epoch+1}: RMSE = {metrics['RMSE']:.4f}, MAE = {metrics['MAE']:.4f}")
+
+        if metrics['RMSE'] < best['RMSE']:
+            best = {**metrics, 'epoch': epoch + 1, 'struct': pred_s, 'text': pred_t,
+                    'state': (copy.deepcopy(model_s.state_dict()), copy.deepcopy(model_t.state_dict()))}
+            wait = 0
+        else:
+            wait += 1
+            if wait >= patience:
+                if verbose:
+                    print("⏹️ Early stopping")
+                break
+
+    state_s, state_t = best.pop('state')
+    model_s.load_state_dict(state_s)
+    model_t.load_state_dict(state_t)
+    return {'model_s': model_s, 'model_t': model_t, 'curve': curve, **best}
+
+def late_fusion_fold(fold, train_idx, val_idx, X_struct, X_text, y, model_class=None, **params):
+    """run_folds job: metrics, curve and best-epoch tower predictions of one fold"""
+    print(f"\n🔁 Fold {fold+1}")
+    result = train_late_fusion(model_class, X_struct, X_text, y, train_idx, val_idx, **params)
+    return {**{key: result[key] for key in ('MAE', 'RMSE', 'R2', 'epoch', 'curve', 'struct', 'text')},
+            'val_idx': np.asarray(val_idx)}
+
+def cross_validate_late_fusion(model_class, X_struct, X_text, y, splits, device='cpu', cores=None, **params):
+    """Joint late-fusion CV over splits (through fold_parallel.run_folds).
+    Returns (fold results, (n, 2) out-of-fold [structured, text] predictions; NaN for rows never validated)."""
+    X_struct, X_text = [np.ascontiguousarray(array, dtype=np.float32) for array in (X_struct, X_text)]
+    y = np.ascontiguousarray(y, dtype=np.float32).ravel()
+    job = partial(late_fusion_fold, model_class=model_class, device=device, **params)
+    results = run_folds(job, splits, X_struct, X_text, y, device=device, cores=cores)
+    oof = np.full((len(y), 2), np.nan, dtype=np.float32)
+    for result in results:
+        oof[result['val_idx']] = np.column_stack([result['struct'], result['text']])
+    return results, oof
+
+def fit_stacker(oof, y):
+    """LinearRegression of y on the out-of-fold [structured, text] predictions: the learned fusion weights"""
+    rows = ~np.isnan(oof).any(axis=1)
+    return LinearRegression().fit(oof[rows], np.asarray(y, dtype=np.float32).ravel()[rows])
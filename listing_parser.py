@@ -0,0 +1,196 @@
+import json
+import re
+from multiprocessing import Pool
+
+import numpy as np
+import orjson
+import pandas as pd
+
+# Columnar replacement for parse_json_fields in 2-4.py. Each advert's details
+# array is indexed into a key -> value map once and every field is projected in
+# a single pass into per-column lists. Numeric fields come out as float64
+# columns instead of strings, so create_cars_subset does not have to re-parse
+# them; text fields keep the '' for missing convention of the legacy parser.
+
+# Output column -> key in advert['details']
+DETAIL_FIELDS = {
+    'Country_Origin': 'country_origin',
+    'Make': 'make',
+    'Model': 'model',
+    'Generation': 'generation',
+    'Version': 'version',
+    'Body_Type': 'body_type',
+    'Fuel_Type': 'fuel_type',
+    'Gearbox': 'gearbox',
+    'Transmission': 'transmission',
+    'Color': 'color',
+    'Color_Type': 'colour_type',
+    'Year_Production': 'year',
+    'Mileage': 'mileage',
+    'Number_Doors': 'door_count',
+    'Number_Seats': 'nr_seats',
+    'Engine_Capacity': 'engine_capacity',
+    'Engine_Power': 'engine_power',
+    'No_Accidents': 'no_accident',
+    'Has_Registration': 'has_registration',
+    'Service_Record': 'service_record',
+    'New_Used': 'new_used',
+    'CO2_Emissions': 'co2_emissions',
+    'Urban_Consumption': 'urban_consumption',
+    'Detail_registered': 'registered',
+    'Detail_original_owner': 'original_owner',
+}
+
+# Output column -> key in advert['parametersDict']
+PARAMETER_FIELDS = {
+    'Is_Imported': 'is_imported_car',
+    'Param_catalog_urn': 'catalog_urn',
+    'Param_damaged': 'damaged',
+    'Param_historical_vehicle': 'historical_vehicle',
+}
+
+# Numeric columns and the unit suffix stripped before conversion (None = plain number)
+NUMERIC_FIELDS = {
+    'Price': None,
+    'Year_Production': None,
+    'Mileage': ' km',
+    'Engine_Capacity': ' cm3',
+    'Engine_Power': ' KM',
+}
+
+COLUMNS = (
+    ['Listing URL', 'Title', 'Description', 'Price', 'Currency', 'Seller Type']
+    + list(DETAIL_FIELDS)
+    + list(PARAMETER_FIELDS)
+)
+
+HTML_TAG = re.compile(r'<[^>]+>')
+WHITESPACE = re.compile(r'\s+')
+MISSING = {'', 'nan', 'None', 'null'}
+
+def to_text(value):
+    """Same conversion as convert_to_string in 2-4.py, with missing values as ''"""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return '' if value in MISSING else value
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, float) and not np.isfinite(value):
+        return ''
+    return str(value)
+
+def to_number(value, suffix=None):
+    if value is None or isinstance(value, bool):
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value)
+    if suffix is not None:
+        text = text.replace(suffix, '').replace(' ', '').replace(',', '')
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+def first_label(parameters, key):
+    values = (parameters.get(key) or {}).get('values') or [{}]
+    return values[0].get('label', '')
+
+encode_features = json.JSONEncoder(ensure_ascii=False).encode
+
+def parse_advert(url, advert):
+    """Project one advert into a row tuple in COLUMNS order and {equipment column: JSON list}"""
+    details = {}
+    for detail in advert.get('details', []):
+        key = detail.get('key')
+        if key not in details:
+            details[key] = detail.get('value')
+
+    price_data = advert.get('price', {})
+    description = advert.get('description')
+    if description:
+        description = WHITESPACE.sub(' ', HTML_TAG.sub(' ', description)).strip()
+    parameters = advert.get('parametersDict', {})
+
+    row = [
+        url,
+        to_text(advert.get('title')),
+        to_text(description),
+        to_number(price_data.get('value') or price_data.get('amount')),
+        to_text(price_data.get('currency')),
+        to_text(advert.get('seller', {}).get('type')),
+    ]
+    for column, key in DETAIL_FIELDS.items():
+        if column in NUMERIC_FIELDS:
+            row.append(to_number(details.get(key), NUMERIC_FIELDS[column]))
+        else:
+            row.append(to_text(details.get(key)))
+    for key in PARAMETER_FIELDS.values():
+        row.append(to_text(first_label(parameters, key)))
+
+    equipment = {}
+    for eq_group in advert.get('equipment', []):
+        features = [value.get('label') for value in eq_group.get('values', []) if value.get('label')]
+        if features:
+            equipment[f"Equipment_{eq_group.get('label', 'Unknown')}"] = encode_features(features)
+    return row, equipment
+
+def empty_row(url):
+    return [url] + [np.nan if column in NUMERIC_FIELDS else '' for column in COLUMNS[1:]]
+
+def parse_records(urls, raw_jsons):
+    """Parse aligned url / raw_json sequences into a typed DataFrame"""
+    rows = []
+    equipment_rows = []
+    equipment_columns = {}
+
+    for url, raw_json in zip(urls, raw_jsons):
+        url = to_text(url)
+        row, equipment = None, {}
+        if isinstance(raw_json, str) and raw_json:
+            try:
+                row, equipment = parse_advert(url, orjson.loads(raw_json).get('advert', {}))
+            except Exception as e:
+                print(f"Error processing URL {url}: {e}")
+                row, equipment = None, {}
+        rows.append(row or empty_row(url))
+        for column in equipment:
+            equipment_columns.setdefault(column, None)
+        equipment_rows.append(equipment)
+
+    data = {}
+    for column, values in zip(COLUMNS, zip(*rows)):
+        data[column] = np.array(values, dtype='float64' if column in NUMERIC_FIELDS else object)
+    for column in equipment_columns:
+        data[column] = np.array([equipment.get(column, '') for equipment in equipment_rows], dtype=object)
+    return pd.DataFrame(data, columns=list(data) or COLUMNS)
+
+def _parse_chunk(chunk):
+    return parse_records(*chunk)
+
+def parse_json_fields_fast(df, workers=1, chunk_size=5000):
+    """Drop-in replacement for parse_json_fields with typed numeric columns.
+
+    With workers > 1 the input is split into chunks parsed in a process pool.
+    """
+    if df is None or df.empty:
+        print("No data to process!")
+        return None
+
+    urls = df['url'].tolist()
+    raw_jsons = df['raw_json'].tolist()
+    if workers <= 1:
+        return parse_records(urls, raw_jsons)
+
+    chunks = [(urls[i:i + chunk_size], raw_jsons[i:i + chunk_size]) for i in range(0, len(urls), chunk_size)]
+    with Pool(workers) as pool:
+        parts = pool.map(_parse_chunk, chunks)
+
+    result = pd.concat(parts, ignore_index=True, sort=False)
+    # Equipment categories missing from a chunk come back as NaN
+    equipment = [column for column in result.columns if column.startswith('Equipment_')]
+    result[equipment] = result[equipment].fillna('')
+    return result
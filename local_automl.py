@@ -0,0 +1,335 @@
+import concurrent.futures
+import importlib.util
+import math
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from boosted_trees import PeakMemory, current_rss
+from experiment_runner import EXPERIMENTS_DIR, ExperimentRunner, limit_threads, run_job
+from fold_cache import FoldCache, split_rows
+
+# In-process replacement for the H2O AutoML run of 3-10. The prepared dataset
+# is read from the feature store with pyarrow and cached once as fold_cache
+# memmaps, so no JVM is started and the frame is not copied into an H2OFrame.
+# Candidates (the defaults of every family, then random draws from its search
+# space) come from the scikit-learn, LightGBM, XGBoost and CatBoost estimators
+# the notebooks already use, cheapest families first; families whose library
+# is not installed are skipped. Successive halving spends the cv_fold splits
+# as the resource: every candidate is scored on one fold, the best 1/eta move
+# on to eta times as many folds, and so on until the survivors are
+# cross-validated on all folds. Fold
+# fits run through experiment_runner.run_job in one worker process, so they
+# are checkpointed in experiments/ (a re-run only fits what is missing) and a
+# fit running past its rung's share of max_runtime_secs (or, for a family not
+# timed yet, past FIRST_FIT_SHARE of that share) is killed with the worker;
+# its family gets no further fits and the search goes on with the others. Time
+# is kept to refit the leader on all training rows, and no fit starts while
+# RSS is over max_mem_mb; a family whose fit went over it gets no further fits. The leaderboard, like
+# H2O's, holds the fully cross-validated models sorted by MAE of their pooled
+# out-of-fold predictions.
+
+AUTOML_RUNTIME_SECS = 600
+# A family's first fold fit may take at most this share of a rung's budget; a fit running past its cap or
+# its rung's deadline is killed and its family gets no further fits
+FIRST_FIT_SHARE = 0.25
+SORT_METRICS = ['mae', 'rmse', 'mse', 'rmsle', 'mean_residual_deviance']
+
+def search_space(threads=-1, seed=42):
+    """{family: (estimator, parameter distributions)} for every family whose library is installed"""
+    from scipy.stats import loguniform, randint, uniform
+    from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import Ridge
+    from sklearn.tree import DecisionTreeRegressor
+
+    # Cheap families first: under a short budget the first rung may not reach the forests
+    space = {
+        'Ridge': (Ridge(), {'alpha': loguniform(1e-3, 1e2)}),
+        'DecisionTree': (DecisionTreeRegressor(max_depth=20, min_samples_leaf=20, random_state=seed),
+                         {'max_depth': [8, 12, 16, 20, None], 'min_samples_leaf': [5, 10, 20, 50]}),
+        'HistGradientBoosting': (HistGradientBoostingRegressor(max_iter=500, early_stopping=True, random_state=seed),
+                                 {'learning_rate': loguniform(0.02, 0.2), 'max_leaf_nodes': [15, 31, 63, 127],
+                                  'min_samples_leaf': [10, 20, 50], 'l2_regularization': loguniform(1e-3, 10)}),
+    }
+    if importlib.util.find_spec('lightgbm') is not None:
+        from lightgbm import LGBMRegressor
+        space['LightGBM'] = (LGBMRegressor(n_estimators=500, n_jobs=threads, random_state=seed, verbosity=-1),
+                             {'learning_rate': loguniform(0.02, 0.2), 'num_leaves': randint(15, 128),
+                              'min_child_samples': [10, 20, 50], 'subsample': uniform(0.6, 0.4),
+                              'subsample_freq': [1], 'colsample_bytree': uniform(0.5, 0.5)})
+    if importlib.util.find_spec('xgboost') is not None:
+        from xgboost import XGBRegressor
+        space['XGBoost'] = (XGBRegressor(n_estimators=500, tree_method='hist', n_jobs=threads, random_state=seed,
+                                         verbosity=0),
+                            {'learning_rate': loguniform(0.02, 0.2), 'max_depth': randint(4, 11),
+                             'min_child_weight': [1, 5, 10], 'subsample': uniform(0.6, 0.4),
+                             'colsample_bytree': uniform(0.5, 0.5)})
+    if importlib.util.find_spec('catboost') is not None:
+        from catboost import CatBoostRegressor
+        space['CatBoost'] = (CatBoostRegressor(iterations=500, verbose=False, random_state=seed,
+                                               thread_count=threads),
+                             {'learning_rate': loguniform(0.02, 0.2), 'depth': randint(4, 9),
+                              'l2_leaf_reg': loguniform(1, 10)})
+    space['RandomForest'] = (RandomForestRegressor(n_estimators=100, n_jobs=threads, random_state=seed),
+                             {'max_features': [0.3, 0.5, 1.0], 'min_samples_leaf': [1, 5, 20], 'max_depth': [None, 20]})
+    space['ExtraTrees'] = (ExtraTreesRegressor(n_estimators=100, n_jobs=threads, random_state=seed),
+                           {'max_features': [0.3, 0.5, 1.0], 'min_samples_leaf': [1, 5, 20]})
+    return space
+
+def sample_candidates(space, n_candidates, seed=42):
+    """(family, params) list: each family's defaults first, then random draws, families taken in turn"""
+    from sklearn.model_selection import ParameterSampler
+
+    rng = np.random.RandomState(seed)
+    with warnings.catch_warnings():
+        # Small all-list spaces are sampled without replacement and run out early
+        warnings.filterwarnings('ignore', message='The total space of parameters')
+        draws = {family: iter(list(ParameterSampler(distributions, n_iter=n_candidates, random_state=rng)))
+                 for family, (_, distributions) in space.items()}
+    candidates = [(family, {}) for family in space][:n_candidates]
+    while len(candidates) < n_candidates and draws:
+        for family in list(draws):
+            params = next(draws[family], None)
+            if params is None:
+                del draws[family]
+                continue
+            candidates.append((family, {key: round(value, 4) if isinstance(value, float) else value
+                                        for key, value in params.items()}))
+            if len(candidates) == n_candidates:
+                break
+    return candidates
+
+def fold_schedule(n_folds, eta):
+    """Number of folds at every successive-halving rung: 1, eta, eta^2, ... and finally all of them"""
+    schedule, size = [], 1
+    while size < n_folds:
+        schedule.append(size)
+        size *= eta
+    return schedule + [n_folds]
+
+def pooled_metrics(y_true, y_pred):
+    """H2O's regression leaderboard metrics on pooled out-of-fold predictions"""
+    errors = y_pred - y_true
+    mse = float(np.mean(errors ** 2))
+    rmsle = (float(np.sqrt(np.mean((np.log1p(y_pred) - np.log1p(y_true)) ** 2)))
+             if (y_pred > -1).all() and (y_true > -1).all() else np.nan)
+    return {'mae': float(np.mean(np.abs(errors))), 'rmse': float(np.sqrt(mse)), 'mse': mse, 'rmsle': rmsle,
+            'mean_residual_deviance': mse}
+
+def _warm_worker():
+    """Import the estimator libraries in a new worker, so that their import time is not charged to a fit"""
+    search_space()
+
+def _fit_fold(folds, name, model, params, fold, output_dir):
+    """experiment_runner.run_job in the search's worker process, with the worker's peak RSS"""
+    with PeakMemory() as memory:
+        result = run_job(folds, name, model, params, fold, output_dir)
+    return {**result, 'peak_mb': memory.peak}
+
+class LocalAutoML:
+    """Time- and memory-budgeted model search by successive halving over the cv_fold splits.
+
+    train(frame) builds (or reuses) the frame's FoldCache and runs the search; afterwards `leaderboard`
+    lists the fully cross-validated candidates sorted by sort_metric, `history` every candidate with the
+    number of folds it reached, and `leader` is the best candidate refitted on all training rows.
+    """
+    def __init__(self, max_runtime_secs=AUTOML_RUNTIME_SECS, max_mem_mb=None, n_candidates=27, eta=3, seed=42,
+                 sort_metric='mae', include_algos=None, exclude_algos=None, threads=None,
+                 results_dir=EXPERIMENTS_DIR):
+        if sort_metric.lower() not in SORT_METRICS:
+            raise ValueError(f"sort_metric must be one of {SORT_METRICS}")
+        self.max_runtime_secs = max_runtime_secs
+        self.max_mem_mb = max_mem_mb
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.seed = seed
+        self.sort_metric = sort_metric.lower()
+        self.include_algos = include_algos
+        self.exclude_algos = set(exclude_algos or ())
+        self.threads = threads
+        self.results_dir = results_dir
+
+    def _space(self):
+        space = search_space(self.threads or -1, self.seed)
+        return {family: entry for family, entry in space.items()
+                if (self.include_algos is None or family in self.include_algos) and family not in self.exclude_algos}
+
+    def _deadline(self, rung=None):
+        """perf_counter time by which fold fits must end: the budget less the time to refit a leader from the
+        families still in the race on all training rows. Fits of rung r of R are only started while they are
+        expected to end within the first (r + 1) / R of the budget (time a rung leaves unused passes on)."""
+        times = [max(self._fit_seconds[family]) for family in self._alive_families - self._too_slow
+                 if self._fit_seconds.get(family)]
+        seconds = self.max_runtime_secs - 1.25 * max(times, default=0.0)
+        if rung is not None:
+            seconds = min(seconds, (rung + 1) / self._rungs * self.max_runtime_secs)
+        return self._start + seconds
+
+    def _first_fit_seconds(self):
+        return FIRST_FIT_SHARE * self.max_runtime_secs / self._rungs
+
+    def _may_start(self, family, rung):
+        """Whether a fold fit of family is expected to end within its rung's share, with memory under budget.
+        A family not timed yet is expected to take its whole first-fit cap."""
+        if family in self._over_memory or family in self._too_slow:
+            return False
+        times = self._fit_seconds.get(family)
+        expected = np.median(times) if times else self._first_fit_seconds()
+        if time.perf_counter() + expected > self._deadline(rung):
+            return False
+        if self.max_mem_mb and current_rss() > self.max_mem_mb:
+            print(f"⚠️ RSS {current_rss():.0f} MB over the {self.max_mem_mb} MB budget, stopping the search")
+            self._stopped = True
+            return False
+        return True
+
+    def _start_executor(self):
+        """One worker process: the estimators are multi-threaded themselves, and a fit past its deadline can be
+        killed with it. It is started here so that its startup is not charged to the next fit."""
+        from joblib.externals.loky import get_reusable_executor
+
+        self._executor = get_reusable_executor(max_workers=1, initializer=limit_threads if self.threads else None,
+                                               initargs=(self.threads,) if self.threads else ())
+        self._executor.submit(_warm_worker).result()
+
+    def _timeout(self, family, rung):
+        """Seconds a fold fit of family may run: to its rung's deadline, and at most the first-fit cap while
+        the family has not been timed"""
+        deadline = self._deadline(rung)
+        if not self._fit_seconds.get(family):
+            deadline = min(deadline, time.perf_counter() + self._first_fit_seconds())
+        return max(0.0, deadline - time.perf_counter())
+
+    def _evaluate(self, candidate, folds, rung):
+        """Fit candidate on the given folds that have no checkpoint yet, each in the worker process, which is
+        killed if the fit runs past its timeout. False if the candidate could not be fitted on every fold."""
+        index, (family, params) = candidate
+        for fold in folds:
+            if self.runner.finished(family, params, fold):
+                continue
+            if self._stopped or not self._may_start(family, rung):
+                return False
+            future = self._executor.submit(_fit_fold, self.folds, family, self.runner.models[family], params, fold,
+                                           self.runner.output_dir)
+            timeout = self._timeout(family, rung)
+            try:
+                result = future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                print(f"⏱️ {family}_{index} fold {fold} stopped after {timeout:.1f} s; no further {family} fits")
+                self._executor.shutdown(wait=False, kill_workers=True)
+                self._too_slow.add(family)
+                if time.perf_counter() >= self._deadline():
+                    self._stopped = True
+                else:
+                    self._start_executor()
+                return False
+            except Exception as error:
+                print(f"⚠️ {family}_{index} fold {fold} failed: {error!r}")
+                return False
+            self._fit_seconds.setdefault(family, []).append(result['seconds'])
+            self._worker_peak = max(self._worker_peak, result['peak_mb'])
+            print(f"✅ rung {rung} {family}_{index} fold {fold}: MAE {result['MAE']:.4f} ({result['seconds']:.1f} s, "
+                  f"{result['peak_mb']:.0f} MB)")
+            if self.max_mem_mb and result['peak_mb'] > self.max_mem_mb:
+                print(f"⚠️ {family} peaked at {result['peak_mb']:.0f} MB, over the {self.max_mem_mb} MB budget; "
+                      f"no further {family} fits")
+                self._over_memory.add(family)
+        return True
+
+    def _record(self, candidate):
+        """history row of a candidate: metrics over the folds it was fitted on"""
+        index, (family, params) = candidate
+        done = [fold for fold in self.folds.folds if self.runner.finished(family, params, fold)]
+        if not done:
+            return None
+        y_true = np.concatenate([self.folds.fold(fold).y_val for fold in done])
+        y_pred = np.concatenate([self.runner.predictions(family, fold, params) for fold in done])
+        seconds = sum(self.runner.load(family, params, fold)['seconds'] for fold in done)
+        return {'model_id': f"{family}_{index}", **pooled_metrics(y_true, y_pred), 'folds': len(done),
+                'training_time_ms': round(seconds * 1000), 'algo': family, 'params': params}
+
+    def train(self, frame, features=None):
+        """Run the search on a load_dataset frame (cv_fold -1 rows are the test split) and refit the leader"""
+        from sklearn.base import clone
+
+        if self.threads:
+            limit_threads(self.threads)
+        self._start = time.perf_counter()
+        self._fit_seconds, self._over_memory, self._too_slow = {}, set(), set()
+        self._stopped, self._worker_peak = False, 0.0
+        self._start_executor()
+        self.folds = FoldCache.build(frame, features)
+        space = self._space()
+        candidates = list(enumerate(sample_candidates(space, self.n_candidates, self.seed), 1))
+        grid = {family: [params for _, (name, params) in candidates if name == family] for family in space}
+        self.runner = ExperimentRunner(self.folds, {family: estimator for family, (estimator, _) in space.items()},
+                                       grid, results_dir=self.results_dir, include_test=False)
+
+        schedule = fold_schedule(len(self.folds), self.eta)
+        self._rungs = len(schedule)
+        print(f"⏳ {len(candidates)} candidates of {', '.join(space)}; folds per rung {schedule}; "
+              f"budget {self.max_runtime_secs} s" + (f", {self.max_mem_mb} MB" if self.max_mem_mb else ""))
+        alive = candidates
+        with PeakMemory() as memory:
+            for rung, n_folds in enumerate(schedule):
+                self._alive_families = {family for _, (family, _) in alive}
+                finished = [candidate for candidate in alive
+                            if self._evaluate(candidate, self.folds.folds[:n_folds], rung)]
+                if len(finished) < len(alive):
+                    print(f"⚠️ Rung {rung}: {len(finished)} of {len(alive)} candidates scored on {n_folds} fold(s)")
+                if rung == len(schedule) - 1 or self._stopped:
+                    break
+                if not finished:
+                    # The rung ran out of time before any candidate was scored; the next rung's deadline is
+                    # later, and the folds already fitted are checkpointed
+                    alive = [candidate for candidate in alive
+                             if candidate[1][0] not in self._too_slow | self._over_memory]
+                    continue
+                ranked = sorted(finished, key=lambda candidate: self._record(candidate)[self.sort_metric])
+                alive = ranked[:max(1, math.ceil(len(finished) / self.eta))]
+
+            self.history = pd.DataFrame([row for row in map(self._record, candidates) if row is not None])
+            if self.history.empty:
+                raise RuntimeError(f"No candidate could be fitted within {self.max_runtime_secs} s")
+            self.history = self.history.sort_values(['folds', self.sort_metric], ascending=[False, True],
+                                                    ignore_index=True)
+            complete = self.history[self.history['folds'] == len(self.folds)]
+            self.leaderboard = complete.drop(columns=['folds']).reset_index(drop=True)
+            if self.leaderboard.empty:
+                print("⚠️ No candidate was cross-validated on every fold; the leader is the best of those that "
+                      "got furthest")
+            # The leader is the best candidate whose refit on all training rows (about 1.25 fold fits) fits in
+            # the time left
+            remaining = self._start + self.max_runtime_secs - time.perf_counter()
+            refit_seconds = 1.25 * self.history['training_time_ms'] / self.history['folds'] / 1000
+            in_time = self.history[refit_seconds <= remaining]
+            best = in_time.iloc[0] if len(in_time) else self.history.loc[refit_seconds.idxmin()]
+            if best.name != 0:
+                print(f"⚠️ Refitting {self.history.iloc[0]['model_id']} would exceed the budget, "
+                      f"the leader is {best['model_id']}")
+            self.leader_id, self.leader_params, self.leader_algo = best['model_id'], best['params'], best['algo']
+            estimator = self.runner.models[self.leader_algo]
+            test = self.folds.test()
+            self.leader = clone(estimator).set_params(**self.leader_params).fit(test.X_train, test.y_train)
+        self.peak_mb = max(memory.peak, self._worker_peak)
+        self.seconds = time.perf_counter() - self._start
+        print(f"🏁 Leader {self.leader_id} (CV {self.sort_metric.upper()} {best[self.sort_metric]:.4f}); "
+              f"{len(self.history)} candidates scored in {self.seconds:.0f} s, peak RSS {self.peak_mb:.0f} MB")
+        return self
+
+    def save_predictions(self, store, frame, name='LocalAutoML leader'):
+        """Write the leader's out-of-fold and test predictions to a prediction_store.PredictionStore; frame is
+        the one passed to train"""
+        family = self.leader_algo
+        train, test = split_rows(frame, self.folds.features)
+        cv_fold = frame['cv_fold'].to_numpy()
+        oof, scored = np.full(len(frame), np.nan), np.zeros(len(frame), dtype=bool)
+        for fold in self.folds.folds:
+            if self.runner.finished(family, self.leader_params, fold):
+                rows = train & (cv_fold == fold)
+                oof[rows] = self.runner.predictions(family, fold, self.leader_params)
+                scored |= rows
+        store.write_frame(name, frame, oof[scored], mask=scored)
+        store.write_frame(name, frame, self.leader.predict(self.folds.test().X_val), mask=test)
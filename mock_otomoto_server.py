@@ -0,0 +1,191 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Local stand-in for otomoto.pl serving canned search result pages and listing
+# pages, so the scrapers can be exercised without touching the real site:
+#   python mock_otomoto_server.py --port 8000
+#   python 2-1.py --async --pages 50 --base-url "http://127.0.0.1:8000/osobowe?search%5Border%5D=relevance_web"
+#   python 2-3.py --workers 32 --offer-host http://127.0.0.1:8000
+
+MAKES = {
+    'Volkswagen': ['Golf', 'Passat', 'Polo', 'Tiguan'],
+    'Toyota': ['Corolla', 'Yaris', 'RAV4', 'Auris'],
+    'BMW': ['Seria 3', 'Seria 5', 'X3', 'X5'],
+    'Audi': ['A3', 'A4', 'A6', 'Q5'],
+    'Skoda': ['Octavia', 'Fabia', 'Superb'],
+}
+
+EQUIPMENT = {
+    'Audio i multimedia': ['Bluetooth', 'Radio', 'Nawigacja', 'Apple CarPlay', 'Android Auto', 'Ekran dotykowy'],
+    'Komfort i dodatki': ['Klimatyzacja automatyczna', 'Podgrzewane przednie siedzenia', 'Tempomat', 'Elektryczne szyby przednie'],
+    'Systemy wspomagania kierowcy': ['Czujniki parkowania tylne', 'Kamera cofania', 'Asystent pasa ruchu', 'Wspomaganie kierownicy'],
+    'Osiągi i tuning': ['Felgi aluminiowe', 'Sportowe zawieszenie'],
+    'Bezpieczeństwo': ['ABS', 'ESP', 'Poduszka powietrzna kierowcy', 'Isofix'],
+}
+
+def offer_url(offer_id):
+    return f"https://www.otomoto.pl/osobowe/oferta/samochod-ID{offer_id}.html"
+
+def render_search_page(page, per_page=32):
+    links = []
+    for i in range(per_page):
+        offer_id = page * per_page + i
+        links.append(f'<article data-testid="listing-grid-item"><a href="{offer_url(offer_id)}">Samochód {offer_id}</a></article>')
+    return f"<html><body><main>{''.join(links)}</main></body></html>"
+
+def make_advert(offer_id):
+    """Synthetic advert shaped like the pageProps.advert object parsed by 2-4.py"""
+    rng = random.Random(offer_id)
+    make = rng.choice(sorted(MAKES))
+    model = rng.choice(MAKES[make])
+    year = rng.randint(2005, 2024)
+    details = [
+        ('make', 'Marka pojazdu', make),
+        ('model', 'Model pojazdu', model),
+        ('version', 'Wersja', f"{rng.choice(['1.4', '1.6', '2.0'])} {rng.choice(['TSI', 'TDI', 'VVT-i'])}"),
+        ('body_type', 'Typ nadwozia', rng.choice(['Sedan', 'Kombi', 'SUV', 'Kompakt'])),
+        ('fuel_type', 'Rodzaj paliwa', rng.choice(['Benzyna', 'Diesel', 'Hybryda', 'Benzyna+LPG'])),
+        ('gearbox', 'Skrzynia biegów', rng.choice(['Manualna', 'Automatyczna'])),
+        ('transmission', 'Napęd', rng.choice(['Na przednie koła', 'Na tylne koła', '4x4 (stały)'])),
+        ('color', 'Kolor', rng.choice(['Czarny', 'Biały', 'Srebrny', 'Niebieski'])),
+        ('year', 'Rok produkcji', str(year)),
+        ('mileage', 'Przebieg', f"{rng.randint(1, 300) * 1000:,} km".replace(',', ' ')),
+        ('door_count', 'Liczba drzwi', str(rng.choice([3, 5]))),
+        ('nr_seats', 'Liczba miejsc', '5'),
+        ('engine_capacity', 'Pojemność skokowa', f"{rng.choice([1398, 1598, 1968, 2993]):,} cm3".replace(',', ' ')),
+        ('engine_power', 'Moc', f"{rng.randint(75, 350)} KM"),
+        ('no_accident', 'Bezwypadkowy', rng.choice(['Tak', None])),
+        ('service_record', 'Serwisowany w ASO', rng.choice(['Tak', None])),
+        ('new_used', 'Stan', rng.choice(['Używany'] * 9 + ['Nowy'])),
+        ('country_origin', 'Kraj pochodzenia', rng.choice(['Polska', 'Niemcy', 'Francja'])),
+        ('original_owner', 'Pierwszy właściciel', rng.choice(['Tak', None])),
+    ]
+    equipment = []
+    for label, values in EQUIPMENT.items():
+        chosen = [v for v in values if rng.random() < 0.6]
+        if chosen:
+            equipment.append({'key': label.lower().replace(' ', '_'), 'label': label,
+                              'values': [{'key': v.lower().replace(' ', '_'), 'label': v} for v in chosen]})
+    currency = 'EUR' if rng.random() < 0.05 else 'PLN'
+    return {
+        'id': str(offer_id),
+        'title': f"{make} {model} {year}",
+        'description': "<p>" + "</p><p>".join(
+            f"Sprzedam zadbany samochód {make} {model}. Auto bezwypadkowe, regularnie serwisowane."
+            for _ in range(rng.randint(2, 12))) + "</p>",
+        'price': {'value': str(rng.randint(5, 400) * 1000), 'currency': currency},
+        'seller': {'type': rng.choice(['PROFESSIONAL', 'PRIVATE']), 'name': 'Sprzedawca'},
+        'details': [{'key': k, 'label': l, 'value': v} for k, l, v in details if v is not None],
+        'equipment': equipment,
+        'parametersDict': {
+            'is_imported_car': {'values': [{'label': rng.choice(['Tak', 'Nie'])}]},
+            'catalog_urn': {'values': [{'label': f"urn:catalog:{offer_id}"}]},
+            'damaged': {'values': [{'label': rng.choice(['Nie'] * 9 + ['Tak'])}]},
+            'historical_vehicle': {'values': [{'label': 'Nie'}]},
+        },
+    }
+
+def render_offer_page(offer_id, padding_kb=200):
+    """Listing page with the advert embedded in __NEXT_DATA__, padded to a realistic size"""
+    rng = random.Random(-offer_id)
+    next_data = {
+        'props': {
+            'pageProps': {
+                'advert': make_advert(offer_id),
+                'translations': {f"key_{i}": f"Tłumaczenie {i} " * rng.randint(1, 4) for i in range(padding_kb * 8)},
+            },
+            '__N_SSP': True,
+        },
+        'page': '/ad/[slug]',
+        'query': {'slug': f"samochod-ID{offer_id}"},
+    }
+    filler = '<div class="ooa-filler">' + ('<span>lorem ipsum dolor sit amet</span>' * (padding_kb * 10)) + '</div>'
+    return (
+        '<!DOCTYPE html><html lang="pl"><head><meta charset="utf-8"><title>Otomoto</title></head><body>'
+        f'{filler}'
+        f'<script id="__NEXT_DATA__" type="application/json" nonce="{rng.getrandbits(64):x}">'
+        f'{json.dumps(next_data, ensure_ascii=False)}</script>'
+        f'{filler}</body></html>'
+    )
+
+class MockOtomotoHandler(BaseHTTPRequestHandler):
+    # Set by make_server
+    num_pages = 8000
+    per_page = 32
+    latency = 0.0
+    rate_limit_prob = 0.0
+    padding_kb = 200
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_html(self, status, body):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit_prob and random.random() < self.rate_limit_prob:
+            self.send_html(429, "<html><body>Too Many Requests</body></html>")
+            return
+
+        parts = urlsplit(self.path)
+        offer = re.search(r'/oferta/.*-ID(\d+)\.html$', parts.path)
+        if offer:
+            self.send_html(200, render_offer_page(int(offer.group(1)), self.padding_kb))
+        elif parts.path == '/osobowe':
+            page = int(parse_qs(parts.query).get('page', ['1'])[0])
+            if page > self.num_pages:
+                self.send_html(200, "<html><body><main></main></body></html>")
+            else:
+                self.send_html(200, render_search_page(page, self.per_page))
+        else:
+            self.send_html(404, "<html><body>Not Found</body></html>")
+
+def make_server(port=8000, num_pages=8000, per_page=32, latency=0.0, rate_limit_prob=0.0, padding_kb=200):
+    handler = type('Handler', (MockOtomotoHandler,), {
+        'num_pages': num_pages,
+        'per_page': per_page,
+        'latency': latency,
+        'rate_limit_prob': rate_limit_prob,
+        'padding_kb': padding_kb,
+    })
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+def start_in_background(**kwargs):
+    """Start the stand-in on a daemon thread; returns (server, base_url)"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for otomoto.pl")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--pages', type=int, default=8000, help="Number of non-empty search pages")
+    parser.add_argument('--per-page', type=int, default=32, help="Offer links per search page")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds of delay per response")
+    parser.add_argument('--rate-limit-prob', type=float, default=0.0, help="Probability of answering 429")
+    parser.add_argument('--padding-kb', type=int, default=200, help="Approximate filler added to each listing page")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.pages, args.per_page, args.latency, args.rate_limit_prob, args.padding_kb)
+    print(f"Serving mock otomoto on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+if __name__ == "__main__":
+    main()
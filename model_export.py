@@ -0,0 +1,162 @@
+import contextlib
+import copy
+import json
+import os
+
+import numpy as np
+
+# Inference export for the neural models of 3-3 (MLP), 3-6
+# (EarlyFusionRegressor) and 3-7 (two SimpleMLPs plus the stacking
+# LinearRegression). export_model saves a trained nn.Module as a frozen
+# TorchScript graph (model.pt, optionally also a dynamically int8-quantised
+# model_int8.pt) or as ONNX (model.onnx), with meta.json describing the inputs.
+# The late-fusion combiner is wrapped into the exported module (LateFusion), so
+# the structured and text branches and their weights travel together.
+# CPURunner scores NumPy arrays in fixed-size batches under
+# torch.inference_mode with a fixed thread count; loading a TorchScript or ONNX
+# file does not need the notebook class definitions. torch is imported lazily,
+# onnxruntime only for .onnx exports.
+
+EXPORT_DIR = 'exported_models'
+
+def late_fusion(struct_model, text_model, weights=(0.5, 0.5), bias=0.0):
+    """nn.Module computing weights[0] * struct_model(x_struct) + weights[1] * text_model(x_text) + bias.
+    Pass a fitted LinearRegression's coef_ and intercept_ to export the stacked combiner of 3-7."""
+    import torch
+    from torch import nn
+
+    class LateFusion(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.struct_model = struct_model
+            self.text_model = text_model
+            self.register_buffer('weights', torch.tensor([float(w) for w in np.ravel(weights)]))
+            self.register_buffer('bias', torch.tensor(float(np.ravel(bias)[0])))
+
+        def forward(self, x_struct, x_text):
+            return (self.weights[0] * self.struct_model(x_struct) + self.weights[1] * self.text_model(x_text)
+                    + self.bias)
+
+    return LateFusion()
+
+def _prepare(model):
+    """CPU copy of model in eval mode, leaving the notebook's (possibly MPS) model untouched"""
+    return copy.deepcopy(model).cpu().eval()
+
+def _example_tensors(example_inputs):
+    import torch
+    return tuple(torch.as_tensor(np.asarray(x[:8], dtype=np.float32)) for x in example_inputs)
+
+def _script(model, examples):
+    import torch
+    with torch.no_grad():
+        traced = torch.jit.trace(model, examples)
+    return torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+def export_model(model, example_inputs, path, input_names=None, format='torchscript', quantize=True, meta=None):
+    """Save model for CPU inference in path/. example_inputs are NumPy arrays (a few rows are enough) in the order
+    of model.forward; with format='torchscript' and quantize=True an int8 copy is written next to the fp32 one."""
+    import torch
+
+    model = _prepare(model)
+    examples = _example_tensors(example_inputs)
+    input_names = input_names or [f"input_{i}" for i in range(len(examples))]
+    os.makedirs(path, exist_ok=True)
+    files = {}
+    if format == 'torchscript':
+        torch.jit.save(_script(model, examples), os.path.join(path, 'model.pt'))
+        files['fp32'] = 'model.pt'
+        if quantize:
+            quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            with torch.no_grad():
+                traced = torch.jit.freeze(torch.jit.trace(quantized, examples))
+            torch.jit.save(traced, os.path.join(path, 'model_int8.pt'))
+            files['int8'] = 'model_int8.pt'
+    elif format == 'onnx':
+        torch.onnx.export(model, examples, os.path.join(path, 'model.onnx'), input_names=input_names,
+                          output_names=['prediction'],
+                          dynamic_axes={name: {0: 'batch'} for name in input_names + ['prediction']})
+        files['fp32'] = 'model.onnx'
+    else:
+        raise ValueError(f"Unknown export format {format!r}")
+
+    description = {'format': format, 'files': files, 'inputs': input_names,
+                   'input_dims': [int(x.shape[1]) for x in examples], 'torch': torch.__version__, **(meta or {})}
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(description, f, indent=1)
+    print(f"✅ Exported {type(model).__name__} to {path}/ ({', '.join(files.values())})")
+    return path
+
+class CPURunner:
+    """Batched CPU scoring of an exported model: predict(*arrays) -> float32 predictions, one per row"""
+    def __init__(self, path, quantized=False, threads=None, batch_size=4096):
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        self.batch_size = batch_size
+        variant = 'int8' if quantized else 'fp32'
+        if variant not in self.meta['files']:
+            raise ValueError(f"{path} has no {variant} export (exported: {', '.join(self.meta['files'])})")
+        model_path = os.path.join(path, self.meta['files'][variant])
+        if self.meta['format'] == 'onnx':
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            if threads:
+                options.intra_op_num_threads = threads
+            self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+            self.model = None
+        else:
+            import torch
+            if threads:
+                torch.set_num_threads(threads)
+            self.model = torch.jit.load(model_path, map_location='cpu')
+            self.session = None
+
+    def _score(self, batch):
+        if self.session is not None:
+            return self.session.run(None, dict(zip(self.meta['inputs'], batch)))[0]
+        import torch
+        return self.model(*[torch.from_numpy(x) for x in batch]).numpy()
+
+    def _mode(self):
+        if self.session is not None:
+            return contextlib.nullcontext()
+        import torch
+        return torch.inference_mode()
+
+    def predict(self, *arrays):
+        arrays = [np.ascontiguousarray(x, dtype=np.float32) for x in arrays]
+        rows = len(arrays[0])
+        result = np.empty(rows, dtype=np.float32)
+        # Every call sees the same batch shape; the last batch is padded with zeros and trimmed
+        buffers = [np.zeros((self.batch_size, x.shape[1]), dtype=np.float32) for x in arrays]
+        with self._mode():
+            for start in range(0, rows, self.batch_size):
+                stop = min(start + self.batch_size, rows)
+                if stop - start == self.batch_size:
+                    batch = [x[start:stop] for x in arrays]
+                else:
+                    for buffer, x in zip(buffers, arrays):
+                        buffer[:stop - start] = x[start:stop]
+                        buffer[stop - start:] = 0
+                    batch = buffers
+                result[start:stop] = np.asarray(self._score(batch)).reshape(-1)[:stop - start]
+        return result
+
+def eager_predict(model, *arrays, batch_size=4096):
+    """Predictions of the notebook model itself (eval mode, torch.no_grad, on CPU), for comparison"""
+    import torch
+
+    model = _prepare(model)
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(arrays[0]), batch_size):
+            batch = [torch.tensor(np.asarray(x[start:start + batch_size], dtype=np.float32)) for x in arrays]
+            outputs.append(model(*batch).numpy().reshape(-1))
+    return np.concatenate(outputs)
+
+def check_equivalence(model, runner, *arrays, atol=1e-4):
+    """Largest absolute difference between the eager model and an export; ValueError above atol"""
+    difference = float(np.max(np.abs(eager_predict(model, *arrays) - runner.predict(*arrays))))
+    if difference > atol:
+        raise ValueError(f"Exported model differs from the eager model by {difference:.2e} (atol {atol:.0e})")
+    return difference
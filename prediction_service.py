@@ -0,0 +1,511 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from embedding_pca import EmbeddingPCA, PCA_DIR
+from equipment_encoding import EQUIPMENT_COLUMNS, VOCABULARY_FILE, EquipmentVocabulary, encode_equipment, \
+    equipment_desc_from_frame
+from feature_store import STORE_DIR, FeatureStore
+from fold_cache import CONTINUOUS_BASE
+from listing_parser import parse_records
+
+# Price predictions for raw listings, without re-running the notebooks. A model
+# fitted in a 3-x notebook is saved with save_bundle together with everything
+# needed to rebuild its features: the scaler statistics, one-hot columns and
+# target-encoding maps are derived from the cars_features/ store, plus the
+# equipment vocabulary and the description PCA. PricePredictor takes listings
+# in the `advert` format of 2-4.py and runs them through the same parsing
+# (listing_parser + create_cars_subset), the 2-5/2-7 cleaning and the feature
+# groups the model was trained on. torch/transformers are imported only when a
+# description embedding is missing from herbert_embeddings/, feature rows and
+# embeddings are kept in LRU caches keyed by listing ID, and the HTTP server
+# groups concurrent requests into micro-batches:
+#   python prediction_service.py --bundle serving_model --port 8080
+#   curl -X POST localhost:8080/predict -d @listing.json
+
+BUNDLE_DIR = 'serving_model'
+TARGET = 'Log_Price'
+CATEGORICAL = ["Make", "Make_Model", "Body_Type", "Fuel_Type", "Gearbox", "Transmission"]
+FUEL_TYPES = {
+    'Benzyna': 'Petrol-based', 'Benzyna+LPG': 'Petrol-based', 'Benzyna+CNG': 'Petrol-based', 'Diesel': 'Diesel',
+    'Hybryda': 'Hybrid', 'Hybryda Plug-in': 'Hybrid', 'Elektryczny': 'Electric',
+}
+# Feature groups of cars_features/ that can be rebuilt from a single listing
+SERVABLE_GROUPS = ['continuous', 'continuous_scaled', 'binary', 'onehot', 'target_encoded', 'equipment',
+                   'desc_pca', 'desc_emb']
+
+def _parsing_script():
+    """2-4.py (create_cars_subset, SELECTED_COLUMNS), loaded by path because of its file name"""
+    name = 'script_2_4'
+    if name not in sys.modules:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '2-4.py')
+        spec = importlib.util.spec_from_file_location(name, path)
+        sys.modules[name] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sys.modules[name])
+    return sys.modules[name]
+
+def save_bundle(model, features, dataset, path=BUNDLE_DIR, mean=None, scale=None, store_path=STORE_DIR,
+                pca_path=PCA_DIR, vocabulary_path=VOCABULARY_FILE, embedding_model=None):
+    """Save a fitted model (anything with .predict) trained on `features`, columns of a dataset defined in the
+    cars_features/ store. mean/scale are the FoldData statistics the model's inputs were standardised with, if any.
+    embedding_model defaults to the encoder 2-7.ipynb recorded for the desc_emb group (fp32 or #int8)."""
+    store = FeatureStore(store_path)
+    owner = {column: group for group, columns in store.dataset_parts(dataset) for column in columns}
+    groups = {}
+    for feature in features:
+        group = owner.get(feature)
+        if group not in SERVABLE_GROUPS:
+            raise ValueError(f"Feature {feature!r} ({group or 'not in the store'}) cannot be built from a listing")
+        groups.setdefault(group, []).append(feature)
+    if 'desc_emb' in groups or 'desc_pca' in groups:
+        # desc_pca is fitted on the desc_emb vectors, so both come from the encoder that wrote desc_emb
+        embedding_model = embedding_model or store.source('desc_emb')
+        if embedding_model is None:
+            raise ValueError(f"{store.path} does not record the embedding model of desc_emb; re-run the feature "
+                             f"store cells of 2-7.ipynb or pass embedding_model")
+
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    import joblib
+    joblib.dump(model, os.path.join(tmp_path, 'model.joblib'))
+
+    arrays = {}
+    if mean is not None:
+        arrays['input_mean'], arrays['input_scale'] = np.asarray(mean), np.asarray(scale)
+    if 'continuous_scaled' in groups:
+        # 2-7.ipynb fits StandardScaler on every row of the raw continuous features
+        raw = store.group('continuous').to_numpy(np.float64)
+        std = raw.std(axis=0)
+        arrays['continuous_mean'], arrays['continuous_scale'] = raw.mean(axis=0), np.where(std == 0, 1.0, std)
+    np.savez(os.path.join(tmp_path, 'arrays.npz'), **arrays)
+
+    meta = {'features': list(features), 'dataset': dataset, 'groups': groups, 'embedding_model': embedding_model,
+            'created': datetime.now().isoformat(timespec='seconds')}
+    if 'continuous_scaled' in groups:
+        meta['continuous_columns'] = store.columns('continuous')
+    if 'target_encoded' in groups:
+        # Same maps as the test rows got in 2-7.ipynb: category means of Log_Price over the training split
+        categories = store.group('categorical')
+        categories['Make_Model'] = categories['Make'] + " " + categories['Model']
+        target = store.group('target')
+        train = target['cv_fold'] != -1
+        meta['target_mean'] = float(target[TARGET].mean())
+        meta['target_encoding'] = {column: target.loc[train, TARGET].groupby(categories.loc[train, column]).mean()
+                                   .astype(float).to_dict() for column in groups['target_encoded']}
+    if 'equipment' in groups:
+        shutil.copy(vocabulary_path, os.path.join(tmp_path, 'equipment_vocabulary.json'))
+    if 'desc_pca' in groups:
+        shutil.copytree(pca_path, os.path.join(tmp_path, 'desc_pca'))
+    with open(os.path.join(tmp_path, 'bundle.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1, ensure_ascii=False)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    print(f"✅ Model bundle saved to {path}/ ({len(features)} features from {', '.join(groups)})")
+
+def listing_key(listing):
+    """(listing ID, content digest): cached features are reused only for the same ID and the same content"""
+    advert = listing['advert']
+    data = orjson.dumps(advert, option=orjson.OPT_SORT_KEYS)
+    listing_id = str(advert.get('id') or listing.get('url') or '')
+    return listing_id, hashlib.blake2b(data, digest_size=12).hexdigest()
+
+def normalize_listing(listing):
+    """{'url', 'advert'} from a raw_json string, a {'advert': ...} page object or a bare advert.
+    Raises ValueError for anything else."""
+    if isinstance(listing, (str, bytes)):
+        listing = orjson.loads(listing)
+    if not isinstance(listing, dict):
+        raise ValueError(f"A listing must be a JSON object, not {type(listing).__name__}")
+    if 'advert' not in listing:
+        listing = {'advert': listing}
+    if not isinstance(listing['advert'], dict):
+        raise ValueError(f"'advert' must be a JSON object, not {type(listing['advert']).__name__}")
+    url = listing.get('url') or listing['advert'].get('url') or ''
+    if not isinstance(url, str):
+        raise ValueError("'url' must be a string")
+    return {'url': url, 'advert': listing['advert']}
+
+def simplify_transmission(value):
+    if value == 'Na przednie koła':
+        return 'FWD'
+    if value == 'Na tylne koła':
+        return 'RWD'
+    if isinstance(value, str) and value.startswith('4x4'):
+        return 'AWD'
+    return 'Unknown'
+
+def clean_listings(cars, year=None):
+    """The per-listing cleaning and derived columns of 2-5.ipynb and 2-7.ipynb applied to create_cars_subset
+    output. Dataset-level filters (price range, rare Make/Model pairs) do not apply to single listings."""
+    cars = cars.copy()
+    year = year or datetime.now().year
+    for column in ['No_Accidents', 'Service_Record', 'Is_Imported', 'First_Owner']:
+        cars[column] = np.where(cars[column] == 'Tak', 1, 0)
+    cars['Professional_Seller'] = np.where(cars['Seller_Type'] == 'PROFESSIONAL', 1, 0)
+    cars['Transmission'] = cars['Transmission'].map(simplify_transmission)
+    cars['Fuel_Type'] = cars['Fuel_Type'].map(FUEL_TYPES)
+
+    cars['Log_Mileage'] = np.log1p(cars['Mileage'])
+    cars['Age'] = year - cars['Year']
+    cars['Log_Age'] = np.log1p(cars['Age'])
+    cars['Mileage_per_Year'] = cars['Mileage'] / (cars['Age'] + 1)
+    capacity = cars['Engine_Capacity'].where(cars['Engine_Capacity'] > 0)
+    cars['Power_per_Liter'] = (cars['Engine_Power'] / (capacity / 1000)).fillna(0)
+
+    cars['Make'] = cars['Make'].str.strip().str.title()
+    cars['Model'] = cars['Model'].str.strip().str.title()
+    cars['Fuel_Type'] = cars['Fuel_Type'].str.strip().str.title()
+    cars['Gearbox'] = cars['Gearbox'].str.strip().str.title()
+    cars['Transmission'] = cars['Transmission'].str.strip().str.upper()
+    cars['Full_Description'] = cars['Full_Description'].fillna("").astype(str).str.strip()
+    cars['Make_Model'] = cars['Make'] + " " + cars['Model']
+    return cars
+
+def textual_input(cars):
+    """Textual_Input as built for the HerBERT embeddings in 2-7.ipynb"""
+    mileage = (cars['Mileage'].fillna(0) / 1000).round().astype(int).astype(str) + " tys. km"
+    power = cars['Engine_Power'].fillna(0).round().astype(int).astype(str) + " KM"
+    age = cars['Age'].fillna(0).astype(int).astype(str) + " lat"
+    equipment_desc = equipment_desc_from_frame(cars, [col for col in cars.columns if col.startswith("Equipment_")])
+    fuel = cars['Fuel_Type'].fillna("").str.lower()
+    return (cars['Make'] + " " + cars['Model'] + ", " + age + ", " + fuel + ", przebieg " + mileage + ", " + power
+            + ", skrzynia " + cars['Gearbox'].str.lower() + ", napęd " + cars['Transmission'].str.lower()
+            + ". Wyposażenie: " + equipment_desc + ". Opis: " + cars['Full_Description']).tolist()
+
+class LRUCache:
+    """Thread-safe mapping that keeps the `size` most recently used entries"""
+    def __init__(self, size=10000):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+class PricePredictor:
+    """A saved model bundle plus the listing -> feature pipeline it was trained with"""
+    def __init__(self, path=BUNDLE_DIR, cache_size=10000, embedding_store=None):
+        import joblib
+        self.path = path
+        with open(os.path.join(path, 'bundle.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.features = self.meta['features']
+        self.groups = self.meta['groups']
+        self.model = joblib.load(os.path.join(path, 'model.joblib'))
+        with np.load(os.path.join(path, 'arrays.npz')) as arrays:
+            self.arrays = dict(arrays)
+        self.vocabulary = None
+        if 'equipment' in self.groups:
+            self.vocabulary = EquipmentVocabulary.load(os.path.join(path, 'equipment_vocabulary.json'))
+        self.pca = None
+        if 'desc_pca' in self.groups:
+            self.pca = EmbeddingPCA(os.path.join(path, 'desc_pca'), n_components=len(self.groups['desc_pca']))
+        self.embedding_store_path = embedding_store
+        self._embedding_store = None
+        self._encoder = None
+        self.feature_cache = LRUCache(cache_size)
+        self.embedding_cache = LRUCache(cache_size)
+        _parsing_script()
+
+    @property
+    def needs_embeddings(self):
+        return 'desc_pca' in self.groups or 'desc_emb' in self.groups
+
+    def _embeddings(self, keys, texts):
+        """Description embeddings: LRU cache, then herbert_embeddings/, then the CPU encoder (loaded lazily)"""
+        vectors = [self.embedding_cache.get((key, text)) for key, text in zip(keys, texts)]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            from embedding_store import EmbeddingStore, STORE_DIR as EMBEDDING_DIR, cpu_herbert_encoder
+            model_name, _, variant = self.meta['embedding_model'].partition('#')
+            if self._embedding_store is None:
+                self._embedding_store = EmbeddingStore(self.embedding_store_path or EMBEDDING_DIR,
+                                                       self.meta['embedding_model'])
+            store = self._embedding_store
+            new_texts = store.missing([texts[i] for i in missing])
+            if new_texts:
+                if self._encoder is None:
+                    self._encoder = cpu_herbert_encoder(model_name, store.max_length, quantize=variant == 'int8')
+                store.add(new_texts, self._encoder(new_texts))
+            for i, vector in zip(missing, store.lookup([texts[i] for i in missing])):
+                vectors[i] = vector
+                self.embedding_cache.put((keys[i], texts[i]), vector)
+        return np.vstack(vectors).astype(np.float32)
+
+    def featurize(self, listings):
+        """(feature matrix, {row: error}) for normalised listings; rows with an error are left as NaN"""
+        script = _parsing_script()
+        frame = pd.DataFrame({'url': [listing['url'] for listing in listings],
+                              'raw_json': [orjson.dumps({'advert': listing['advert']}).decode('utf-8')
+                                           for listing in listings]})
+        parsed = parse_records(frame['url'], frame['raw_json']).reindex(columns=script.SELECTED_COLUMNS,
+                                                                          fill_value='')
+        cars = script.create_cars_subset(parsed, verbose=False)
+        errors = {row: "Not a used, undamaged car" for row in range(len(listings)) if row not in cars.index}
+        cars = clean_listings(cars)
+        unsupported = cars['Fuel_Type'].isna() | (cars['Age'] < 0)
+        errors.update({row: "Unsupported fuel type or production year" for row in cars.index[unsupported]})
+        cars = cars[~unsupported]
+
+        X = np.full((len(listings), len(self.features)), np.nan, dtype=np.float32)
+        if cars.empty:
+            return X, errors
+        columns = {}
+        if 'continuous' in self.groups or 'continuous_scaled' in self.groups:
+            raw = cars[CONTINUOUS_BASE].to_numpy(np.float64)
+            for column in self.groups.get('continuous', []):
+                columns[column] = raw[:, CONTINUOUS_BASE.index(column)]
+            if 'continuous_scaled' in self.groups:
+                positions = [self.meta['continuous_columns'].index(column) for column in CONTINUOUS_BASE]
+                scaled = (raw - self.arrays['continuous_mean'][positions]) / self.arrays['continuous_scale'][positions]
+                for column in self.groups['continuous_scaled']:
+                    columns[column] = scaled[:, CONTINUOUS_BASE.index(column)]
+        for column in self.groups.get('binary', []):
+            columns[column] = cars[column].to_numpy(np.float64)
+        if 'onehot' in self.groups:
+            onehot = {column: np.zeros(len(cars)) for column in self.groups['onehot']}
+            for category in CATEGORICAL:
+                for position, value in enumerate(category + "_" + cars[category].astype(str)):
+                    if value in onehot:
+                        onehot[value][position] = 1.0
+            columns.update(onehot)
+        for column in self.groups.get('target_encoded', []):
+            encoding = self.meta['target_encoding'][column]
+            columns[column] = cars[column].map(encoding).fillna(self.meta['target_mean']).to_numpy(np.float64)
+        if 'equipment' in self.groups:
+            matrix = encode_equipment(cars.reindex(columns=EQUIPMENT_COLUMNS, fill_value=''), self.vocabulary)
+            names = {name: position for position, name in enumerate(self.vocabulary.feature_names)}
+            dense = matrix.toarray()
+            for column in self.groups['equipment']:
+                columns[column] = dense[:, names[column]].astype(np.float64)
+        if self.needs_embeddings:
+            keys = [listing_key(listings[row])[0] for row in cars.index]
+            vectors = self._embeddings(keys, textual_input(cars))
+            for column in self.groups.get('desc_emb', []):
+                columns[column] = vectors[:, int(column.rsplit('_', 1)[1])]
+            if self.pca is not None:
+                projected = self.pca.transform([vectors])
+                for column in self.groups['desc_pca']:
+                    columns[column] = projected[:, int(column.rsplit('_', 1)[1])]
+
+        X[cars.index.to_numpy()] = np.column_stack([columns[feature] for feature in self.features])
+        return X, errors
+
+    def _featurize_each(self, listings):
+        """featurize, falling back to one listing at a time when the batch raises, so that a listing that breaks
+        the pipeline only fails itself. Returns (X, errors, positions that raised); those are not cached."""
+        try:
+            X, errors = self.featurize(listings)
+            return X, errors, set()
+        except Exception as e:
+            if len(listings) > 1:
+                X = np.full((len(listings), len(self.features)), np.nan, dtype=np.float32)
+                errors, failed = {}, set()
+                for position, listing in enumerate(listings):
+                    row, error, raised = self._featurize_each([listing])
+                    X[position] = row[0]
+                    if error:
+                        errors[position] = error[0]
+                    if raised:
+                        failed.add(position)
+                return X, errors, failed
+            X = np.full((1, len(self.features)), np.nan, dtype=np.float32)
+            return X, {0: f"Could not build features: {type(e).__name__}: {e}"}, {0}
+
+    def predict(self, listings):
+        """[{'id', 'Log_Price', 'Price'} or {'id', 'error'}] for a list of listings in any normalize_listing form;
+        a listing that cannot be read or featurised gets an error entry instead of failing the others"""
+        keys, rows, valid_listings = [], [], {}
+        for i, listing in enumerate(listings):
+            try:
+                listing = normalize_listing(listing)
+                key = listing_key(listing)
+            except (ValueError, TypeError) as e:
+                keys.append(('', None))
+                rows.append(f"Invalid listing: {e}")
+                continue
+            keys.append(key)
+            rows.append(self.feature_cache.get(key))
+            valid_listings[i] = listing
+        pending = [i for i, row in enumerate(rows) if row is None]
+        if pending:
+            X, errors, failed = self._featurize_each([valid_listings[i] for i in pending])
+            for position, i in enumerate(pending):
+                rows[i] = errors.get(position, X[position])
+                if position not in failed:
+                    self.feature_cache.put(keys[i], rows[i])
+
+        valid = [i for i, row in enumerate(rows) if not isinstance(row, str)]
+        results = [{'id': key[0], 'error': row} if isinstance(row, str) else None for key, row in zip(keys, rows)]
+        if valid:
+            X = np.vstack([rows[i] for i in valid])
+            if 'input_mean' in self.arrays:
+                X = ((X - self.arrays['input_mean']) / self.arrays['input_scale']).astype(np.float32)
+            log_price = np.asarray(self.model.predict(X), dtype=np.float64).ravel()
+            for i, value in zip(valid, log_price):
+                results[i] = {'id': keys[i][0], 'Log_Price': round(float(value), 6),
+                              'Price': round(float(np.expm1(value)), 2)}
+        return results
+
+class MicroBatcher:
+    """Collects listings from concurrent callers into batches of up to max_batch, waiting at most max_wait
+    seconds after the first one, and scores each batch with one predict call on a worker thread"""
+    def __init__(self, predict, max_batch=64, max_wait=0.005):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, listings):
+        future = Future()
+        self.requests.put((list(listings), future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+                size += len(batch[-1][0])
+            try:
+                results = self.predict([listing for listings, _ in batch for listing in listings])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for listings, future in batch:
+                future.set_result(results[start:start + len(listings)])
+                start += len(listings)
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    # Set by make_server
+    batcher = None
+    predictor = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        data = orjson.dumps(payload)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            cache = self.predictor.feature_cache
+            self.send_json(200, {'status': 'ok', 'features': len(self.predictor.features),
+                                 'feature_cache': {'hits': cache.hits, 'misses': cache.misses}})
+        else:
+            self.send_json(404, {'error': 'Not Found'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self.send_json(404, {'error': 'Not Found'})
+            return
+        try:
+            payload = orjson.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except orjson.JSONDecodeError as e:
+            self.send_json(400, {'error': f"Invalid JSON: {e}"})
+            return
+        single = not isinstance(payload, list)
+        listings = [payload] if single else payload
+        try:
+            listings = [normalize_listing(listing) for listing in listings]
+        except (ValueError, TypeError) as e:
+            self.send_json(400, {'error': f"Invalid listing: {e}"})
+            return
+        try:
+            results = self.batcher.submit(listings).result()
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            return
+        self.send_json(200, results[0] if single else results)
+
+class PredictionServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer with a listen backlog for many concurrent clients: the default of 5 makes
+    connections beyond it wait for SYN retransmits (about 1 s) or get reset"""
+    daemon_threads = True
+
+    def __init__(self, address, handler, backlog=128):
+        self.request_queue_size = backlog
+        super().__init__(address, handler)
+
+def make_server(predictor, port=8080, max_batch=64, max_wait=0.005, backlog=128):
+    handler = type('Handler', (PredictionHandler,), {
+        'predictor': predictor,
+        'batcher': MicroBatcher(predictor.predict, max_batch, max_wait),
+    })
+    return PredictionServer(('127.0.0.1', port), handler, backlog)
+
+def start_in_background(predictor, **kwargs):
+    """Serve predictor on a daemon thread; returns (server, base_url)"""
+    server = make_server(predictor, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve price predictions for raw otomoto listings")
+    parser.add_argument('--bundle', default=BUNDLE_DIR, help="Directory written by save_bundle")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch', type=int, default=64, help="Listings scored together at most")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help="Time a batch waits for more requests")
+    parser.add_argument('--cache-size', type=int, default=10000, help="Listings kept in the feature cache")
+    parser.add_argument('--backlog', type=int, default=128, help="Pending connections the socket queues")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    predictor = PricePredictor(args.bundle, args.cache_size)
+    server = make_server(predictor, args.port, args.max_batch, args.max_wait_ms / 1000, args.backlog)
+    print(f"Serving {args.bundle} on http://127.0.0.1:{args.port}/predict "
+          f"(loaded in {time.perf_counter() - start:.2f} s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import namedtuple
+from functools import partial, reduce
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from experiment_runner import score
+from feature_store import STORE_DIR, FeatureStore
+from fold_cache import TARGET, TEST_FOLD, split_rows
+
+# Out-of-fold and test predictions of every model in the 3-x notebooks, for
+# blending them without retraining. Each model's predictions are one zstd
+# Parquet file in predictions/ with a row per (listing, fold): the listing is
+# its feature-store row (the index of every load_dataset frame, the same
+# listing in every dataset), the fold is its cv_fold (-1 for the test split
+# prediction of the model refitted on all training rows), next to the
+# prediction and the target. Row numbers only mean something for one build of
+# the feature store, so every write is checked against its cv_fold and target
+# columns and each file records their fingerprint: after 2-7 rebuilds the
+# store, files from the old build are refused instead of being blended with
+# the wrong listings. Writing a model replaces only the folds written, so CV
+# and test predictions can come from different cells. matrices() lines
+# the models up on the listings all of them predicted, and the blenders below
+# (non-negative least squares, a ridge stacker and greedy ensemble selection)
+# are solved from the models x models Gram matrix of those OOF columns, in
+# milliseconds; compare_ensembles scores each blender by refitting it on the
+# OOF rows of the other folds.
+
+PREDICTIONS_DIR = 'predictions'
+
+Matrices = namedtuple('Matrices', ['models', 'rows', 'folds', 'y', 'oof', 'test_rows', 'y_test', 'test'])
+
+def listing_rows(frame):
+    """Listing keys of a load_dataset frame (or a row subset of one): its feature-store row numbers"""
+    return np.asarray(frame.index, dtype=np.int64)
+
+def fingerprint(cv_fold, target):
+    """Identity of a feature-store build: its row count and a hash of its cv_fold and target columns"""
+    cv_fold = np.ascontiguousarray(cv_fold, dtype=np.int8)
+    digest = hashlib.blake2b(cv_fold.tobytes(), digest_size=8)
+    digest.update(np.ascontiguousarray(target, dtype=np.float32).tobytes())
+    return f"{len(cv_fold)}-{digest.hexdigest()}"
+
+def store_targets(path=STORE_DIR, target=TARGET):
+    """(cv_fold, target) arrays of every listing in the feature store at path"""
+    store = FeatureStore(path)
+    if 'target' not in store.groups:
+        raise FileNotFoundError(f"No target group in {path}; predictions are keyed by its rows, run 2-7.ipynb first")
+    frame = store.group('target', ['cv_fold', target])
+    return frame['cv_fold'].to_numpy(np.int8), frame[target].to_numpy(np.float32)
+
+def experiment_label(name, params=None):
+    """Store name of an ExperimentRunner job's model: the registry name, plus its params if any"""
+    return f"{name} {json.dumps(params, sort_keys=True)}" if params else name
+
+class PredictionStore:
+    """Per-model OOF (fold >= 0) and test (fold -1) predictions keyed by feature-store row.
+
+    reference is the (cv_fold, target) pair of the listings the rows refer to; by default it is read from
+    the feature store at features_path when first needed.
+    """
+    def __init__(self, path=PREDICTIONS_DIR, features_path=STORE_DIR, reference=None):
+        self.path = path
+        self.features_path = features_path
+        self._reference = reference
+        self._fingerprint = None
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def reference(self):
+        if self._reference is None:
+            self._reference = store_targets(self.features_path)
+        cv_fold, target = self._reference
+        self._reference = np.asarray(cv_fold, dtype=np.int8), np.asarray(target, dtype=np.float32)
+        return self._reference
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(*self.reference)
+        return self._fingerprint
+
+    def _fingerprint_of(self, model):
+        metadata = pq.read_schema(self._file(model)).metadata or {}
+        return metadata.get(b'fingerprint', b'').decode('utf-8') or None
+
+    def _check(self, model, rows, folds, targets):
+        """Raise ValueError unless rows are listings of the current feature store with these folds and targets"""
+        cv_fold, target = self.reference
+        if len(rows) and (rows.min() < 0 or rows.max() >= len(target)):
+            raise ValueError(f"{model}: rows outside the {len(target)} listings of the feature store")
+        if not (np.array_equal(folds, cv_fold[rows]) and np.array_equal(targets, target[rows], equal_nan=True)):
+            raise ValueError(f"{model}: folds or targets differ from the feature store's at these rows; the "
+                             f"predictions do not come from the current build of {self.features_path}")
+
+    def _file(self, model):
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model)[:60]
+        digest = hashlib.blake2b(model.encode('utf-8'), digest_size=4).hexdigest()
+        return os.path.join(self.path, f"{slug}-{digest}.parquet")
+
+    @property
+    def models(self):
+        names = []
+        for filename in sorted(os.listdir(self.path)):
+            if filename.endswith('.parquet'):
+                metadata = pq.read_schema(os.path.join(self.path, filename)).metadata
+                names.append(metadata[b'model'].decode('utf-8'))
+        return names
+
+    def write(self, model, rows, folds, predictions, targets):
+        """Save predictions of model for the listings `rows`; folds is one fold id or one per row.
+        Predictions the model already has for these folds are replaced, other folds are kept."""
+        rows = np.asarray(rows, dtype=np.int64)
+        predictions = np.asarray(predictions, dtype=np.float32).ravel()
+        targets = np.asarray(targets, dtype=np.float32).ravel()
+        folds = np.broadcast_to(np.asarray(folds, dtype=np.int8), rows.shape)
+        if not len(rows) == len(predictions) == len(targets):
+            raise ValueError(f"{model}: {len(rows)} rows, {len(predictions)} predictions, {len(targets)} targets")
+        self._check(model, rows, folds, targets)
+        frame = pd.DataFrame({'row': rows, 'fold': folds, 'prediction': predictions, 'target': targets})
+        path = self._file(model)
+        if os.path.exists(path):
+            if self._fingerprint_of(model) != self.fingerprint:
+                raise ValueError(f"{model} has predictions from another build of the feature store; "
+                                 f"delete({model!r}) and write all of its folds again")
+            kept = self.read(model)
+            frame = pd.concat([kept[~kept['fold'].isin(np.unique(folds))], frame], ignore_index=True)
+        frame = frame.sort_values(['fold', 'row'], kind='stable', ignore_index=True)
+
+        table = pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata(
+            {'model': model, 'fingerprint': self.fingerprint})
+        pq.write_table(table, path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+
+    def write_frame(self, model, frame, predictions, mask=None, target=TARGET):
+        """write() for rows of a load_dataset frame (the rows selected by mask, if given), folds from cv_fold"""
+        if mask is not None:
+            frame = frame[mask]
+        self.write(model, listing_rows(frame), frame['cv_fold'].to_numpy(), predictions, frame[target].to_numpy())
+
+    def read(self, model):
+        """DataFrame of row, fold, prediction and target of one model"""
+        path = self._file(model)
+        if not os.path.exists(path):
+            raise KeyError(f"No predictions of {model} in {self.path}")
+        return pq.read_table(path).to_pandas()
+
+    def delete(self, model):
+        if os.path.exists(self._file(model)):
+            os.remove(self._file(model))
+
+    def leaderboard(self, models=None):
+        """Mean per-fold CV metrics and test metrics of every stored model, sorted by MAE_CV"""
+        rows = {}
+        for model in models or self.models:
+            frame = self.read(model)
+            oof, test = frame[frame['fold'] != TEST_FOLD], frame[frame['fold'] == TEST_FOLD]
+            cv = pd.DataFrame([score(part['target'], part['prediction']) for _, part in oof.groupby('fold')]).mean()
+            test_scores = score(test['target'], test['prediction']) if len(test) else {}
+            rows[model] = {'MAE_CV': cv.get('MAE'), 'RMSE_CV': cv.get('RMSE'), 'R2_CV': cv.get('R2'),
+                           **{f"{metric}_Test": value for metric, value in test_scores.items()},
+                           'Rows_CV': len(oof), 'Rows_Test': len(test)}
+        return pd.DataFrame.from_dict(rows, orient='index').sort_values('MAE_CV').round(4)
+
+    def matrices(self, models=None):
+        """Matrices of the models' OOF and test predictions (one column per model) on the listings every
+        model predicted. Raises ValueError if a model's predictions come from another build of the feature
+        store or two models put a listing in different folds."""
+        models = list(models or self.models)
+        stale = [model for model in models if self._fingerprint_of(model) != self.fingerprint]
+        if stale:
+            raise ValueError(f"Predictions of {stale} come from another build of the feature store; "
+                             f"re-run their notebooks (or delete them) before blending")
+        frames = [self.read(model).set_index('row') for model in models]
+        parts = []
+        for test in (False, True):
+            selected = [frame[(frame['fold'] == TEST_FOLD) == test] for frame in frames]
+            rows = reduce(partial(np.intersect1d, assume_unique=True),
+                          [frame.index.to_numpy() for frame in selected])
+            aligned = [frame.loc[rows] for frame in selected]
+            for model, frame in zip(models[1:], aligned[1:]):
+                if not np.array_equal(frame['fold'].to_numpy(), aligned[0]['fold'].to_numpy()):
+                    raise ValueError(f"{model} was cross-validated on other folds than {models[0]}")
+            predictions = np.column_stack([frame['prediction'].to_numpy(dtype=np.float64) for frame in aligned])
+            parts.append((rows, aligned[0]['fold'].to_numpy(), aligned[0]['target'].to_numpy(dtype=np.float64),
+                          predictions))
+        (rows, folds, y, oof), (test_rows, _, y_test, test) = parts
+        return Matrices(models, rows, folds, y, oof, test_rows, y_test, test)
+
+def record_experiments(store, runner, frame):
+    """Write the checkpointed predictions of every finished ExperimentRunner job to store. frame is the
+    load_dataset frame the runner's FoldCache was built from; it maps each fold's rows back to listings."""
+    features, target = runner.folds.features, runner.folds.meta['target']
+    train, test = split_rows(frame, features)
+    cv_fold = frame['cv_fold'].to_numpy()
+    rows, y = listing_rows(frame), frame[target].to_numpy()
+    jobs = {}
+    for name, params, fold in runner.jobs():
+        if runner.finished(name, params, fold):
+            jobs.setdefault((name, json.dumps(params, sort_keys=True)), []).append(fold)
+    for (name, params), folds in jobs.items():
+        params = json.loads(params)
+        masks = [test if fold == TEST_FOLD else train & (cv_fold == fold) for fold in folds]
+        predictions = [runner.predictions(name, fold, params) for fold in folds]
+        for fold, mask, prediction in zip(folds, masks, predictions):
+            if mask.sum() != len(prediction):
+                raise ValueError(f"{name} fold {fold}: {len(prediction)} predictions for {mask.sum()} rows; "
+                                 f"frame is not the one {runner.folds.path} was built from")
+        store.write(experiment_label(name, params), np.concatenate([rows[mask] for mask in masks]),
+                    np.concatenate([np.full(mask.sum(), fold) for fold, mask in zip(folds, masks)]),
+                    np.concatenate(predictions), np.concatenate([y[mask] for mask in masks]))
+    print(f"💾 Predictions of {len(jobs)} model(s) written to {store.path}")
+
+class Blend:
+    """Weighted sum of model predictions plus an intercept"""
+    def __init__(self, method, models, weights, intercept=0.0):
+        self.method = method
+        self.weights = pd.Series(np.asarray(weights, dtype=np.float64), index=list(models))
+        self.intercept = float(intercept)
+
+    def predict(self, predictions):
+        return np.asarray(predictions) @ self.weights.to_numpy() + self.intercept
+
+    def __repr__(self):
+        used = self.weights[self.weights != 0].round(4).to_dict()
+        return f"Blend({self.method}, {used}, intercept={self.intercept:.4f})"
+
+def _normal_equations(oof, y):
+    """Gram matrix and moments of the OOF columns: every blender works on (models x models) sums from here"""
+    return oof.T @ oof, oof.T @ y, y @ y
+
+def fit_nnls(oof, y, models=None):
+    """Non-negative least squares weights of the OOF columns (no intercept), solved on the Cholesky factor of
+    their Gram matrix instead of the (rows x models) matrix"""
+    from scipy.linalg import cholesky, solve_triangular
+    from scipy.optimize import nnls
+
+    gram, moment, _ = _normal_equations(oof, y)
+    # A little jitter keeps the factorisation defined when two models predict the same
+    jitter = 1e-10 * np.trace(gram) / len(gram)
+    upper = cholesky(gram + jitter * np.eye(len(gram)))
+    weights, _ = nnls(upper, solve_triangular(upper, moment, trans='T'))
+    return Blend('NNLS', models or range(oof.shape[1]), weights)
+
+def fit_ridge(oof, y, models=None, alpha=1.0):
+    """Ridge stacker with intercept, solved from the (models x models) normal equations"""
+    mean_p, mean_y = oof.mean(axis=0), y.mean()
+    gram, moment, _ = _normal_equations(oof, y)
+    gram = gram - len(y) * np.outer(mean_p, mean_p) + alpha * np.eye(len(gram))
+    weights = np.linalg.solve(gram, moment - len(y) * mean_p * mean_y)
+    return Blend('Ridge', models or range(oof.shape[1]), weights, mean_y - mean_p @ weights)
+
+def fit_greedy(oof, y, models=None, rounds=50):
+    """Greedy ensemble selection with replacement (Caruana et al.): repeatedly add the model that most lowers
+    the squared error of the running average; weights are the selection counts of the best round. The error
+    of every candidate average follows from the Gram matrix, so a round costs O(models^2), not a pass over rows."""
+    gram, moment, total = _normal_equations(oof, y)
+    counts = np.zeros(len(gram))
+    best_error, best_counts = np.inf, counts
+    for step in range(1, rounds + 1):
+        # |(s + p_j) / step - y|^2 with s = oof @ counts, for every candidate j
+        cross = gram @ counts
+        errors = ((counts @ cross + 2 * cross + np.diag(gram)) / step ** 2
+                  - 2 * (counts @ moment + moment) / step + total)
+        chosen = int(np.argmin(errors))
+        counts[chosen] += 1
+        if errors[chosen] < best_error:
+            best_error, best_counts = errors[chosen], counts.copy()
+    return Blend('Greedy', models or range(oof.shape[1]), best_counts / best_counts.sum())
+
+BLENDERS = {'NNLS': fit_nnls, 'Ridge': fit_ridge, 'Greedy': fit_greedy}
+
+def cross_fit(blender, oof, y, folds):
+    """OOF predictions of a blender itself: for each fold, fitted on the other folds' rows"""
+    blended = np.empty(len(y))
+    for fold in np.unique(folds):
+        rows = folds == fold
+        blended[rows] = blender(oof[~rows], y[~rows]).predict(oof[rows])
+    return blended
+
+def column_scores(y, predictions):
+    """MAE, RMSE and R2 (as experiment_runner.score) of every column of predictions at once"""
+    errors = predictions - y[:, None]
+    squared = (errors ** 2).sum(axis=0)
+    return {'MAE': np.abs(errors).mean(axis=0), 'RMSE': np.sqrt(squared / len(y)),
+            'R2': 1 - squared / ((y - y.mean()) ** 2).sum()}
+
+def compare_ensembles(store, models=None, blenders=BLENDERS):
+    """Every model and every blender of their OOF predictions with CV metrics (blenders cross-fitted over
+    the folds) and test metrics (blenders fitted on all OOF rows). Returns (table sorted by MAE_CV,
+    {blender: Blend fitted on all OOF rows})."""
+    data = store.matrices(models)
+    names, oof, test = list(data.models), [data.oof], [data.test]
+    blends, fit_ms = {}, {}
+    for name, blender in blenders.items():
+        start = time.perf_counter()
+        blends[name] = blender(data.oof, data.y, data.models)
+        fit_ms[f"{name} blend"] = (time.perf_counter() - start) * 1000
+        names.append(f"{name} blend")
+        oof.append(cross_fit(blender, data.oof, data.y, data.folds)[:, None])
+        test.append(blends[name].predict(data.test)[:, None])
+    oof, test = np.hstack(oof), np.hstack(test)
+
+    # Mean of per-fold metrics, as in the notebooks' CV tables
+    folds = [data.folds == fold for fold in np.unique(data.folds)]
+    cv = [column_scores(data.y[rows], oof[rows]) for rows in folds]
+    table = pd.DataFrame({f"{metric}_CV": np.mean([scores[metric] for scores in cv], axis=0)
+                          for metric in ('MAE', 'RMSE', 'R2')}, index=names)
+    if len(data.y_test):
+        for metric, values in column_scores(data.y_test, test).items():
+            table[f"{metric}_Test"] = values
+    table['Fit_ms'] = pd.Series(fit_ms)
+    print(f"📊 {len(data.models)} models on {len(data.rows)} OOF and {len(data.test_rows)} test listings")
+    return table.sort_values('MAE_CV').round(4), blends
@@ -0,0 +1,160 @@
+import os
+import struct
+
+import zstandard
+
+# Append-only store for scraped listings, replacing the raw_json column of
+# otomoto_cars.csv. Each record is a 4-byte little-endian length followed by a
+# zstd frame holding "url\nraw_json" (raw_json empty when the page had no data).
+# A sidecar "<log>.idx" holds one "offset\turl" line per record, so resuming
+# only reads the index and membership checks are dict lookups.
+
+RECORDS_FILE = 'otomoto_cars.records'
+HEADER = struct.Struct('<I')
+
+class RecordLog:
+    def __init__(self, path=RECORDS_FILE, level=3):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.decompressor = zstandard.ZstdDecompressor()
+        self.offsets = {}
+        self.log = open(path, 'a+b')
+        self._load_index()
+        self._recover_tail()
+        self.index = open(self.index_path, 'a', encoding='utf-8')
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                offset, sep, url = line.rstrip('\n').partition('\t')
+                if sep:
+                    self.offsets[url] = int(offset)
+
+    def _recover_tail(self):
+        """Index records written after the last index line and drop a torn final record"""
+        size = self.log.seek(0, os.SEEK_END)
+        last = max(self.offsets.values(), default=None)
+        position = last or 0
+
+        recovered = []
+        while position + HEADER.size <= size:
+            length = self._read_length(position)
+            if position + HEADER.size + length > size:
+                break
+            if position != last:
+                url, _ = self._read_record(position)
+                self.offsets[url] = position
+                recovered.append((position, url))
+            position += HEADER.size + length
+
+        stale = [url for url, offset in self.offsets.items() if offset >= position]
+        if position < size:
+            print(f"⚠️ Dropping {size - position} bytes of an incomplete record at the end of {self.path}")
+            self.log.truncate(position)
+        for url in stale:
+            del self.offsets[url]
+
+        if stale:
+            # The index points past the end of the log, rewrite it from what survived
+            with open(self.index_path, 'w', encoding='utf-8') as f:
+                for url, offset in sorted(self.offsets.items(), key=lambda item: item[1]):
+                    f.write(f"{offset}\t{url}\n")
+        elif recovered:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                for offset, url in recovered:
+                    f.write(f"{offset}\t{url}\n")
+        if recovered:
+            print(f"Recovered {len(recovered)} records missing from {self.index_path}")
+
+    def _read_length(self, offset):
+        self.log.seek(offset)
+        return HEADER.unpack(self.log.read(HEADER.size))[0]
+
+    def _read_record(self, offset):
+        length = self._read_length(offset)
+        payload = self.decompressor.decompress(self.log.read(length))
+        url, _, raw_json = payload.decode('utf-8').partition('\n')
+        return url, raw_json or None
+
+    def _index(self, url, offset):
+        self.offsets[url] = offset
+        self.index.write(f"{offset}\t{url}\n")
+
+    def __contains__(self, url):
+        return url in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def urls(self):
+        return set(self.offsets)
+
+    def append(self, url, raw_json):
+        """Append one listing; a URL appended twice resolves to its latest record"""
+        payload = self.compressor.compress(f"{url}\n{raw_json or ''}".encode('utf-8'))
+        offset = self.log.seek(0, os.SEEK_END)
+        self.log.write(HEADER.pack(len(payload)) + payload)
+        self._index(url, offset)
+
+    def append_many(self, rows):
+        """Append (url, raw_json) pairs and flush once"""
+        for url, raw_json in rows:
+            self.append(url, raw_json)
+        self.flush()
+
+    def flush(self):
+        # Records reach the disk before the index lines pointing at them
+        self.log.flush()
+        self.index.flush()
+
+    def get(self, url):
+        """Random access to one listing's raw_json"""
+        offset = self.offsets.get(url)
+        if offset is None:
+            return None
+        self.log.flush()
+        return self._read_record(offset)[1]
+
+    def iter_records(self):
+        """Stream (url, raw_json) in write order, skipping records superseded by a later append"""
+        self.flush()
+        with open(self.path, 'rb') as f:
+            offset = 0
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                length = HEADER.unpack(header)[0]
+                payload = f.read(length)
+                url, _, raw_json = self.decompressor.decompress(payload).decode('utf-8').partition('\n')
+                if self.offsets.get(url) == offset:
+                    yield url, raw_json or None
+                offset += HEADER.size + length
+
+    def close(self):
+        self.flush()
+        self.index.close()
+        self.log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def migrate_csv(csv_file='otomoto_cars.csv', path=RECORDS_FILE, chunksize=1000):
+    """Copy an existing otomoto_cars.csv into the record log, streaming it in chunks"""
+    import pandas as pd
+
+    with RecordLog(path) as log:
+        before = len(log)
+        for chunk in pd.read_csv(csv_file, dtype={'url': str, 'raw_json': str}, chunksize=chunksize):
+            log.append_many(
+                (url, raw_json if isinstance(raw_json, str) else None)
+                for url, raw_json in zip(chunk['url'], chunk['raw_json'])
+            )
+        print(f"Migrated {len(log) - before} listings from {csv_file} to {path}")
+        return len(log)
@@ -0,0 +1,225 @@
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.linear_model import lasso_path
+from sklearn.tree import DecisionTreeRegressor
+
+# Whole hyperparameter paths from one fit, for the ccp_alpha search in 3-2 and
+# the RidgeCV/LassoCV models in 3-1.
+#
+# Trees: DecisionTreeRegressor grows the same tree for every ccp_alpha and only
+# prunes it afterwards, so one unpruned tree per fold is enough. The weakest-link
+# pruning sequence is replayed once (same order and arithmetic as scikit-learn)
+# and every candidate alpha is scored from the node each sample stops at.
+#
+# Linear models: the inner KFold of RidgeCV/LassoCV is kept, but X'X, X'y and
+# the column sums are accumulated once per inner fold and every training Gram
+# matrix is derived from them. Ridge solves all alphas at once from the
+# eigendecomposition of the centred Gram matrix (the SVD of X); Lasso runs a
+# warm-started coordinate-descent path on the precomputed Gram matrix, and the
+# final model continues that path instead of refitting from zero.
+
+TREE_PARAMS = {'max_depth': 20, 'min_samples_leaf': 20, 'random_state': 42}
+
+def pruning_sequence(tree):
+    """(alphas, nodes): effective alpha and collapsed node of every weakest-link pruning step"""
+    t = tree.tree_
+    n_nodes = t.node_count
+    left, right = t.children_left, t.children_right
+    is_leaf = left == -1
+    r_node = t.weighted_n_node_samples * t.impurity / t.weighted_n_node_samples[0]
+
+    parent = np.full(n_nodes, -1, dtype=np.intp)
+    internal = np.flatnonzero(~is_leaf)
+    parent[left[internal]] = internal
+    parent[right[internal]] = internal
+
+    r_branch = np.zeros(n_nodes)
+    n_leaves = np.zeros(n_nodes, dtype=np.intp)
+    for leaf in np.flatnonzero(is_leaf):
+        r_branch[leaf] = r_node[leaf]
+        node = leaf
+        while node != 0:
+            node = parent[node]
+            r_branch[node] += r_node[leaf]
+            n_leaves[node] += 1
+
+    candidate = ~is_leaf
+    alphas, nodes = [], []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        while candidate[0]:
+            subtree_alpha = np.where(candidate, (r_node - r_branch) / (n_leaves - 1), np.inf)
+            pruned = int(np.argmin(subtree_alpha))
+            alphas.append(subtree_alpha[pruned])
+            nodes.append(pruned)
+
+            stack = [pruned]
+            while stack:
+                node = stack.pop()
+                if candidate[node]:
+                    candidate[node] = False
+                    stack.extend((left[node], right[node]))
+
+            n_pruned_leaves = n_leaves[pruned] - 1
+            n_leaves[pruned] = 0
+            r_diff = r_node[pruned] - r_branch[pruned]
+            r_branch[pruned] = r_node[pruned]
+            node = parent[pruned]
+            while node != -1:
+                n_leaves[node] -= n_pruned_leaves
+                r_branch[node] += r_diff
+                node = parent[node]
+    return np.array(alphas), np.array(nodes, dtype=np.intp)
+
+def pruned_predictions(tree, X, ccp_alphas):
+    """Predictions (n_samples x n_alphas) of tree refitted with each ccp_alpha, without refitting"""
+    alphas, nodes = pruning_sequence(tree)
+    collapsed_at = np.full(tree.tree_.node_count, len(alphas), dtype=np.intp)
+    collapsed_at[nodes] = np.arange(len(nodes))
+    # scikit-learn stops at the first step whose alpha exceeds ccp_alpha
+    steps = np.searchsorted(np.maximum.accumulate(alphas), ccp_alphas, side='right')
+
+    # Node IDs grow from the root down, so each row's sorted indices are its path
+    path = tree.decision_path(X).tocsr()
+    path.sort_indices()
+    depth = np.diff(path.indptr)
+    rows = np.repeat(np.arange(len(depth)), depth)
+    columns = np.arange(len(path.indices)) - np.repeat(path.indptr[:-1], depth)
+    nodes_on_path = np.repeat(path.indices[path.indptr[1:] - 1][:, None], depth.max(), axis=1)
+    nodes_on_path[rows, columns] = path.indices
+    step_on_path = collapsed_at[nodes_on_path]
+    step_on_path[:, -1] = -1  # the original leaf (or its padding) always ends the path
+
+    values = tree.tree_.value[:, 0, 0]
+    predictions = np.empty((len(depth), len(ccp_alphas)))
+    for i, step in enumerate(steps):
+        stop = np.argmax(step_on_path < step, axis=1)
+        predictions[:, i] = values[nodes_on_path[np.arange(len(depth)), stop]]
+    return predictions
+
+def r2_columns(y, predictions):
+    """r2_score of each prediction column"""
+    y = np.asarray(y, dtype=np.float64)
+    sse = ((predictions - y[:, None]) ** 2).sum(axis=0)
+    sst = ((y - y.mean()) ** 2).sum()
+    return 1 - sse / sst if sst else np.where(sse == 0, 1.0, 0.0)
+
+def candidate_ccp_alphas(X, y, max_alphas=100, **tree_params):
+    """Candidate grid of 3-2: the pruning path on (X, y), rounded, deduplicated and thinned to max_alphas"""
+    params = {**TREE_PARAMS, **tree_params}
+    ccp_alphas = DecisionTreeRegressor(**params).cost_complexity_pruning_path(X, y).ccp_alphas[:-1]
+    ccp_alphas = np.unique(np.round(ccp_alphas, 8))
+    if len(ccp_alphas) > max_alphas:
+        ccp_alphas = ccp_alphas[::len(ccp_alphas) // max_alphas]
+    return ccp_alphas
+
+def ccp_alpha_scores(folds, ccp_alphas, **tree_params):
+    """Validation R2 (n_alphas x n_folds) of every ccp_alpha on every fold of a FoldCache, one tree per fold"""
+    params = {**TREE_PARAMS, **tree_params, 'ccp_alpha': 0.0}
+    scores = np.empty((len(ccp_alphas), len(folds)))
+    for i, (_, data) in enumerate(folds):
+        tree = DecisionTreeRegressor(**params).fit(data.X_train, data.y_train)
+        scores[:, i] = r2_columns(data.y_val, pruned_predictions(tree, data.X_val, ccp_alphas))
+    return scores
+
+def best_ccp_alpha(folds, ccp_alphas, **tree_params):
+    """(alpha, mean R2) with the highest mean validation R2; ties go to the smaller alpha, as in 3-2"""
+    mean_scores = ccp_alpha_scores(folds, ccp_alphas, **tree_params).mean(axis=1)
+    best = int(np.argmax(mean_scores))
+    return ccp_alphas[best], mean_scores[best]
+
+class _Moments:
+    """Per-chunk sums for X'X, X'y and the means of contiguous KFold chunks of (X, y)"""
+    def __init__(self, X, y, n_splits):
+        self.bounds = np.cumsum([0] + [len(part) for part in np.array_split(np.arange(len(X)), n_splits)])
+        chunks = list(zip(self.bounds[:-1], self.bounds[1:]))
+        self.gram = np.stack([X[a:b].T @ X[a:b] for a, b in chunks])
+        self.xy = np.stack([X[a:b].T @ y[a:b] for a, b in chunks])
+        self.x_sum = np.stack([X[a:b].sum(axis=0) for a, b in chunks])
+        self.y_sum = np.array([y[a:b].sum() for a, b in chunks])
+        self.count = np.diff(self.bounds)
+
+    def centred(self, exclude=None):
+        """(Gram, Xy, x_mean, y_mean) of all chunks except `exclude`, centred on their own means"""
+        keep = np.arange(len(self.count)) != exclude
+        n = self.count[keep].sum()
+        x_mean = self.x_sum[keep].sum(axis=0) / n
+        y_mean = self.y_sum[keep].sum() / n
+        gram = self.gram[keep].sum(axis=0) - n * np.outer(x_mean, x_mean)
+        xy = self.xy[keep].sum(axis=0) - n * x_mean * y_mean
+        return gram, xy, x_mean, y_mean
+
+def ridge_path(gram, xy, alphas):
+    """Ridge coefficients (n_features x n_alphas) for centred data, solved for all alphas at once"""
+    eigenvalues, vectors = np.linalg.eigh(gram)
+    projected = vectors.T @ xy
+    return vectors @ (projected[:, None] / (eigenvalues[:, None] + np.asarray(alphas)[None, :]))
+
+class PathRidgeCV(RegressorMixin, BaseEstimator):
+    """RidgeCV(alphas, cv=k): the same KFold selection on R2, with one eigendecomposition per fold"""
+    def __init__(self, alphas=(0.1, 1.0, 10.0), cv=5):
+        self.alphas = alphas
+        self.cv = cv
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        alphas = np.asarray(self.alphas, dtype=np.float64)
+        moments = _Moments(X, y, self.cv)
+        self.cv_scores_ = np.empty((len(alphas), self.cv))
+        for k, (a, b) in enumerate(zip(moments.bounds[:-1], moments.bounds[1:])):
+            gram, xy, x_mean, y_mean = moments.centred(exclude=k)
+            coefs = ridge_path(gram, xy, alphas)
+            predictions = X[a:b] @ coefs + (y_mean - x_mean @ coefs)
+            self.cv_scores_[:, k] = r2_columns(y[a:b], predictions)
+
+        best = int(np.argmax(self.cv_scores_.mean(axis=1)))
+        self.alpha_ = alphas[best]
+        self.best_score_ = self.cv_scores_[best].mean()
+        gram, xy, x_mean, y_mean = moments.centred()
+        self.coef_ = ridge_path(gram, xy, [self.alpha_])[:, 0]
+        self.intercept_ = y_mean - x_mean @ self.coef_
+        return self
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+class PathLassoCV(RegressorMixin, BaseEstimator):
+    """LassoCV(alphas, cv=k): the same KFold selection on MSE, with Gram matrices derived from per-fold sums
+    and a final fit that warm-starts along the path down to the chosen alpha"""
+    def __init__(self, alphas=(0.1, 1.0, 10.0), cv=5, max_iter=1000, tol=1e-4):
+        self.alphas = alphas
+        self.cv = cv
+        self.max_iter = max_iter
+        self.tol = tol
+
+    def _path(self, X, y, moments, alphas, exclude=None):
+        gram, xy, x_mean, y_mean = moments.centred(exclude)
+        keep = np.ones(len(X), dtype=bool)
+        if exclude is not None:
+            keep[moments.bounds[exclude]:moments.bounds[exclude + 1]] = False
+        X_centred = np.asfortranarray(X[keep] - x_mean)
+        _, coefs, _ = lasso_path(X_centred, y[keep] - y_mean, alphas=alphas, precompute=gram, Xy=xy,
+                                 max_iter=self.max_iter, tol=self.tol)
+        return coefs, y_mean - x_mean @ coefs
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        alphas = np.sort(np.asarray(self.alphas, dtype=np.float64))[::-1]
+        moments = _Moments(X, y, self.cv)
+        self.mse_path_ = np.empty((len(alphas), self.cv))
+        for k, (a, b) in enumerate(zip(moments.bounds[:-1], moments.bounds[1:])):
+            coefs, intercepts = self._path(X, y, moments, alphas, exclude=k)
+            residuals = X[a:b] @ coefs + intercepts - y[a:b, None]
+            self.mse_path_[:, k] = (residuals ** 2).mean(axis=0)
+
+        best = int(np.argmin(self.mse_path_.mean(axis=1)))
+        self.alphas_ = alphas
+        self.alpha_ = alphas[best]
+        coefs, intercepts = self._path(X, y, moments, alphas[:best + 1])
+        self.coef_ = coefs[:, -1]
+        self.intercept_ = intercepts[-1]
+        return self
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
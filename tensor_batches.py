@@ -0,0 +1,92 @@
+import warnings
+
+import numpy as np
+import torch
+
+# In-memory minibatches for the torch training loops of 3-3, 3-5, 3-6 and
+# 3-7, in place of DataLoader(TensorDataset(...)) (which indexes and stacks
+# every row separately) and of per-batch torch.tensor copies of NumPy slices.
+# Each array is held once as a contiguous float32 tensor (torch.from_numpy,
+# so fold_cache memmaps and float32 arrays are not copied). Shuffling permutes
+# an index vector instead of the data: unshuffled batches are slice views,
+# shuffled ones a single index_select gather per batch. Data can be moved to
+# the training device once (gathers then run there), or stay on the host and
+# be gathered into pinned buffers that are copied to CUDA asynchronously.
+
+def as_tensor(array):
+    """float32 CPU tensor sharing memory with array where possible; 1-D arrays become (n, 1) columns"""
+    if isinstance(array, torch.Tensor):
+        tensor = array.float()
+    else:
+        if hasattr(array, 'to_numpy'):
+            array = array.to_numpy()
+        array = np.ascontiguousarray(array, dtype=np.float32)
+        with warnings.catch_warnings():
+            # Read-only memmaps (fold_cache) are only ever read
+            warnings.filterwarnings('ignore', message='The given NumPy array is not writable')
+            tensor = torch.from_numpy(array)
+    return tensor.view(-1, 1) if tensor.dim() == 1 else tensor
+
+class TensorBatches:
+    """Iterable of (tensor, ...) minibatches of row-aligned arrays, a drop-in for the notebooks' DataLoaders.
+
+    indices restricts iteration to those rows (a fold or random_split subset) without copying them.
+    preload=True moves the arrays to `device` once; with preload=False batches are gathered on the host
+    (into pinned buffers for CUDA) and copied to `device` per batch.
+    """
+    def __init__(self, *arrays, batch_size=1024, shuffle=False, indices=None, device='cpu', preload=True,
+                 drop_last=False, seed=None):
+        self.device = torch.device(device)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        storage = self.device if preload else torch.device('cpu')
+        self.tensors = [as_tensor(array).to(storage) for array in arrays]
+        if len({len(tensor) for tensor in self.tensors}) != 1:
+            raise ValueError(f"Arrays have different numbers of rows: {[len(tensor) for tensor in self.tensors]}")
+        self.indices = None if indices is None else torch.as_tensor(np.asarray(indices), dtype=torch.long).to(storage)
+        self.rows = len(self.tensors[0]) if self.indices is None else len(self.indices)
+        self.generator = torch.Generator().manual_seed(seed) if seed is not None else None
+        self._staging = None
+        if storage != self.device and self.device.type == 'cuda':
+            # Two pinned buffer sets: one is gathered into while the other's copy to the GPU is in flight
+            self._staging = [[torch.empty((batch_size,) + tensor.shape[1:], dtype=tensor.dtype).pin_memory()
+                              for tensor in self.tensors] for _ in range(2)]
+            self._copied = [None, None]
+
+    def __len__(self):
+        if self.drop_last:
+            return self.rows // self.batch_size
+        return (self.rows + self.batch_size - 1) // self.batch_size
+
+    def _order(self):
+        """Row order for one epoch, or None when batches can be plain slices"""
+        if not self.shuffle:
+            return self.indices
+        permutation = torch.randperm(self.rows, generator=self.generator)
+        if self.indices is None:
+            return permutation.to(self.tensors[0].device)
+        return self.indices[permutation.to(self.indices.device)]
+
+    def _gather(self, rows, slot):
+        if self._staging is None:
+            return [tensor.index_select(0, rows).to(self.device, non_blocking=True) for tensor in self.tensors]
+        if self._copied[slot] is not None:
+            self._copied[slot].synchronize()
+        buffers = [torch.index_select(tensor, 0, rows, out=buffer[:len(rows)])
+                   for tensor, buffer in zip(self.tensors, self._staging[slot])]
+        batch = [buffer.to(self.device, non_blocking=True) for buffer in buffers]
+        self._copied[slot] = torch.cuda.Event()
+        self._copied[slot].record()
+        return batch
+
+    def __iter__(self):
+        order = self._order()
+        for number, start in enumerate(range(0, self.rows, self.batch_size)):
+            stop = min(start + self.batch_size, self.rows)
+            if self.drop_last and stop - start < self.batch_size:
+                break
+            if order is None:
+                yield tuple(tensor[start:stop].to(self.device, non_blocking=True) for tensor in self.tensors)
+            else:
+                yield tuple(self._gather(order[start:stop], number % 2))
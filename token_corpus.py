@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import shutil
+from multiprocessing import Pool
+
+import numpy as np
+
+# Pre-tokenised Textual_Input corpus for the HerBERT fine-tuning in 3-8.ipynb.
+# Texts are tokenised once, in batches across processes, without padding. The
+# variable-length input IDs go into one flat int32 file with an int64 offsets
+# array (row i is ids[offsets[i]:offsets[i + 1]]), next to float32 labels and
+# the cv_fold of every row, all read back through np.memmap. Batches are padded
+# only to their longest row by DynamicPaddingCollator, and LengthGroupedSampler
+# puts rows of similar length into the same batch.
+
+CORPUS_DIR = 'herbert_token_corpus'
+TOKENIZER_NAME = 'allegro/herbert-base-cased'
+
+_tokenizer = None
+
+def _init_worker(tokenizer_name):
+    global _tokenizer
+    # Parallelism comes from the processes; keep each tokenizer single-threaded
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    from transformers import AutoTokenizer
+    _tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+
+def _tokenize_batch(job):
+    texts, max_length = job
+    input_ids = _tokenizer(texts, truncation=True, max_length=max_length)['input_ids']
+    lengths = np.array([len(ids) for ids in input_ids], dtype=np.int64)
+    return np.fromiter((token for ids in input_ids for token in ids), dtype=np.int32, count=int(lengths.sum())), lengths
+
+def content_hash(texts, labels, folds, tokenizer_name, max_length):
+    digest = hashlib.blake2b(f"{tokenizer_name}\0{max_length}".encode('utf-8'), digest_size=16)
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(np.ascontiguousarray(labels, dtype=np.float32).tobytes())
+    digest.update(np.ascontiguousarray(folds, dtype=np.int8).tobytes())
+    return digest.hexdigest()
+
+def build_corpus(path, texts, labels, folds, tokenizer_name=TOKENIZER_NAME, max_length=128,
+                 workers=None, batch_size=1000):
+    """Tokenise texts into a corpus directory at path, replacing any previous one"""
+    texts = [str(text) for text in texts]
+    workers = workers or os.cpu_count() or 1
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    jobs = [(texts[start:start + batch_size], max_length) for start in range(0, len(texts), batch_size)]
+    lengths = []
+    with open(os.path.join(tmp_path, 'ids.i32'), 'wb') as ids_file:
+        if workers > 1:
+            with Pool(workers, initializer=_init_worker, initargs=(tokenizer_name,)) as pool:
+                # imap keeps batch order, so rows stay aligned with labels
+                for ids, batch_lengths in pool.imap(_tokenize_batch, jobs):
+                    ids_file.write(ids.tobytes())
+                    lengths.append(batch_lengths)
+        else:
+            _init_worker(tokenizer_name)
+            for job in jobs:
+                ids, batch_lengths = _tokenize_batch(job)
+                ids_file.write(ids.tobytes())
+                lengths.append(batch_lengths)
+
+    lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    np.save(os.path.join(tmp_path, 'offsets.npy'), offsets)
+    np.save(os.path.join(tmp_path, 'labels.npy'), np.asarray(labels, dtype=np.float32))
+    np.save(os.path.join(tmp_path, 'folds.npy'), np.asarray(folds, dtype=np.int8))
+
+    from transformers import AutoTokenizer
+    meta = {
+        'tokenizer_name': tokenizer_name,
+        'max_length': max_length,
+        'pad_token_id': AutoTokenizer.from_pretrained(tokenizer_name).pad_token_id,
+        'rows': len(texts),
+        'tokens': int(offsets[-1]),
+        'content_hash': content_hash(texts, labels, folds, tokenizer_name, max_length),
+    }
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return TokenCorpus(path)
+
+class TokenCorpus:
+    def __init__(self, path=CORPUS_DIR):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        self.pad_token_id = self.meta['pad_token_id']
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        self.labels = np.load(os.path.join(path, 'labels.npy'), mmap_mode='r')
+        self.folds = np.load(os.path.join(path, 'folds.npy'), mmap_mode='r')
+        ids_path = os.path.join(path, 'ids.i32')
+        if self.meta['tokens']:
+            self.ids = np.memmap(ids_path, dtype=np.int32, mode='r', shape=(self.meta['tokens'],))
+        else:
+            self.ids = np.zeros(0, dtype=np.int32)
+        self.lengths = np.diff(self.offsets)
+
+    @classmethod
+    def load_or_build(cls, path, texts, labels, folds, tokenizer_name=TOKENIZER_NAME, max_length=128, **kwargs):
+        """Reuse the corpus at path if it was built from the same texts, labels, folds and tokenizer settings"""
+        texts = [str(text) for text in texts]
+        expected = content_hash(texts, labels, folds, tokenizer_name, max_length)
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            corpus = cls(path)
+            if corpus.meta.get('content_hash') == expected:
+                print(f"📂 Using tokenised corpus in {path} ({len(corpus)} rows)")
+                return corpus
+            print(f"🔄 {path} was built from different data, re-tokenising")
+        print(f"🔄 Tokenising {len(texts)} texts into {path}...")
+        return build_corpus(path, texts, labels, folds, tokenizer_name, max_length, **kwargs)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return {'input_ids': self.ids[start:end], 'labels': self.labels[index]}
+
+    def subset(self, indices):
+        return TokenSubset(self, indices)
+
+    def fold_split(self, fold):
+        """(train, validation) subsets: rows of other CV folds vs rows of `fold` (-1 is the test split)"""
+        folds = np.asarray(self.folds)
+        if fold == -1:
+            return self.subset(np.flatnonzero(folds != -1)), self.subset(np.flatnonzero(folds == -1))
+        train = np.flatnonzero((folds != fold) & (folds != -1))
+        return self.subset(train), self.subset(np.flatnonzero(folds == fold))
+
+class TokenSubset:
+    """Rows of a TokenCorpus, in the given order"""
+    def __init__(self, corpus, indices):
+        self.corpus = corpus
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.lengths = corpus.lengths[self.indices]
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        return self.corpus[self.indices[index]]
+
+class LengthGroupedSampler:
+    """Shuffled indices where each run of batch_size rows has similar lengths.
+
+    Indices are shuffled, cut into mega-batches of batch_size * mega_batch_mult
+    and sorted by length inside each mega-batch, so batches stay random across
+    the epoch but need little padding. The longest batch comes first so an
+    out-of-memory error shows up immediately. Each iteration reshuffles with the
+    next epoch, unless the training loop calls set_epoch: from then on only
+    set_epoch moves the epoch, as with DistributedSampler.
+    """
+    def __init__(self, lengths, batch_size, mega_batch_mult=50, seed=42):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.mega_batch_size = batch_size * mega_batch_mult
+        self.seed = seed
+        self.epoch = 0
+        self._epoch_set = False
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+        self._epoch_set = True
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        if not self._epoch_set:
+            self.epoch += 1
+        order = rng.permutation(len(self.lengths))
+        mega_batches = [order[start:start + self.mega_batch_size]
+                        for start in range(0, len(order), self.mega_batch_size)]
+        mega_batches = [mega[np.argsort(-self.lengths[mega], kind='stable')] for mega in mega_batches]
+        indices = np.concatenate(mega_batches) if mega_batches else order
+        batches = [indices[start:start + self.batch_size] for start in range(0, len(indices), self.batch_size)]
+        if batches:
+            longest = int(np.argmax([self.lengths[batch].max() for batch in batches]))
+            batches[0], batches[longest] = batches[longest], batches[0]
+        return iter(int(index) for batch in batches for index in batch)
+
+class DynamicPaddingCollator:
+    """Pads each batch to its longest row and adds the attention mask"""
+    def __init__(self, pad_token_id):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, rows):
+        import torch
+
+        width = max(len(row['input_ids']) for row in rows)
+        input_ids = np.full((len(rows), width), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(rows), width), dtype=np.int64)
+        for i, row in enumerate(rows):
+            length = len(row['input_ids'])
+            input_ids[i, :length] = row['input_ids']
+            attention_mask[i, :length] = 1
+        return {
+            'input_ids': torch.from_numpy(input_ids),
+            'attention_mask': torch.from_numpy(attention_mask),
+            'labels': torch.tensor([float(row['labels']) for row in rows], dtype=torch.float32),
+        }
+
+def padded_tokens(lengths, order, batch_size, pad_to=None):
+    """Tokens the model processes for one epoch in the given order (padding included)"""
+    lengths = np.asarray(lengths)[np.asarray(list(order))]
+    total = 0
+    for start in range(0, len(lengths), batch_size):
+        batch = lengths[start:start + batch_size]
+        total += len(batch) * (pad_to or int(batch.max()))
+    return total
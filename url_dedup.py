@@ -0,0 +1,111 @@
+import os
+import re
+import sqlite3
+from urllib.parse import urlsplit, urlunsplit
+
+# Deduplication of listing URLs by offer ID. The same offer shows up under
+# different tracking query strings, fragments, trailing slashes or hosts, so
+# URLs are reduced to the "-ID<id>.html" part of the path before comparing.
+# Seen keys live in an on-disk SQLite primary-key index rather than a Python
+# set, so memory stays flat however many URLs a crawl collects.
+
+SEEN_FILE = 'otomoto_car_urls.seen.sqlite'
+OFFER_ID = re.compile(r'-ID([0-9A-Za-z]+)\.html$')
+
+def canonical_url(url):
+    """Lowercase scheme and host, drop the fragment and trailing slashes; offer URLs also lose the query"""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    query = '' if OFFER_ID.search(path) else parts.query
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+def offer_key(url):
+    """Offer ID for otomoto offer URLs, the canonical URL for anything else"""
+    canonical = canonical_url(url)
+    match = OFFER_ID.search(urlsplit(canonical).path)
+    return match.group(1) if match else canonical
+
+class SeenOffers:
+    def __init__(self, path=SEEN_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS offers (key TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def add(self, url):
+        """Record the URL's offer; True if it was not seen before"""
+        cursor = self.db.execute('INSERT OR IGNORE INTO offers (key) VALUES (?)', (offer_key(url),))
+        return cursor.rowcount == 1
+
+    def filter_new(self, urls):
+        """Canonical forms of the URLs whose offers were not seen before (the first URL of each), in input
+        order. Nothing is recorded: pass them to add_many once they are stored, so a failed write is retried."""
+        new, keys = [], set()
+        for url in urls:
+            key = offer_key(url)
+            if key not in keys and not self._has(key):
+                keys.add(key)
+                new.append(canonical_url(url))
+        return new
+
+    def add_many(self, urls):
+        """Record the URLs' offers and commit"""
+        with self.db:
+            self.db.executemany('INSERT OR IGNORE INTO offers (key) VALUES (?)', [(offer_key(url),) for url in urls])
+
+    def _has(self, key):
+        return self.db.execute('SELECT 1 FROM offers WHERE key = ?', (key,)).fetchone() is not None
+
+    def __contains__(self, url):
+        return self._has(offer_key(url))
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM offers').fetchone()[0]
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def seed_from_file(seen, filename, batch_size=10000):
+    """Mark every URL already in a URL file as seen"""
+    if not os.path.exists(filename):
+        return 0
+    added = 0
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip() and seen.add(line):
+                added += 1
+            if line_number % batch_size == 0:
+                seen.commit()
+    seen.commit()
+    return added
+
+def dedupe_file(input_file, output_file, index_path, batch_size=10000):
+    """Stream input_file into output_file keeping the first canonical URL of each offer.
+
+    Returns (URLs read, unique URLs written).
+    """
+    total = unique = 0
+    with SeenOffers(index_path) as seen, \
+            open(input_file, 'r', encoding='utf-8') as source, \
+            open(output_file, 'w', encoding='utf-8') as target:
+        for line in source:
+            if not line.strip():
+                continue
+            total += 1
+            if seen.add(line):
+                target.write(f"{canonical_url(line)}\n")
+                unique += 1
+            if total % batch_size == 0:
+                seen.commit()
+    return total, unique